@@ -1,19 +1,26 @@
 """
 Streamlit App: ASUS Credit Note PDF Extractor
 Giao diện tuần tự với quản lý người dùng
+
+Bước 1 / 2 chỉ dùng các module nhẹ; phần xuất file (pandas, openpyxl) chỉ được
+import ở bước 3 / 4, còn pdfplumber chạy trong job nền. Xem
+benchmarks/bench_startup.py.
 """
 
 import streamlit as st
-import pandas as pd
-import pdfplumber
-import re
-import io
 import logging
-from datetime import datetime
-from pathlib import Path
-from openpyxl import load_workbook
-from openpyxl.utils import get_column_letter
-from openpyxl.styles import Alignment, Font, Border, Side, PatternFill
+import os
+import sqlite3
+import time
+from datetime import date, datetime
+
+from asus_cn.archive import ArchiveError, ZipArchive, is_zip
+from asus_cn.audit import AuditLog, to_csv
+from asus_cn.batch import Batch
+from asus_cn.cache import ExtractionCache
+from asus_cn.ledger import Ledger
+from asus_cn.metrics import METRICS
+from asus_cn.jobs import ACTIVE_STATUSES, JOB_DONE, JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JobRejected, JobRunner
 
 # Configure logging
 logging.basicConfig(format='%(asctime)s - %(message)s', level=logging.INFO)
@@ -112,291 +119,154 @@ if 'current_step' not in st.session_state:
 if 'user_name' not in st.session_state:
     st.session_state.user_name = ""
 
-if 'uploaded_files' not in st.session_state:
-    st.session_state.uploaded_files = []
+if 'job_id' not in st.session_state:
+    st.session_state.job_id = None
+
+# Các job tạo / mở trong session, xoá khi đăng xuất
+if 'session_jobs' not in st.session_state:
+    st.session_state.session_jobs = []
+
+# Đổi key để Streamlit bỏ các file đã upload khỏi bộ nhớ sau khi chuyển vào job
+if 'uploader_key' not in st.session_state:
+    st.session_state.uploader_key = 0
 
 if 'processed_data' not in st.session_state:
     st.session_state.processed_data = None
 
-if 'processing_log' not in st.session_state:
-    st.session_state.processing_log = []
+if 'batch' not in st.session_state:
+    st.session_state.batch = Batch()
+
+if 'export_key' not in st.session_state:
+    st.session_state.export_key = None
+
+# Job có số liệu profiling đang hiển thị ở bước 3
+if 'profile_job' not in st.session_state:
+    st.session_state.profile_job = None
 
 
 # ==================== EXTRACTION FUNCTIONS ====================
 
-def pdf_to_text(pdf_file) -> str:
-    """Đọc file PDF và trả về text content."""
-    text_content = []
-    try:
-        with pdfplumber.open(pdf_file) as pdf:
-            for page_num, page in enumerate(pdf.pages, 1):
-                page_text = page.extract_text()
-                if page_text:
-                    text_content.append(f"=== PAGE {page_num} ===")
-                    text_content.append(page_text)
-                    text_content.append("")
-    except Exception as e:
-        return ""
-    return "\n".join(text_content)
+@st.cache_resource
+def get_extraction_cache() -> ExtractionCache:
+    """Cache trích xuất dùng chung cho mọi session."""
+    return ExtractionCache()
 
 
-def extract_cn_no(text: str) -> str:
-    match = re.search(r'CN NO\s*:\s*(\d+)', text)
-    return match.group(1) if match else ""
+@st.cache_resource
+def get_exports():
+    """File đã xuất (ExportCache) theo fingerprint dữ liệu và định dạng, dùng chung cho mọi session."""
+    from asus_cn.export import ExportCache
 
+    return ExportCache()
 
-def extract_product_line(text: str) -> str:
-    match = re.search(r'Credit Note Remark:\s*(.+?)(?:\r?\n|$)', text)
-    return match.group(1).strip() if match else ""
 
+@st.cache_resource
+def get_job_runner() -> JobRunner:
+    """Hàng đợi job nền dùng chung; khởi tạo lần đầu sẽ chạy tiếp các job dở dang."""
+    return JobRunner(cache=get_extraction_cache())
 
-def extract_total(text: str) -> str:
-    match = re.search(r'Total:\s*([\d,]+\.?\d*)', text)
-    return match.group(1) if match else ""
 
+JOB_STATUS_LABELS = {JOB_QUEUED: "⏳ Đang chờ", JOB_RUNNING: "⚙️ Đang chạy", JOB_DONE: "✅ Xong", JOB_FAILED: "❌ Lỗi"}
+# Khoảng thời gian (giây) giữa hai lần cập nhật tiến độ job ở bước 3
+JOB_POLL_SECONDS = 0.5
 
-def extract_items(text: str) -> list:
-    """Trích xuất các item từ text."""
-    items = []
-    lines = text.split('\n')
-    
-    i = 0
-    while i < len(lines):
-        line = lines[i].strip()
-        
-        item_match = re.match(
-            r'^(\d+\.\d+)\s+([A-Z0-9\-]+)\s+(\d+)\s+(.+)$',
-            line
-        )
-        
-        if item_match:
-            no = item_match.group(1)
-            part_no = item_match.group(2)
-            rest = item_match.group(4).strip()
-            
-            numbers = re.findall(r'[\d,]+\.?\d*', rest)
-            fob = numbers[-1] if numbers else ""
-            
-            product = ""
-            for j in range(i + 1, min(i + 3, len(lines))):
-                next_line = lines[j].strip()
-                if next_line.startswith(('Model:', '===', 'No ', 'Page', 'SO:', 'Note:')):
-                    continue
-                if next_line.startswith('AS '):
-                    product = next_line
-                    break
-                elif '/' in next_line and not next_line.startswith(('EAN', 'MODEL')):
-                    product = next_line
-                    break
-            
-            serial = ""
-            for j in range(i + 1, min(i + 15, len(lines))):
-                note_line = lines[j].strip()
-                if note_line.startswith(('===', 'Page:', 'CN#', 'No Description', 
-                                         'ASUS GLOBAL', '10 Changi', 'Reg. No',
-                                         'Credit Note', 'To :', 'Address', 'Attn',
-                                         'Fax', 'Date', 'CN Reason', 'Credit Note Remark')):
-                    continue
-                if re.match(r'^\d+\.\d+\s+[A-Z0-9\-]+\s+\d+\s+', note_line):
-                    break
-                if 'SN:' in note_line:
-                    sn_match = re.search(r'SN:([A-Z0-9]+)', note_line)
-                    if sn_match:
-                        serial = sn_match.group(1)
-                    else:
-                        memo_match = re.search(r'MEMO:([A-Z0-9]+)', note_line)
-                        if memo_match:
-                            serial = memo_match.group(1)
-                    break
-            
-            invoice = ""
-            for j in range(i + 1, min(i + 10, len(lines))):
-                inv_line = lines[j].strip()
-                if re.match(r'^\d+\.\d+\s+[A-Z0-9\-]+\s+\d+\s+', inv_line):
-                    break
-                inv_match = re.search(r'INVOICE[:\s]+([\d]+)', inv_line)
-                if inv_match:
-                    invoice = inv_match.group(1)
-                    break
-            
-            items.append({
-                'No': no,
-                'Part No': part_no,
-                'Product': product,
-                'Serial': serial,
-                'FOB': fob,
-                'Invoice': invoice
-            })
-        
-        i += 1
-    
-    return items
-
-
-def parse_rebate_files(pdf_texts: dict) -> dict:
-    rebate_mapping = {}
-    for filename, content in pdf_texts.items():
-        if 'REBATE FOR INVOICE:' not in content:
-            continue
-        cn_no = extract_cn_no(content)
-        rebate_pattern = re.findall(
-            r'REBATE FOR INVOICE:\s*(\d+)\s+([\d,.]+)',
-            content
-        )
-        for invoice, amount in rebate_pattern:
-            rebate_mapping[invoice] = {
-                'CN_Landing': cn_no,
-                'Landing_cost': amount
-            }
-    return rebate_mapping
 
+@st.cache_resource
+def get_ledger():
+    """Sổ cái REBATE / Credit Note dùng chung; None nếu không mở được."""
+    try:
+        return Ledger()
+    except (OSError, sqlite3.Error) as e:
+        logging.warning(f"Ledger disabled: {e}")
+        return None
 
-def process_pdf_text(filename: str, text: str, rebate_mapping: dict) -> list:
-    if 'REBATE FOR INVOICE:' in text:
-        return []
-    
-    pdf_name = filename
-    cn_fob = extract_cn_no(text)
-    product_line = extract_product_line(text)
-    items = extract_items(text)
-    total = extract_total(text)
-    
-    file_landing_costs = []
-    file_cn_landing = ''
-    
-    for item in items:
-        invoice = item.get('Invoice', '')
-        if invoice and invoice in rebate_mapping:
-            cn_landing = rebate_mapping[invoice]['CN_Landing']
-            landing_cost = rebate_mapping[invoice]['Landing_cost']
-            file_landing_costs.append(landing_cost)
-            if cn_landing:
-                file_cn_landing = cn_landing
-    
-    records = []
-    for item in items:
-        records.append({
-            'Tên file PDF': pdf_name,
-            'Product': item['Product'],
-            'Product line': product_line,
-            'Serial': item['Serial'],
-            'Part No': item['Part No'],
-            'FOB': item['FOB'],
-            'CN FOB': cn_fob,
-            'CN Landing': file_cn_landing,
-            'Landing cost': ''
-        })
-    
-    total_landing_cost = ''
-    if file_landing_costs:
-        try:
-            total_landing_cost = sum(float(lc.replace(',', '')) for lc in file_landing_costs)
-            total_landing_cost = f"{total_landing_cost:.2f}"
-        except:
-            total_landing_cost = ', '.join(file_landing_costs)
-    
-    if records:
-        records.append({
-            'Tên file PDF': pdf_name,
-            'Product': '',
-            'Product line': '',
-            'Serial': '',
-            'Part No': 'TOTAL',
-            'FOB': total,
-            'CN FOB': cn_fob,
-            'CN Landing': file_cn_landing,
-            'Landing cost': total_landing_cost
-        })
-    
-    return records
 
+@st.cache_resource
+def get_audit_log():
+    """Audit log dùng chung (ghi nền theo lô); None nếu không mở được thư mục lưu."""
+    try:
+        return AuditLog()
+    except OSError as e:
+        logging.warning(f"Audit log disabled: {e}")
+        return None
+
+
+# Chạy tiếp các job dở dang ngay từ lượt truy cập đầu tiên sau khi khởi động lại
+get_job_runner()
 
-def create_excel_with_formatting(df: pd.DataFrame) -> io.BytesIO:
-    output = io.BytesIO()
-    df.to_excel(output, index=False, sheet_name='Data', engine='openpyxl')
-    output.seek(0)
-    
-    wb = load_workbook(output)
-    ws = wb.active
-    
-    merge_columns = {'Tên file PDF': 1, 'CN FOB': 7, 'CN Landing': 8}
-    current_file = None
-    start_row = 2
-    
-    for idx, row in df.iterrows():
-        excel_row = idx + 2
-        file_name = row['Tên file PDF']
-        is_total = row['Part No'] == 'TOTAL'
-        
-        if current_file is None:
-            current_file = file_name
-            start_row = excel_row
-        elif is_total:
-            end_row = excel_row
-            for col_name, col_idx in merge_columns.items():
-                if end_row > start_row:
-                    col_letter = get_column_letter(col_idx)
-                    ws.merge_cells(f'{col_letter}{start_row}:{col_letter}{end_row}')
-                    ws[f'{col_letter}{start_row}'].alignment = Alignment(vertical='center')
-            current_file = None
-    
-    header_font = Font(bold=True, color='FFFFFF', size=11)
-    header_fill = PatternFill(start_color='2E75B6', end_color='2E75B6', fill_type='solid')
-    header_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-    
-    total_font = Font(bold=True, size=11)
-    total_fill = PatternFill(start_color='D9E2F3', end_color='D9E2F3', fill_type='solid')
-    
-    thin_border = Border(
-        left=Side(style='thin', color='B4B4B4'),
-        right=Side(style='thin', color='B4B4B4'),
-        top=Side(style='thin', color='B4B4B4'),
-        bottom=Side(style='thin', color='B4B4B4')
-    )
-    
-    for col in range(1, ws.max_column + 1):
-        cell = ws.cell(row=1, column=col)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-        cell.border = thin_border
-    
-    for row in range(2, ws.max_row + 1):
-        is_total_row = ws.cell(row=row, column=5).value == 'TOTAL'
-        for col in range(1, ws.max_column + 1):
-            cell = ws.cell(row=row, column=col)
-            cell.border = thin_border
-            if is_total_row:
-                cell.font = total_font
-                cell.fill = total_fill
-            if col in [5, 6, 7, 8, 9]:
-                cell.alignment = Alignment(horizontal='center', vertical='center')
-    
-    column_widths = {'A': 25, 'B': 45, 'C': 25, 'D': 18, 'E': 18, 'F': 12, 'G': 18, 'H': 18, 'I': 15}
-    for col_letter, width in column_widths.items():
-        ws.column_dimensions[col_letter].width = width
-    
-    ws.freeze_panes = 'A2'
-    
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    
-    return output
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def load_job_profile(job_id: str):
+    """Báo cáo profiling của một job đã xong (ProfileReport) hoặc None; số liệu không đổi nên được cache."""
+    return get_job_runner().profile(job_id)
 
 
 def log_activity(user: str, action: str, details: str = ""):
-    """Ghi log hoạt động người dùng."""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    log_entry = {
-        'timestamp': timestamp,
-        'user': user,
-        'action': action,
-        'details': details
-    }
-    st.session_state.processing_log.append(log_entry)
-    # In log ra console (sẽ hiển thị trong Streamlit Cloud logs)
-    logging.info(f"User: {user} | Action: {action} | {details}")
+    """Ghi log hoạt động người dùng vào audit log (thread nền ghi xuống đĩa và ra console)."""
+    audit = get_audit_log()
+    if audit is not None:
+        audit.record(user, action, details)
+    else:
+        logging.info(f"User: {user} | Action: {action} | {details}")
+
+
+def logout():
+    """Đăng xuất: xoá các job đã xong của session (kết quả có toàn bộ text các file) và reset session."""
+    log_activity(st.session_state.user_name, "LOGOUT", "User logged out")
+    runner = get_job_runner()
+    for job_id in st.session_state.session_jobs:
+        # Job đang chạy được giữ lại, xoá sau JOB_RETENTION_DAYS
+        runner.delete(job_id)
+    st.session_state.session_jobs = []
+    st.session_state.current_step = 1
+    st.session_state.user_name = ""
+    st.session_state.job_id = None
+    st.session_state.processed_data = None
+    st.session_state.batch = Batch()
+    st.session_state.uploader_key += 1
+    st.session_state.profile_job = None
+
+
+# ==================== AUDIT LOG ====================
+
+# Người dùng được xem nhật ký hoạt động (tên đăng nhập, cách nhau bởi dấu phẩy)
+ADMIN_USERS = {name.strip() for name in os.environ.get('ASUS_CN_ADMINS', '').split(',') if name.strip()}
+AUDIT_ACTIONS = ("LOGIN", "UPLOAD", "REMOVE", "PROCESS", "DOWNLOAD", "LOGOUT")
+# Số dòng hiển thị trên trang; file CSV có đủ mọi dòng
+AUDIT_VIEW_ROWS = 500
+
+
+def render_audit_view():
+    """Tra cứu nhật ký hoạt động theo người dùng, thao tác và khoảng ngày (chỉ admin)."""
+    audit = get_audit_log()
+    with st.expander("📋 Nhật ký hoạt động", expanded=True):
+        if audit is None:
+            st.warning("⚠️ Không mở được nhật ký hoạt động.")
+            return
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            user = st.text_input("Người dùng", key="audit_user").strip()
+        with col2:
+            action = st.selectbox("Thao tác", ("", *AUDIT_ACTIONS), key="audit_action",
+                                  format_func=lambda a: a or "Tất cả")
+        with col3:
+            today = date.today()
+            dates = st.date_input("Khoảng ngày", value=(today.replace(day=1), today), key="audit_dates")
+        # Khi đang chọn, date_input chỉ trả về ngày bắt đầu
+        start = dates[0] if dates else None
+        end = dates[1] if len(dates) > 1 else start
+
+        events = audit.query(user or None, action or None, start, end)
+        st.caption(f"{len(events)} sự kiện" + (f", hiển thị {AUDIT_VIEW_ROWS} mới nhất"
+                                                 if len(events) > AUDIT_VIEW_ROWS else ""))
+        if events:
+            st.dataframe([event._asdict() for event in events[:AUDIT_VIEW_ROWS]],
+                         use_container_width=True, hide_index=True)
+            st.download_button(
+                "📥 Tải CSV", data=to_csv(events),
+                file_name=f"audit_{start:%Y%m%d}_{end:%Y%m%d}.csv" if start else "audit.csv",
+                mime="text/csv"
+            )
 
 
 # ==================== STEP INDICATOR ====================
@@ -442,12 +312,15 @@ if st.session_state.user_name:
     with st.sidebar:
         st.write(f"👤 **{st.session_state.user_name}**")
         if st.button("🚪 Đăng xuất", key="sidebar_logout", use_container_width=True):
-            log_activity(st.session_state.user_name, "LOGOUT", "User logged out")
-            st.session_state.current_step = 1
-            st.session_state.user_name = ""
-            st.session_state.uploaded_files = []
-            st.session_state.processed_data = None
+            logout()
             st.rerun()
+        if st.session_state.user_name in ADMIN_USERS:
+            st.toggle("📋 Nhật ký hoạt động", key="audit_view")
+        st.toggle(
+            "🔬 Đo hiệu năng", key="profiling",
+            help="Đo thời gian và bộ nhớ đọc từng file ở lần xử lý tiếp theo. Đọc lại cả file đã có "
+                 "trong cache và chậm hơn bình thường nhiều lần; kết quả hiển thị ở bước 3."
+        )
         st.markdown("---")
 
     # Main area badge
@@ -457,6 +330,9 @@ if st.session_state.user_name:
     </div>
     """, unsafe_allow_html=True)
 
+    if st.session_state.user_name in ADMIN_USERS and st.session_state.get('audit_view'):
+        render_audit_view()
+
 st.markdown("---")
 
 # Step indicator
@@ -497,11 +373,46 @@ if st.session_state.current_step == 1:
 elif st.session_state.current_step == 2:
     st.markdown('<div class="step-header">📁 Bước 2: Upload các file PDF</div>', unsafe_allow_html=True)
     
+    batch = st.session_state.batch
+    
+    # File đã xử lý: bỏ bớt file không cần đọc lại các file còn lại
+    if len(batch):
+        with st.expander(f"📂 Đã xử lý {len(batch)} file (thêm file mới bên dưới)", expanded=True):
+            for i, name in enumerate(batch.names(), 1):
+                col1, col2 = st.columns([8, 1])
+                with col1:
+                    st.text(f"{i}. {name}")
+                with col2:
+                    if st.button("🗑️", key=f"remove_{name}", help="Bỏ file khỏi batch"):
+                        batch.remove([name], get_ledger())
+                        st.session_state.processed_data = None
+                        log_activity(st.session_state.user_name, "REMOVE", f"Removed {name}")
+                        st.rerun()
+    
+    # Job của người dùng vẫn chạy / giữ kết quả khi đóng trang, có thể mở lại
+    recent_jobs = get_job_runner().jobs(st.session_state.user_name)
+    if recent_jobs:
+        with st.expander("🕘 Lần xử lý gần đây", expanded=False):
+            for job in recent_jobs:
+                col1, col2 = st.columns([8, 1])
+                with col1:
+                    st.text(f"{job.created} · {JOB_STATUS_LABELS.get(job.status, job.status)} · "
+                            f"{job.done}/{job.total} file")
+                with col2:
+                    if st.button("📂", key=f"open_job_{job.id}", help="Mở kết quả (thay cho batch hiện tại)"):
+                        st.session_state.batch = Batch()
+                        st.session_state.processed_data = None
+                        st.session_state.job_id = job.id
+                        st.session_state.session_jobs.append(job.id)
+                        st.session_state.current_step = 3
+                        st.rerun()
+    
     uploaded_files = st.file_uploader(
-        "Kéo thả hoặc chọn các file PDF Credit Note",
-        type=['pdf'],
+        "Kéo thả hoặc chọn các file PDF Credit Note (hoặc file ZIP chứa PDF)",
+        type=['pdf', 'zip'],
         accept_multiple_files=True,
-        help="Bạn có thể upload nhiều file cùng lúc"
+        key=f"uploader_{st.session_state.uploader_key}",
+        help="Bạn có thể upload nhiều file cùng lúc, hoặc một file ZIP (kể cả thư mục con bên trong)"
     )
     
     if uploaded_files:
@@ -510,7 +421,14 @@ elif st.session_state.current_step == 2:
         # Preview file names
         with st.expander("📋 Xem danh sách file", expanded=True):
             for i, f in enumerate(uploaded_files, 1):
-                st.text(f"{i}. {f.name}")
+                if not is_zip(f.name):
+                    st.text(f"{i}. {f.name}")
+                    continue
+                try:
+                    with ZipArchive(f, f.name) as archive:
+                        st.text(f"{i}. 📦 {f.name}: {len(archive)} file PDF")
+                except ArchiveError as e:
+                    st.error(f"⚠️ {f.name}: {e}")
     
     col1, col2 = st.columns(2)
     with col1:
@@ -518,11 +436,25 @@ elif st.session_state.current_step == 2:
             st.session_state.current_step = 1
             st.rerun()
     with col2:
-        if st.button("🚀 Xử lý file", type="primary", use_container_width=True, disabled=not uploaded_files):
-            if uploaded_files:
-                st.session_state.uploaded_files = uploaded_files
+        if st.button("🚀 Xử lý file", type="primary", use_container_width=True,
+                     disabled=not uploaded_files and not len(batch)):
+            try:
+                if uploaded_files:
+                    known = {name: batch_file.digest for name, batch_file in batch.files.items()}
+                    # File được ghi thẳng xuống thư mục job, không đọc hết vào bộ nhớ
+                    st.session_state.job_id = get_job_runner().submit(
+                        st.session_state.user_name, ((f.name, f) for f in uploaded_files), known,
+                        profile=st.session_state.get('profiling', False)
+                    )
+                    st.session_state.session_jobs.append(st.session_state.job_id)
+                    st.session_state.profile_job = None
+            except JobRejected as e:
+                st.error(f"⚠️ Không nhận xử lý: {e}. Vui lòng chia nhỏ batch.")
+            else:
                 st.session_state.current_step = 3
-                log_activity(st.session_state.user_name, "UPLOAD", f"Uploaded {len(uploaded_files)} files")
+                if uploaded_files:
+                    log_activity(st.session_state.user_name, "UPLOAD", f"Uploaded {len(uploaded_files)} files")
+                    st.session_state.uploader_key += 1
                 st.rerun()
 
 
@@ -531,64 +463,95 @@ elif st.session_state.current_step == 2:
 elif st.session_state.current_step == 3:
     st.markdown('<div class="step-header">⚙️ Bước 3: Xử lý dữ liệu</div>', unsafe_allow_html=True)
     
-    uploaded_files = st.session_state.uploaded_files
-    
-    # Progress
-    progress_bar = st.progress(0)
-    status_text = st.empty()
-    
-    # Process PDFs
-    pdf_texts = {}
-    
-    for i, uploaded_file in enumerate(uploaded_files):
-        status_text.text(f"📖 Đang đọc: {uploaded_file.name}...")
-        progress_bar.progress((i + 1) / len(uploaded_files) * 0.4)
-        
-        uploaded_file.seek(0)
-        text = pdf_to_text(uploaded_file)
-        if text:
-            pdf_texts[uploaded_file.name] = text
-    
-    # Parse REBATE
-    status_text.text("🔍 Đang phân tích REBATE files...")
-    progress_bar.progress(0.5)
-    rebate_mapping = parse_rebate_files(pdf_texts)
-    
-    # Extract data
-    all_records = []
-    rebate_count = 0
-    processed_files = []
-    
-    for i, (filename, text) in enumerate(pdf_texts.items()):
-        status_text.text(f"📊 Đang xử lý: {filename}...")
-        progress_bar.progress(0.5 + (i + 1) / len(pdf_texts) * 0.5)
-        
-        records = process_pdf_text(filename, text, rebate_mapping)
-        if records:
-            all_records.extend(records)
-            processed_files.append(filename)
+    batch = st.session_state.batch
+    
+    # Xử lý chạy trong job nền; trang chỉ theo dõi tiến độ nên rerun / mất kết nối không làm gián đoạn
+    job_id = st.session_state.job_id
+    applied = False
+    if job_id is not None:
+        runner = get_job_runner()
+        job = runner.status(job_id)
+        if job is None:
+            st.session_state.job_id = None
+            st.error("⚠️ Không tìm thấy lần xử lý này (có thể đã bị xoá).")
+        elif job.status in ACTIVE_STATUSES:
+            st.progress(job.done / job.total if job.total else 0.0)
+            if job.status == JOB_QUEUED:
+                position = f" (vị trí {job.position} trong hàng đợi)" if job.position else ""
+                st.text(f"⏳ Đang chờ tới lượt xử lý{position}...")
+            else:
+                st.text(f"📖 Đã đọc {job.done}/{job.total} file...")
+                sharing = runner.running_users - 1
+                if sharing > 0:
+                    st.caption(f"Đang chia lượt xử lý với {sharing} người dùng khác")
+            st.caption(f"Mã xử lý: {job.id} · có thể đóng trang, kết quả được giữ trong mục "
+                       f"\"Lần xử lý gần đây\" ở bước 2")
+            time.sleep(JOB_POLL_SECONDS)
+            st.rerun()
         else:
-            rebate_count += 1
-    
-    progress_bar.progress(1.0)
-    status_text.text("✅ Hoàn thành xử lý!")
+            if job.status == JOB_FAILED:
+                st.error(f"⚠️ Xử lý bị lỗi: {job.error}")
+            with st.spinner("🔍 Đang liên kết REBATE..."):
+                # Đọc kết quả từng file từ đĩa, text được bỏ ngay sau khi tạo records
+                batch.add(runner.results(job_id), get_ledger())
+                METRICS.write()
+            st.session_state.job_id = None
+            st.session_state.profile_job = job_id
+            applied = True
+    
+    if batch.failed:
+        st.warning("⚠️ Không đọc được một số file:\n\n" + "\n".join(f"- {name}: {error}" for name, error in batch.failed.items()))
+    if batch.unknown:
+        st.warning("⚠️ Không nhận dạng được loại tài liệu, đã bỏ qua:\n\n" + "\n".join(f"- {f}" for f in batch.unknown))
+    
+    st.progress(1.0)
+    st.text("✅ Hoàn thành xử lý!")
+    
+    profile = load_job_profile(st.session_state.profile_job) if st.session_state.profile_job else None
+    if profile is not None:
+        with st.expander("🔬 Hiệu năng từng file", expanded=True):
+            st.caption("Đo bằng cProfile + tracemalloc trong worker, nên chậm hơn khi chạy bình thường; "
+                       "dùng để so sánh giữa các file / hàm.")
+            st.markdown("**File chậm nhất**")
+            st.dataframe([
+                {'File': f['name'], 'Trang': f['pages'], 'Items': f['items'],
+                 'Đọc PDF (s)': round(f['read_seconds'], 3), 'Parse items (s)': round(f['items_seconds'], 3),
+                 'Bộ nhớ đỉnh (MB)': round(max(f['read_peak_bytes'], f['items_peak_bytes']) / 1e6, 1)}
+                for f in profile.files[:20]
+            ], use_container_width=True)
+            st.markdown("**Hàm tốn thời gian nhất (cộng dồn cả batch)**")
+            st.dataframe([
+                {'Hàm': f['function'], 'Số lần gọi': f['calls'], 'Tổng (s)': round(f['cumtime'], 3),
+                 'Riêng hàm (s)': round(f['tottime'], 3)}
+                for f in profile.functions[:20]
+            ], use_container_width=True)
+            col1, col2 = st.columns(2)
+            with col1:
+                st.download_button("📥 Tải profile (.prof)", data=profile.stats,
+                                   file_name=f"profile_{st.session_state.profile_job}.prof",
+                                   mime="application/octet-stream", use_container_width=True,
+                                   disabled=not profile.stats)
+            with col2:
+                st.download_button("📥 Tải số liệu (JSON)", data=profile.to_json(),
+                                   file_name=f"profile_{st.session_state.profile_job}.json",
+                                   mime="application/json", use_container_width=True)
+    
+    df = batch.dataframe()
+    processed_files = batch.processed_files
+    rebate_count = batch.rebate_count
     
-    if all_records:
-        df = pd.DataFrame(all_records)
-        columns_order = [
-            'Tên file PDF', 'Product', 'Product line', 
-            'Serial', 'Part No', 'FOB', 'CN FOB',
-            'CN Landing', 'Landing cost'
-        ]
-        df = df[columns_order]
-        
+    if df is not None:
+        # Dựng sẵn file Excel trong lúc người dùng xem trước
+        if st.session_state.processed_data is not df or st.session_state.export_key is None:
+            st.session_state.export_key = get_exports().submit(df)
         st.session_state.processed_data = df
         
-        log_activity(
-            st.session_state.user_name, 
-            "PROCESS", 
-            f"Processed {len(processed_files)} files, {len(all_records)} records"
-        )
+        if applied:
+            log_activity(
+                st.session_state.user_name, 
+                "PROCESS", 
+                f"Job {job_id}: processed {len(processed_files)} files, {len(df)} records"
+            )
         
         # Statistics
         st.markdown("### 📊 Thống kê")
@@ -597,7 +560,7 @@ elif st.session_state.current_step == 3:
         with col1:
             st.markdown(f"""
             <div class="stats-card">
-                <div class="stats-number">{len(uploaded_files)}</div>
+                <div class="stats-number">{len(batch)}</div>
                 <div class="stats-label">File upload</div>
             </div>
             """, unsafe_allow_html=True)
@@ -621,17 +584,23 @@ elif st.session_state.current_step == 3:
         with col4:
             st.markdown(f"""
             <div class="stats-card">
-                <div class="stats-number">{len(all_records)}</div>
+                <div class="stats-number">{len(df)}</div>
                 <div class="stats-label">Records</div>
             </div>
             """, unsafe_allow_html=True)
         
         st.markdown("### 👀 Xem trước dữ liệu")
-        st.dataframe(df, use_container_width=True, height=300)
+        st.dataframe(
+            df, use_container_width=True, height=300,
+            column_config={
+                'FOB': st.column_config.NumberColumn(format='%.2f'),
+                'Landing cost': st.column_config.NumberColumn(format='%.2f'),
+            }
+        )
         
         col1, col2 = st.columns(2)
         with col1:
-            if st.button("⬅️ Upload lại", use_container_width=True):
+            if st.button("➕ Thêm / bớt file", use_container_width=True):
                 st.session_state.current_step = 2
                 st.session_state.processed_data = None
                 st.rerun()
@@ -649,6 +618,8 @@ elif st.session_state.current_step == 3:
 # ==================== STEP 4: DOWNLOAD ====================
 
 elif st.session_state.current_step == 4:
+    from asus_cn.export import EXPORT_FORMATS
+
     st.markdown('<div class="step-header">📥 Bước 4: Tải xuống kết quả</div>', unsafe_allow_html=True)
     
     df = st.session_state.processed_data
@@ -656,8 +627,18 @@ elif st.session_state.current_step == 4:
     if df is not None:
         st.success(f"✅ Đã xử lý thành công {len(df)} records!")
         
-        # Generate Excel
-        excel_file = create_excel_with_formatting(df)
+        fmt = st.radio(
+            "Định dạng", list(EXPORT_FORMATS), horizontal=True,
+            format_func=lambda f: EXPORT_FORMATS[f][0]
+        )
+        drop_totals = st.checkbox(
+            "Bỏ dòng TOTAL", value=False, disabled=fmt == 'xlsx',
+            help="Chỉ giữ các dòng item (CSV / Parquet). File Excel luôn có dòng TOTAL để merge ô."
+        )
+        label, mime = EXPORT_FORMATS[fmt]
+        
+        # File Excel đã dựng sẵn từ bước 3 (định dạng khác dựng lúc này nếu chưa có)
+        export_file = get_exports().result(df, st.session_state.export_key, fmt, drop_totals)
         
         # Download info
         col1, col2, col3 = st.columns([1, 2, 1])
@@ -673,16 +654,16 @@ elif st.session_state.current_step == 4:
             
             # Download button
             download_clicked = st.download_button(
-                label="📥 Tải xuống Excel",
-                data=excel_file,
-                file_name=f"extracted_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                label=f"📥 Tải xuống {label}",
+                data=export_file,
+                file_name=f"extracted_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}",
+                mime=mime,
                 type="primary",
                 use_container_width=True
             )
             
             if download_clicked:
-                log_activity(st.session_state.user_name, "DOWNLOAD", f"Downloaded {len(df)} records")
+                log_activity(st.session_state.user_name, "DOWNLOAD", f"Downloaded {len(df)} records ({fmt})")
             
             st.markdown('</div>', unsafe_allow_html=True)
         
@@ -692,16 +673,15 @@ elif st.session_state.current_step == 4:
         with col1:
             if st.button("🔄 Xử lý file mới", use_container_width=True):
                 st.session_state.current_step = 2
-                st.session_state.uploaded_files = []
+                st.session_state.job_id = None
                 st.session_state.processed_data = None
+                st.session_state.batch = Batch()
+                st.session_state.uploader_key += 1
+                st.session_state.profile_job = None
                 st.rerun()
         with col2:
             if st.button("🚪 Đăng xuất", use_container_width=True):
-                log_activity(st.session_state.user_name, "LOGOUT", "User logged out")
-                st.session_state.current_step = 1
-                st.session_state.user_name = ""
-                st.session_state.uploaded_files = []
-                st.session_state.processed_data = None
+                logout()
                 st.rerun()
     else:
         st.error("⚠️ Không có dữ liệu. Vui lòng quay lại bước xử lý.")
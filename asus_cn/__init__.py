@@ -0,0 +1,3 @@
+"""
+ASUS Credit Note PDF Extractor - các module xử lý dùng chung cho app Streamlit
+"""
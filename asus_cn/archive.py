@@ -0,0 +1,167 @@
+"""
+Đọc file PDF trong file ZIP upload (kể cả thư mục lồng nhau).
+
+Danh sách member được kiểm tra từ central directory trước khi giải nén: số
+file, dung lượng giải nén của từng file / cả archive và tỉ lệ nén đều có giới
+hạn để chặn zip bomb. Sau đó từng member được giải nén lần lượt khi pipeline
+cần tới (vào bộ nhớ, hoặc ra file tạm với spool), không bung cả archive ra.
+
+Tên file trong batch là '<tên zip>/<đường dẫn trong zip>'; member trùng tên
+được thêm hậu tố ' (2)', ' (3)'...
+"""
+
+import io
+import os
+import posixpath
+import zipfile
+from pathlib import Path
+from typing import IO, Iterator, NamedTuple, Tuple, Union
+
+READ_CHUNK = 1024 * 1024
+
+
+class ZipLimits(NamedTuple):
+    max_files: int  # số member (kể cả file không phải PDF)
+    max_file_bytes: int  # dung lượng giải nén của một member
+    max_total_bytes: int  # tổng dung lượng giải nén các PDF
+    max_ratio: float  # dung lượng giải nén / dung lượng nén của một member
+
+
+DEFAULT_ZIP_LIMITS = ZipLimits(
+    max_files=int(os.environ.get('ASUS_CN_ZIP_MAX_FILES', 5000)),
+    max_file_bytes=int(os.environ.get('ASUS_CN_ZIP_MAX_FILE_MB', 100)) * 1024 * 1024,
+    max_total_bytes=int(os.environ.get('ASUS_CN_ZIP_MAX_TOTAL_MB', 2048)) * 1024 * 1024,
+    max_ratio=float(os.environ.get('ASUS_CN_ZIP_MAX_RATIO', 100)),
+)
+
+
+class ArchiveError(ValueError):
+    """File ZIP hỏng hoặc vượt giới hạn, không đọc member nào."""
+
+
+def is_zip(name: str) -> bool:
+    return name.lower().endswith('.zip')
+
+
+def _member_path(filename: str) -> str:
+    """Đường dẫn member đã chuẩn hoá, bỏ '..' và gốc tuyệt đối."""
+    parts = filename.replace('\\', '/').split('/')
+    return '/'.join(part for part in parts if part not in ('', '.', '..'))
+
+
+def _unique(name: str, seen: set) -> str:
+    if name not in seen:
+        return name
+    stem, ext = posixpath.splitext(name)
+    n = 2
+    while f"{stem} ({n}){ext}" in seen:
+        n += 1
+    return f"{stem} ({n}){ext}"
+
+
+class ZipArchive:
+    """Các PDF trong một file ZIP; lặp qua archive trả về (tên, bytes) từng file."""
+
+    def __init__(self, file: Union[str, IO[bytes]], name: str, limits: ZipLimits = DEFAULT_ZIP_LIMITS):
+        self.name = name
+        self.limits = limits
+        self.members = []  # [(tên trong batch, ZipInfo)]
+        self.rejected = {}  # tên trong batch -> lý do bỏ qua
+        try:
+            self._zip = zipfile.ZipFile(file)
+        except (zipfile.BadZipFile, OSError) as e:
+            raise ArchiveError(f"không đọc được file ZIP ({e})") from e
+
+        try:
+            self._scan()
+        except ArchiveError:
+            self._zip.close()
+            raise
+
+    def _scan(self):
+        infos = self._zip.infolist()
+        if len(infos) > self.limits.max_files:
+            raise ArchiveError(f"quá nhiều file ({len(infos)} > {self.limits.max_files})")
+
+        seen = set()
+        total = 0
+        for info in infos:
+            path = _member_path(info.filename)
+            if (info.is_dir() or not path.lower().endswith('.pdf') or path.startswith('__MACOSX/')
+                    or posixpath.basename(path).startswith('.')):
+                continue
+            name = _unique(f"{self.name}/{path}", seen)
+            seen.add(name)
+
+            if info.flag_bits & 0x1:
+                self.rejected[name] = "file được mã hoá"
+            elif info.file_size > self.limits.max_file_bytes:
+                self.rejected[name] = f"quá lớn ({info.file_size / 1e6:.0f} MB)"
+            elif info.file_size > self.limits.max_ratio * max(info.compress_size, 1):
+                self.rejected[name] = f"tỉ lệ nén bất thường ({info.file_size}/{info.compress_size} byte)"
+            else:
+                total += info.file_size
+                self.members.append((name, info))
+
+        if total > self.limits.max_total_bytes:
+            raise ArchiveError(
+                f"dung lượng giải nén quá lớn ({total / 1e6:.0f} MB "
+                f"> {self.limits.max_total_bytes / 1e6:.0f} MB)"
+            )
+        self._count = len(seen)
+
+    def __len__(self) -> int:
+        """Số file PDF trong archive, kể cả file bị bỏ qua."""
+        return self._count
+
+    def _copy(self, info: zipfile.ZipInfo, out: IO[bytes]):
+        """Giải nén một member vào out, dừng nếu vượt dung lượng khai báo trong central directory."""
+        limit = min(info.file_size, self.limits.max_file_bytes)
+        size = 0
+        with self._zip.open(info) as f:
+            while True:
+                chunk = f.read(READ_CHUNK)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > limit:
+                    raise ArchiveError(f"dung lượng giải nén vượt {limit} byte")
+                out.write(chunk)
+
+    def __iter__(self) -> Iterator[Tuple[str, bytes]]:
+        """(tên, bytes) của từng PDF; member lỗi khi giải nén được ghi vào rejected."""
+        for name, info in self.members:
+            out = io.BytesIO()
+            try:
+                self._copy(info, out)
+            except (ArchiveError, zipfile.BadZipFile, RuntimeError, OSError, EOFError) as e:
+                self.rejected[name] = str(e)
+                continue
+            yield name, out.getvalue()
+
+    def spool(self, directory) -> Iterator[Tuple[str, str]]:
+        """
+        (tên, đường dẫn) của từng PDF, giải nén lần lượt ra file trong directory.
+        Nơi gọi xoá file khi dùng xong.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        for i, (name, info) in enumerate(self.members):
+            path = directory / f"{i:05d}.pdf"
+            try:
+                with open(path, 'wb') as out:
+                    self._copy(info, out)
+            except (ArchiveError, zipfile.BadZipFile, RuntimeError, OSError, EOFError) as e:
+                path.unlink(missing_ok=True)
+                self.rejected[name] = str(e)
+                continue
+            yield name, str(path)
+
+    def close(self):
+        self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,230 @@
+"""
+Nhật ký hoạt động (audit log) của người dùng, lưu bền trên đĩa.
+
+record() chỉ đưa sự kiện vào bộ đệm trong bộ nhớ rồi trả về ngay. Một thread nền
+ghi bộ đệm theo lô (mỗi FLUSH_INTERVAL giây, hoặc sớm hơn khi đủ FLUSH_BATCH sự
+kiện) trong một transaction, kèm dòng log ra console như trước. Mỗi tháng có một
+file SQLite riêng (audit-YYYY-MM.sqlite3 trong ASUS_CN_AUDIT_DIR); file cũ hơn
+ASUS_CN_AUDIT_RETENTION_MONTHS tháng bị xoá. Index theo thời gian, người dùng và
+thao tác giúp query() lọc nhanh khi làm báo cáo cuối tháng.
+"""
+
+import atexit
+import csv
+import io
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import List, NamedTuple, Optional
+
+DEFAULT_AUDIT_DIR = Path(
+    os.environ.get('ASUS_CN_AUDIT_DIR', Path.home() / '.asus_cn' / 'audit')
+)
+# Số tháng giữ lại (tính cả tháng hiện tại)
+AUDIT_RETENTION_MONTHS = int(os.environ.get('ASUS_CN_AUDIT_RETENTION_MONTHS', 24))
+# Ghi bộ đệm xuống đĩa tối đa sau bấy nhiêu giây, hoặc ngay khi đủ FLUSH_BATCH sự kiện
+FLUSH_INTERVAL = 1.0
+FLUSH_BATCH = 200
+# Bộ đệm tối đa khi không ghi được xuống đĩa; vượt thì bỏ sự kiện cũ nhất
+MAX_PENDING = 100_000
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    time TEXT NOT NULL,
+    user TEXT NOT NULL,
+    action TEXT NOT NULL,
+    details TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_time ON events (time);
+CREATE INDEX IF NOT EXISTS idx_events_user ON events (user, time);
+CREATE INDEX IF NOT EXISTS idx_events_action ON events (action, time);
+"""
+
+
+class AuditEvent(NamedTuple):
+    time: str  # 'YYYY-MM-DD HH:MM:SS'
+    user: str
+    action: str
+    details: str = ""
+
+
+def _month_index(month: str) -> int:
+    year, month = month.split('-')
+    return int(year) * 12 + int(month) - 1
+
+
+class AuditLog:
+    """Audit log dùng chung cho cả process; ghi nền theo lô vào SQLite theo tháng."""
+
+    def __init__(self, root=DEFAULT_AUDIT_DIR, retention_months: int = AUDIT_RETENTION_MONTHS,
+                 flush_interval: float = FLUSH_INTERVAL, flush_batch: int = FLUSH_BATCH):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.retention_months = retention_months
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self._cond = threading.Condition()
+        self._pending = []  # AuditEvent chờ ghi, theo thứ tự record
+        self._writing = 0  # số sự kiện thread nền đang ghi
+        self._flush_requested = False
+        self._dropped = 0
+        self._ready = set()  # các tháng đã tạo schema trong process này
+        self._month = None
+        threading.Thread(target=self._loop, name='asus-cn-audit', daemon=True).start()
+        # Ghi nốt bộ đệm khi process thoát bình thường
+        atexit.register(self.flush)
+
+    def record(self, user: str, action: str, details: str = ""):
+        """Thêm một sự kiện; không chờ ghi xuống đĩa."""
+        event = AuditEvent(datetime.now().strftime(TIME_FORMAT), user, action, details)
+        with self._cond:
+            if len(self._pending) >= MAX_PENDING:
+                del self._pending[0]
+                self._dropped += 1
+            self._pending.append(event)
+            if len(self._pending) >= self.flush_batch:
+                self._cond.notify_all()
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Chờ tới khi mọi sự kiện đã record được ghi xuống đĩa; False nếu quá timeout."""
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: not self._pending and not self._writing, timeout)
+
+    def _path(self, month: str) -> Path:
+        return self.root / f"audit-{month}.sqlite3"
+
+    @contextmanager
+    def _connect(self, path: Path):
+        conn = sqlite3.connect(path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: len(self._pending) >= self.flush_batch or self._flush_requested,
+                    timeout=self.flush_interval
+                )
+                batch, self._pending = self._pending, []
+                self._writing = len(batch)
+                self._flush_requested = False
+                dropped, self._dropped = self._dropped, 0
+            if dropped:
+                logging.warning(f"Audit log buffer full, dropped {dropped} oldest events")
+
+            failed = False
+            if batch:
+                try:
+                    self._write(batch)
+                except (OSError, sqlite3.Error) as e:
+                    logging.warning(f"Audit log write failed, retrying {len(batch)} events: {e}")
+                    failed = True
+            with self._cond:
+                if failed:
+                    self._pending[:0] = batch
+                self._writing = 0
+                self._cond.notify_all()
+            if failed:
+                time.sleep(self.flush_interval)
+
+    def _write(self, batch: List[AuditEvent]):
+        by_month = {}
+        for event in batch:
+            by_month.setdefault(event.time[:7], []).append(event)
+        for month, events in by_month.items():
+            with self._connect(self._path(month)) as conn:
+                if month not in self._ready:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.executescript(SCHEMA)
+                conn.executemany(
+                    "INSERT INTO events (time, user, action, details) VALUES (?, ?, ?, ?)", events
+                )
+            self._ready.add(month)
+            if month != self._month:
+                self._month = month
+                self._cleanup()
+        # Giữ dòng log console (Streamlit Cloud logs), nhưng ngoài lượt chạy script
+        for event in batch:
+            logging.info(f"User: {event.user} | Action: {event.action} | {event.details}")
+
+    def _months(self) -> List[str]:
+        """Các tháng có file audit, mới nhất trước."""
+        months = []
+        for path in self.root.glob('audit-*.sqlite3'):
+            month = path.name[len('audit-'):-len('.sqlite3')]
+            try:
+                _month_index(month)
+            except ValueError:
+                continue
+            months.append(month)
+        return sorted(months, reverse=True)
+
+    def _cleanup(self):
+        """Xoá file của các tháng quá AUDIT_RETENTION_MONTHS."""
+        oldest = _month_index(datetime.now().strftime('%Y-%m')) - self.retention_months + 1
+        for month in self._months():
+            if _month_index(month) < oldest:
+                for suffix in ('', '-wal', '-shm'):
+                    Path(f"{self._path(month)}{suffix}").unlink(missing_ok=True)
+                self._ready.discard(month)
+
+    def query(self, user: Optional[str] = None, action: Optional[str] = None,
+              start: Optional[date] = None, end: Optional[date] = None,
+              limit: Optional[int] = None) -> List[AuditEvent]:
+        """
+        Các sự kiện khớp bộ lọc (ngày start tới hết ngày end), mới nhất trước.
+        Sự kiện còn trong bộ đệm được ghi xuống trước khi đọc.
+        """
+        self.flush()
+        clauses, params = [], []
+        if user:
+            clauses.append("user = ?")
+            params.append(user)
+        if action:
+            clauses.append("action = ?")
+            params.append(action)
+        if start:
+            clauses.append("time >= ?")
+            params.append(start.strftime('%Y-%m-%d'))
+        if end:
+            clauses.append("time < ?")
+            params.append((end + timedelta(days=1)).strftime('%Y-%m-%d'))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        events = []
+        for month in self._months():
+            if start and month < start.strftime('%Y-%m') or end and month > end.strftime('%Y-%m'):
+                continue
+            remaining = -1 if limit is None else limit - len(events)
+            with self._connect(self._path(month)) as conn:
+                rows = conn.execute(
+                    f"SELECT time, user, action, details FROM events {where} "
+                    f"ORDER BY time DESC, id DESC LIMIT ?", [*params, remaining]
+                )
+                events.extend(AuditEvent(*row) for row in rows)
+            if limit is not None and len(events) >= limit:
+                break
+        return events
+
+
+def to_csv(events: List[AuditEvent]) -> str:
+    """Các sự kiện dạng CSV (có dòng tiêu đề) để tải về làm báo cáo."""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(AuditEvent._fields)
+    writer.writerows(events)
+    return out.getvalue()
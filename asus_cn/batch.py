@@ -0,0 +1,213 @@
+"""
+Batch file đang làm việc, thêm / bớt file mà không xử lý lại toàn bộ.
+
+Mỗi file chỉ giữ phần đã parse (header + items của Credit Note, các cặp
+invoice / landing cost của REBATE) cùng các record đã tạo. Khi thêm hoặc bỏ
+một file REBATE, chỉ các Credit Note có invoice bị ảnh hưởng được liên kết
+lại; thêm hoặc bỏ một Credit Note chỉ thêm / bỏ các dòng (và dòng TOTAL) của
+chính file đó.
+
+Tài liệu mới được ghi vào sổ cái ngay khi thêm; file bị bỏ (hoặc bị thay bằng
+file cùng tên) không còn được tra từ sổ cái trong batch này, và nếu chính batch
+này đã ghi nó vào sổ cái thì nó bị xoá khỏi sổ.
+
+pandas / numpy (records) chỉ được import khi batch có Credit Note cần tạo record,
+nên tạo Batch rỗng (lúc đăng nhập) không kéo theo các thư viện này.
+"""
+
+from typing import Iterable, NamedTuple
+
+from asus_cn.classify import DOC_REBATE, DOC_UNKNOWN
+from asus_cn.metrics import METRICS
+from asus_cn.parsing import parse_header, parse_rebate_text
+from asus_cn.pipeline import ExtractedFile
+
+# Số tài liệu ghi vào sổ cái mỗi lần, để text của các file không phải giữ tới cuối batch
+LEDGER_CHUNK = 200
+
+
+class BatchFile(NamedTuple):
+    name: str
+    digest: str
+    doc_type: str
+    header: dict  # Credit Note: cn_no / product_line / total; REBATE: cn_no
+    items: list  # Credit Note: items; REBATE: [(invoice, landing cost)]
+
+
+class Batch:
+    """Các file của một lần xử lý, theo thứ tự thêm vào."""
+
+    def __init__(self):
+        self.files = {}  # tên file -> BatchFile
+        self.failed = {}  # tên file -> lý do lỗi
+        self.unknown = []
+        self._records = {}  # tên Credit Note -> records
+        self._invoice_files = {}  # invoice -> tên các Credit Note có invoice đó
+        self._rebate_mapping = {}  # từ các REBATE trong batch
+        self._ledger_mapping = {}  # invoice -> kết quả tra sổ cái (None nếu không có)
+        self._ledger_digests = set()  # tài liệu do batch này ghi mới vào sổ cái
+        self._removed_digests = set()  # tài liệu đã bỏ khỏi batch, không tra từ sổ cái
+        self._dataframe = None
+
+    def __len__(self) -> int:
+        return len(self.files) + len(self.failed) + len(self.unknown)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.files or name in self.failed or name in self.unknown
+
+    def names(self) -> list:
+        return [*self.files, *self.failed, *self.unknown]
+
+    def has(self, name: str, digest: str) -> bool:
+        """File cùng tên và cùng nội dung đã có trong batch."""
+        batch_file = self.files.get(name)
+        return batch_file is not None and batch_file.digest == digest
+
+    def add(self, extracted_files: Iterable[ExtractedFile], ledger=None, record: bool = True) -> None:
+        """
+        Thêm các file đã trích xuất (file trùng tên được thay thế). Các tài liệu
+        mới được ghi vào sổ cái nếu có (record=False: chỉ tra REBATE trong sổ cái,
+        không ghi). Chỉ header / items được giữ lại, text của từng file được bỏ
+        ngay khi không còn cần.
+        """
+        affected = set()
+        added = []
+        documents = []
+        for extracted in extracted_files:
+            affected |= self._discard(extracted.name)
+            entry = extracted.entry
+            if entry is None:
+                self.failed[extracted.name] = extracted.error
+                continue
+            if entry['doc_type'] == DOC_UNKNOWN:
+                self.unknown.append(extracted.name)
+                continue
+
+            if ledger is not None and record:
+                documents.append((extracted.digest, extracted.name, entry['doc_type'], entry['text'], entry['items']))
+                if len(documents) >= LEDGER_CHUNK:
+                    self._ledger_digests |= ledger.add_documents(documents)
+                    documents = []
+            self._removed_digests.discard(extracted.digest)
+            if entry['doc_type'] == DOC_REBATE:
+                with METRICS.stage('rebate_parse', files=1, file=extracted.name) as info:
+                    cn_no, rebates = parse_rebate_text(entry['text'])
+                    info['rows'] = len(rebates)
+                batch_file = BatchFile(extracted.name, extracted.digest, DOC_REBATE, {'cn_no': cn_no}, rebates)
+                affected.update(invoice for invoice, _ in rebates)
+            else:
+                batch_file = BatchFile(
+                    extracted.name, extracted.digest, entry['doc_type'],
+                    parse_header(entry['text']), entry['items']
+                )
+                for item in batch_file.items:
+                    self._invoice_files.setdefault(item.get('Invoice', ''), set()).add(extracted.name)
+                added.append(extracted.name)
+            self.files[extracted.name] = batch_file
+
+        if ledger is not None and documents:
+            self._ledger_digests |= ledger.add_documents(documents)
+        self._forget(ledger)
+        self._relink(affected, added, ledger)
+
+    def remove(self, names: Iterable[str], ledger=None) -> None:
+        """Bỏ các file khỏi batch; chỉ liên kết lại Credit Note có invoice bị ảnh hưởng."""
+        affected = set()
+        for name in names:
+            affected |= self._discard(name)
+        self._forget(ledger)
+        self._relink(affected, [], ledger)
+
+    def _discard(self, name: str) -> set:
+        """Bỏ một file, trả về các invoice cần liên kết lại."""
+        self.failed.pop(name, None)
+        if name in self.unknown:
+            self.unknown.remove(name)
+        batch_file = self.files.pop(name, None)
+        if batch_file is None:
+            return set()
+
+        self._dataframe = None
+        if all(other.digest != batch_file.digest for other in self.files.values()):
+            self._removed_digests.add(batch_file.digest)
+        if batch_file.doc_type == DOC_REBATE:
+            invoices = {invoice for invoice, _ in batch_file.items}
+            # Kết quả tra sổ cái cũ có thể đến từ chính file này
+            for invoice in invoices:
+                self._ledger_mapping.pop(invoice, None)
+            return invoices
+        self._records.pop(name, None)
+        for item in batch_file.items:
+            names = self._invoice_files.get(item.get('Invoice', ''))
+            if names is not None:
+                names.discard(name)
+                if not names:
+                    del self._invoice_files[item.get('Invoice', '')]
+        return set()
+
+    def _forget(self, ledger=None) -> None:
+        """Xoá khỏi sổ cái các tài liệu batch này đã ghi nhưng nay đã bị bỏ."""
+        stale = self._removed_digests & self._ledger_digests
+        if ledger is not None and stale:
+            ledger.remove_documents(stale)
+            self._ledger_digests -= stale
+
+    def _relink(self, affected: set, added: list, ledger=None) -> None:
+        if affected:
+            # Cùng thứ tự ưu tiên với parse_rebate_files: REBATE thêm sau thắng
+            mapping = {}
+            for batch_file in self.files.values():
+                if batch_file.doc_type == DOC_REBATE:
+                    for invoice, amount in batch_file.items:
+                        mapping[invoice] = {'CN_Landing': batch_file.header['cn_no'], 'Landing_cost': amount}
+            self._rebate_mapping = mapping
+
+        names = set(added)
+        for invoice in affected:
+            names.update(self._invoice_files.get(invoice, ()))
+        if not names:
+            return
+
+        if ledger is not None:
+            invoices = {
+                item.get('Invoice', '') for name in names for item in self.files[name].items
+            } - self._rebate_mapping.keys() - self._ledger_mapping.keys()
+            found = ledger.rebate_mapping(invoices, self._removed_digests)
+            self._ledger_mapping.update({invoice: found.get(invoice) for invoice in invoices if invoice})
+
+        from asus_cn.records import link_records
+
+        with METRICS.stage('records', files=len(names)) as info:
+            # REBATE trong batch được ưu tiên hơn kết quả tra sổ cái
+            mapping = {**self._ledger_mapping, **self._rebate_mapping}
+            names = list(names)
+            records = link_records(
+                [(name, self.files[name].header, self.files[name].items) for name in names], mapping
+            )
+            self._records.update(zip(names, records))
+            info['rows'] = sum(map(len, records))
+        self._dataframe = None
+
+    @property
+    def processed_files(self) -> list:
+        """Các Credit Note có dữ liệu, theo thứ tự thêm vào."""
+        return [name for name in self.files if self._records.get(name)]
+
+    @property
+    def rebate_count(self) -> int:
+        """REBATE và các file không có item nào."""
+        return sum(1 for name in self.files if not self._records.get(name))
+
+    def records(self) -> list:
+        """FileRecords của các Credit Note có dữ liệu, theo thứ tự thêm vào."""
+        return [self._records[name] for name in self.processed_files]
+
+    def dataframe(self):
+        """DataFrame kết quả của cả batch, None nếu chưa có record nào."""
+        from asus_cn.records import records_to_dataframe
+
+        if self._dataframe is None:
+            records = self.records()
+            if records:
+                self._dataframe = records_to_dataframe(records)
+        return self._dataframe
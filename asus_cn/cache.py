@@ -0,0 +1,151 @@
+"""
+Cache kết quả trích xuất PDF theo SHA-256 nội dung file.
+
+Mỗi entry (text + items đã parse) được giữ trong bộ nhớ theo LRU có giới hạn
+dung lượng, đồng thời ghi xuống đĩa để dùng lại giữa các session / lần chạy.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+DEFAULT_CACHE_DIR = Path(
+    os.environ.get('ASUS_CN_CACHE_DIR', Path(tempfile.gettempdir()) / 'asus_cn_cache')
+)
+DEFAULT_MAX_MEMORY_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_DISK_BYTES = 1024 * 1024 * 1024
+
+
+def file_digest(data: bytes) -> str:
+    """Trả về SHA-256 (hex) của nội dung file."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def path_digest(path) -> str:
+    """Trả về SHA-256 (hex) của file trên đĩa, đọc theo từng khối."""
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+
+class ExtractionCache:
+    """LRU cache hai tầng (bộ nhớ + đĩa), an toàn khi dùng từ nhiều thread."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR,
+                 max_memory_bytes: int = DEFAULT_MAX_MEMORY_BYTES,
+                 max_disk_bytes: int = DEFAULT_MAX_DISK_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # digest -> (entry, size)
+        self._memory_bytes = 0
+        self._disk_bytes = sum(p.stat().st_size for p in self.cache_dir.glob('*/*.json'))
+
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, digest: str) -> Path:
+        return self.cache_dir / digest[:2] / f"{digest}.json"
+
+    def get(self, digest: str):
+        """Trả về entry đã cache hoặc None."""
+        with self._lock:
+            if digest in self._memory:
+                self._memory.move_to_end(digest)
+                self.hits += 1
+                return self._memory[digest][0]
+
+        path = self._path(digest)
+        try:
+            payload = path.read_bytes()
+            entry = json.loads(payload)
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+            self._remember(digest, entry, len(payload))
+        return entry
+
+    def put(self, digest: str, entry: dict):
+        """Lưu entry vào bộ nhớ và ghi xuống đĩa."""
+        payload = json.dumps(entry, ensure_ascii=False).encode('utf-8')
+        path = self._path(digest)
+        try:
+            path.parent.mkdir(exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            existed = path.exists()
+            old_size = path.stat().st_size if existed else 0
+            os.replace(tmp_name, path)
+        except OSError as e:
+            logging.warning(f"Extraction cache: cannot write {path}: {e}")
+        else:
+            with self._lock:
+                self._disk_bytes += len(payload) - old_size
+                over_budget = self._disk_bytes > self.max_disk_bytes
+            if over_budget:
+                self._evict_disk()
+
+        with self._lock:
+            self._remember(digest, entry, len(payload))
+
+    def _remember(self, digest: str, entry: dict, size: int):
+        # Gọi khi đang giữ self._lock
+        if digest in self._memory:
+            self._memory_bytes -= self._memory.pop(digest)[1]
+        if size > self.max_memory_bytes:
+            return
+        self._memory[digest] = (entry, size)
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_memory_bytes:
+            _, (_, evicted_size) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted_size
+
+    def _evict_disk(self):
+        """Xóa các file ít được dùng nhất (theo mtime) cho tới khi dưới giới hạn."""
+        files = []
+        for p in self.cache_dir.glob('*/*.json'):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, p))
+        files.sort()
+
+        total = sum(size for _, size, _ in files)
+        target = self.max_disk_bytes * 0.9
+        for _, size, p in files:
+            if total <= target:
+                break
+            try:
+                p.unlink()
+            except OSError:
+                continue
+            total -= size
+
+        with self._lock:
+            self._disk_bytes = total
+
+    def clear(self):
+        """Xóa toàn bộ cache (bộ nhớ và đĩa)."""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            for p in self.cache_dir.glob('*/*.json'):
+                try:
+                    p.unlink()
+                except OSError:
+                    pass
+            self._disk_bytes = 0
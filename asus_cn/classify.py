@@ -0,0 +1,96 @@
+"""
+Phân loại tài liệu theo trang đầu: REBATE, Credit Note có item, hoặc không xác định.
+
+Chỉ trang 1 được đọc (qua layout ký tự, không cần extract_text) để quyết định
+loại; sau đó mỗi loại được đọc bằng cách nhẹ nhất phù hợp:
+- REBATE: chỉ giữ dòng CN NO và các dòng REBATE FOR INVOICE của mọi trang
+- Credit Note: pages_text theo chế độ đọc đã chọn ('full' / 'regions')
+- Không xác định: không đọc thêm, file được đưa vào danh sách cách ly
+"""
+
+import re
+from typing import Optional, Tuple
+
+from asus_cn.extract import DEFAULT_EXTRACT_MODE, TABLE_HEADER_ANCHOR, line_signature, page_lines, pages_text
+from asus_cn.parsing import ITEM_RE
+
+DOC_CREDIT_NOTE = 'CREDIT_NOTE'
+DOC_REBATE = 'REBATE'
+DOC_UNKNOWN = 'UNKNOWN'
+
+REBATE_MARKER = 'REBATE FOR INVOICE:'
+REBATE_ANCHOR = line_signature(REBATE_MARKER)
+CN_NO_ANCHOR = 'CNNO'
+CN_NO_RE = re.compile(r'CN NO\s*:\s*\d+')
+
+
+def classify_lines(lines: list) -> str:
+    """Phân loại từ các dòng (top, bottom, text) của trang đầu."""
+    is_credit_note = False
+    for _, _, text in lines:
+        signature = line_signature(text)
+        if REBATE_ANCHOR in signature:
+            return DOC_REBATE
+        if (signature.startswith((CN_NO_ANCHOR, TABLE_HEADER_ANCHOR))
+                or ITEM_RE.match(text.strip())):
+            is_credit_note = True
+    return DOC_CREDIT_NOTE if is_credit_note else DOC_UNKNOWN
+
+
+def classify_text(text: str) -> str:
+    """Phân loại từ text đã trích xuất (dùng cho entry cache cũ chưa có loại)."""
+    if REBATE_MARKER in text:
+        return DOC_REBATE
+    if CN_NO_RE.search(text) or any(ITEM_RE.match(line.strip()) for line in text.split('\n')):
+        return DOC_CREDIT_NOTE
+    return DOC_UNKNOWN
+
+
+def _rebate_text(pdf, first_lines: list, pages: Optional[range] = None) -> str:
+    text_content = []
+    for index in pages if pages is not None else range(len(pdf.pages)):
+        page_num = index + 1
+        lines = first_lines if page_num == 1 else page_lines(pdf.pages[index])
+        kept = []
+        after_rebate = False
+        for _, _, text in lines:
+            signature = line_signature(text)
+            is_rebate = REBATE_ANCHOR in signature
+            # Giữ cả dòng ngay sau REBATE FOR INVOICE: số tiền có thể bị xuống dòng
+            if is_rebate or after_rebate or signature.startswith(CN_NO_ANCHOR):
+                kept.append(text)
+            after_rebate = is_rebate
+        if kept:
+            text_content.append(f"=== PAGE {page_num} ===")
+            text_content.extend(kept)
+            text_content.append("")
+    return "\n".join(text_content)
+
+
+def read_document(pdf_file, mode: str = DEFAULT_EXTRACT_MODE,
+                  pages: Optional[range] = None) -> Tuple[str, str, int]:
+    """
+    Phân loại theo trang đầu rồi đọc bằng parser phù hợp. Trả về (loại, text, số trang).
+    pages: chỉ đọc các trang này (một phần của file lớn), loại vẫn theo trang đầu.
+    Lỗi đọc PDF được ném ra để nơi gọi ghi nhận lý do cho từng file.
+    """
+    import pdfplumber
+
+    with pdfplumber.open(pdf_file) as pdf:
+        page_count = len(pdf.pages)
+        if not page_count:
+            return DOC_UNKNOWN, "", 0
+        if pages is not None:
+            pages = range(pages.start, min(pages.stop, page_count))
+            page_count = len(pages)
+        first_lines = page_lines(pdf.pages[0])
+        doc_type = classify_lines(first_lines)
+        if doc_type == DOC_REBATE:
+            return doc_type, _rebate_text(pdf, first_lines, pages), page_count
+        if doc_type == DOC_CREDIT_NOTE:
+            text = pages_text(pdf, mode, first_lines, pages)
+            # REBATE có trang bìa giống Credit Note: nhận ra sau khi đã đọc toàn bộ
+            if REBATE_MARKER in text:
+                return DOC_REBATE, text, page_count
+            return doc_type, text, page_count
+        return doc_type, "", page_count
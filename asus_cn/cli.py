@@ -0,0 +1,195 @@
+"""
+Chạy trích xuất Credit Note không cần giao diện (cron / batch lớn).
+
+    python -m asus_cn extract <thư mục hoặc file PDF>... -o out.xlsx --workers N
+    python -m asus_cn serve --port 8765
+    python -m asus_cn watch <thư mục PDF> -o out.csv --excel out.xlsx
+
+Định dạng đầu ra theo đuôi file (.xlsx / .csv / .parquet) hoặc --format.
+serve chạy HTTP API cục bộ (xem asus_cn.server); watch theo dõi thư mục và
+ghi nối kết quả của các PDF mới (xem asus_cn.watch).
+"""
+
+import argparse
+import logging
+import shutil
+import time
+from pathlib import Path
+
+from asus_cn.batch import Batch
+from asus_cn.cache import DEFAULT_CACHE_DIR, ExtractionCache
+from asus_cn.classify import DOC_UNKNOWN
+from asus_cn.export import EXPORT_FORMATS, format_for_path, write_rows
+from asus_cn.extract import DEFAULT_EXTRACT_MODE, EXTRACT_MODES
+from asus_cn.parallel import DEFAULT_WORKERS
+from asus_cn.ledger import DEFAULT_LEDGER_PATH, Ledger
+from asus_cn.metrics import DEFAULT_METRICS_FILE, METRICS
+from asus_cn.pipeline import iter_extracted, iter_pdf_paths
+from asus_cn.records import iter_rows
+
+
+def run_extract(args) -> int:
+    started = time.perf_counter()
+    cache = None if args.no_cache else ExtractionCache(args.cache_dir)
+    if args.metrics_file:
+        METRICS.path = Path(args.metrics_file)
+
+    paths = {}
+
+    def sources():
+        for name, path in iter_pdf_paths(args.inputs):
+            paths[name] = path
+            yield name, path
+
+    extracted_files = []
+    for extracted in iter_extracted(sources(), cache=cache, workers=args.workers, mode=args.mode):
+        entry = extracted.entry
+        if entry is None:
+            logging.warning(f"Cannot read {extracted.name}: {extracted.error}")
+        elif entry['doc_type'] == DOC_UNKNOWN:
+            logging.warning(f"Unknown document type: {extracted.name}")
+            if args.quarantine:
+                quarantine_path = Path(args.quarantine) / extracted.name
+                quarantine_path.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(paths[extracted.name], quarantine_path)
+        extracted_files.append(extracted)
+
+    # Giữ thứ tự file ổn định giữa các lần chạy
+    extracted_files.sort(key=lambda e: e.name)
+    ledger = None if args.no_ledger else Ledger(args.ledger)
+    batch = Batch()
+    batch.add(extracted_files, ledger)
+
+    records = batch.records()
+    if not records:
+        METRICS.write()
+        logging.error("No records extracted")
+        return 1
+
+    # Ghi thẳng từ record của từng file, không dựng DataFrame
+    output = Path(args.output)
+    fmt = args.format or format_for_path(output)
+    row_count = sum(map(len, records))
+    with METRICS.stage('excel' if fmt == 'xlsx' else fmt, files=len(records), rows=row_count):
+        write_rows(iter_rows(records), output, fmt, args.drop_totals)
+    METRICS.write()
+
+    logging.info(
+        f"Processed {len(batch.processed_files)} files, {batch.rebate_count} REBATE files, "
+        f"{len(batch.unknown)} unknown, {len(batch.failed)} failed, {row_count} records -> {output} "
+        f"({time.perf_counter() - started:.1f}s)"
+    )
+    return 0
+
+
+def run_serve(args) -> int:
+    from asus_cn.jobs import JobRunner
+    from asus_cn.server import make_server
+
+    if args.metrics_file:
+        METRICS.path = Path(args.metrics_file)
+    cache = None if args.no_cache else ExtractionCache(args.cache_dir)
+    ledger = None if args.no_ledger else Ledger(args.ledger)
+    runner = JobRunner(args.jobs_dir, cache=cache, workers=args.workers, mode=args.mode)
+    server = make_server(args.host, args.port, runner, ledger)
+    logging.info(f"Serving on http://{args.host}:{server.server_address[1]} ({runner.scheduler.workers} workers)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+def run_watch(args) -> int:
+    from asus_cn.watch import FolderWatcher
+
+    if args.metrics_file:
+        METRICS.path = Path(args.metrics_file)
+    fmt = args.format or format_for_path(args.output)
+    try:
+        watcher = FolderWatcher(
+            args.folder, args.output, fmt, excel=args.excel,
+            cache=None if args.no_cache else ExtractionCache(args.cache_dir),
+            ledger=None if args.no_ledger else Ledger(args.ledger),
+            workers=args.workers, mode=args.mode, interval=args.interval, drop_totals=args.drop_totals
+        )
+    except ValueError as e:
+        logging.error(str(e))
+        return 2
+    try:
+        watcher.run(once=args.once)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m asus_cn', description='ASUS Credit Note PDF Extractor')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    extract = subparsers.add_parser('extract', help='Trích xuất thư mục PDF ra Excel / CSV / Parquet')
+    extract.add_argument('inputs', nargs='+', help='Thư mục (quét đệ quy) hoặc file PDF')
+    extract.add_argument('-o', '--output', required=True, help='File đầu ra (.xlsx, .csv hoặc .parquet)')
+    extract.add_argument('--format', choices=EXPORT_FORMATS, help='Định dạng đầu ra (mặc định theo đuôi file)')
+    extract.add_argument('--drop-totals', action='store_true', help='Bỏ dòng TOTAL (CSV / Parquet)')
+    extract.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Số process đọc PDF song song')
+    extract.add_argument('--mode', choices=EXTRACT_MODES, default=DEFAULT_EXTRACT_MODE,
+                         help="Cách đọc PDF: 'full' (toàn bộ text) hoặc 'regions' (chỉ các vùng cần thiết)")
+    extract.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='Thư mục cache kết quả trích xuất')
+    extract.add_argument('--quarantine', help='Chép các file không nhận dạng được vào thư mục này')
+    extract.add_argument('--no-cache', action='store_true', help='Không dùng cache')
+    extract.add_argument('--ledger', default=DEFAULT_LEDGER_PATH, help='File SQLite sổ cái REBATE / Credit Note')
+    extract.add_argument('--no-ledger', action='store_true', help='Chỉ liên kết REBATE trong batch này')
+    extract.add_argument('--metrics-file', default=DEFAULT_METRICS_FILE,
+                         help='Ghi số liệu theo Prometheus text format (textfile collector)')
+    extract.set_defaults(func=run_extract)
+
+    from asus_cn.server import DEFAULT_API_JOBS_DIR, DEFAULT_HOST, DEFAULT_PORT
+
+    serve = subparsers.add_parser('serve', help='HTTP API: upload PDF, poll job, lấy records JSON / CSV / Excel')
+    serve.add_argument('--host', default=DEFAULT_HOST, help='Địa chỉ lắng nghe (mặc định chỉ máy này)')
+    serve.add_argument('--port', type=int, default=DEFAULT_PORT)
+    serve.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                       help='Số process đọc PDF, dùng chung cho mọi client')
+    serve.add_argument('--mode', choices=EXTRACT_MODES, default=DEFAULT_EXTRACT_MODE,
+                       help="Cách đọc PDF: 'full' (toàn bộ text) hoặc 'regions' (chỉ các vùng cần thiết)")
+    serve.add_argument('--jobs-dir', default=DEFAULT_API_JOBS_DIR, help='Thư mục lưu file upload và kết quả job')
+    serve.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='Thư mục cache kết quả trích xuất')
+    serve.add_argument('--no-cache', action='store_true', help='Không dùng cache')
+    serve.add_argument('--ledger', default=DEFAULT_LEDGER_PATH, help='File SQLite sổ cái REBATE / Credit Note')
+    serve.add_argument('--no-ledger', action='store_true', help='Chỉ liên kết REBATE trong từng job')
+    serve.add_argument('--metrics-file', default=DEFAULT_METRICS_FILE,
+                       help='Ghi số liệu theo Prometheus text format (textfile collector)')
+    serve.set_defaults(func=run_serve)
+
+    from asus_cn.watch import DEFAULT_INTERVAL, WATCH_FORMATS
+
+    watch = subparsers.add_parser('watch', help='Theo dõi thư mục, ghi nối kết quả PDF mới vào CSV / Parquet')
+    watch.add_argument('folder', help='Thư mục PDF được thả vào (quét đệ quy)')
+    watch.add_argument('-o', '--output', required=True,
+                       help='File CSV hoặc thư mục Parquet được ghi nối (.csv / .parquet)')
+    watch.add_argument('--format', choices=WATCH_FORMATS, help='Định dạng đầu ra (mặc định theo đuôi)')
+    watch.add_argument('--excel', help='File Excel dựng lại khi nhận SIGUSR1 hoặc cuối lần chạy --once')
+    watch.add_argument('--interval', type=float, default=DEFAULT_INTERVAL, help='Số giây giữa hai lần quét')
+    watch.add_argument('--once', action='store_true', help='Xử lý các file hiện có rồi dừng (cron)')
+    watch.add_argument('--drop-totals', action='store_true', help='Bỏ dòng TOTAL')
+    watch.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Số process đọc PDF song song')
+    watch.add_argument('--mode', choices=EXTRACT_MODES, default=DEFAULT_EXTRACT_MODE,
+                       help="Cách đọc PDF: 'full' (toàn bộ text) hoặc 'regions' (chỉ các vùng cần thiết)")
+    watch.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='Thư mục cache kết quả trích xuất')
+    watch.add_argument('--no-cache', action='store_true', help='Không dùng cache (Excel phải đọc lại PDF)')
+    watch.add_argument('--ledger', default=DEFAULT_LEDGER_PATH, help='File SQLite sổ cái REBATE / Credit Note')
+    watch.add_argument('--no-ledger', action='store_true', help='Chỉ liên kết REBATE trong cùng lượt quét')
+    watch.add_argument('--metrics-file', default=DEFAULT_METRICS_FILE,
+                       help='Ghi số liệu theo Prometheus text format (textfile collector)')
+    watch.set_defaults(func=run_watch)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    logging.basicConfig(format='%(asctime)s - %(message)s', level=logging.INFO)
+    args = build_parser().parse_args(argv)
+    return args.func(args)
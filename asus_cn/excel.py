@@ -0,0 +1,138 @@
+"""
+Xuất DataFrame kết quả ra file Excel có định dạng.
+
+Workbook được ghi một lượt ở chế độ write-only của openpyxl: mỗi dòng được
+style và đẩy thẳng xuống file tạm, nên bộ nhớ không tăng theo số dòng. Chỉ các
+dòng của file PDF đang ghi (tới dòng TOTAL) được giữ lại để biết vùng merge.
+"""
+
+import io
+from copy import copy
+from typing import Iterable, Sequence
+
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.worksheet.cell_range import CellRange
+from openpyxl.styles import Alignment, Font, Border, Side, PatternFill
+
+MERGE_COLUMNS = {'Tên file PDF': 1, 'CN FOB': 7, 'CN Landing': 8}
+CENTER_COLUMNS = [5, 6, 7, 8, 9]
+AMOUNT_COLUMNS = [6, 9]
+AMOUNT_FORMAT = '#,##0.00'
+TOTAL_COLUMN = 5
+COLUMN_WIDTHS = {'A': 25, 'B': 45, 'C': 25, 'D': 18, 'E': 18, 'F': 12, 'G': 18, 'H': 18, 'I': 15}
+
+HEADER_FONT = Font(bold=True, color='FFFFFF', size=11)
+HEADER_FILL = PatternFill(start_color='2E75B6', end_color='2E75B6', fill_type='solid')
+HEADER_ALIGNMENT = Alignment(horizontal='center', vertical='center', wrap_text=True)
+
+TOTAL_FONT = Font(bold=True, size=11)
+TOTAL_FILL = PatternFill(start_color='D9E2F3', end_color='D9E2F3', fill_type='solid')
+
+CENTER_ALIGNMENT = Alignment(horizontal='center', vertical='center')
+MERGE_ALIGNMENT = Alignment(vertical='center')
+
+THIN_BORDER = Border(
+    left=Side(style='thin', color='B4B4B4'),
+    right=Side(style='thin', color='B4B4B4'),
+    top=Side(style='thin', color='B4B4B4'),
+    bottom=Side(style='thin', color='B4B4B4')
+)
+
+
+class _StyledCells:
+    """Tạo ô đã style từ các ô mẫu, không dựng lại Font/Border cho từng ô."""
+
+    def __init__(self, ws):
+        self.ws = ws
+        self._templates = {}
+
+    def _template(self, col: int, is_total: bool, is_merge_anchor: bool):
+        cell = WriteOnlyCell(self.ws)
+        cell.border = THIN_BORDER
+        if is_total:
+            cell.font = TOTAL_FONT
+            cell.fill = TOTAL_FILL
+        if col in CENTER_COLUMNS:
+            cell.alignment = CENTER_ALIGNMENT
+        elif is_merge_anchor:
+            cell.alignment = MERGE_ALIGNMENT
+        if col in AMOUNT_COLUMNS:
+            cell.number_format = AMOUNT_FORMAT
+        return cell._style
+
+    def header(self, value):
+        cell = WriteOnlyCell(self.ws, value)
+        cell.font = HEADER_FONT
+        cell.fill = HEADER_FILL
+        cell.alignment = HEADER_ALIGNMENT
+        cell.border = THIN_BORDER
+        return cell
+
+    def data(self, value, col: int, is_total: bool, is_merge_anchor: bool):
+        key = (col, is_total, is_merge_anchor)
+        if key not in self._templates:
+            self._templates[key] = self._template(*key)
+        if value != value:  # NaN -> ô trống như df.to_excel
+            value = None
+        cell = WriteOnlyCell(self.ws, value)
+        cell._style = copy(self._templates[key])
+        return cell
+
+
+def write_excel(rows: Iterable[Sequence], output, columns: Sequence[str]):
+    """Ghi các dòng (theo thứ tự columns) ra output (đường dẫn hoặc file object) trong một lượt."""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Data')
+    for col_letter, width in COLUMN_WIDTHS.items():
+        ws.column_dimensions[col_letter].width = width
+    ws.freeze_panes = 'A2'
+
+    cells = _StyledCells(ws)
+    ws.append([cells.header(name) for name in columns])
+
+    merge_cols = [idx for name, idx in MERGE_COLUMNS.items() if name in columns]
+    group = []  # các dòng từ đầu file PDF hiện tại, chờ tới dòng TOTAL
+    start_row = 2
+
+    def flush(merged: bool):
+        for offset, (values, is_total) in enumerate(group):
+            row = []
+            for col, value in enumerate(values, 1):
+                in_merge = merged and col in merge_cols
+                if in_merge and offset > 0:
+                    value = None
+                row.append(cells.data(value, col, is_total, in_merge and offset == 0))
+            ws.append(row)
+        group.clear()
+
+    excel_row = 1
+    for values in rows:
+        excel_row += 1
+        is_total = values[TOTAL_COLUMN - 1] == 'TOTAL'
+        if not group:
+            start_row = excel_row
+            group.append((values, is_total))
+        else:
+            group.append((values, is_total))
+            if is_total:
+                end_row = excel_row
+                if end_row > start_row:
+                    for col_idx in merge_cols:
+                        # Các vùng merge không chồng nhau: thêm thẳng vào set, bỏ qua
+                        # phép kiểm tra chứa O(n) của MultiCellRange.add
+                        ws.merged_cells.ranges.add(CellRange(
+                            min_col=col_idx, min_row=start_row, max_col=col_idx, max_row=end_row
+                        ))
+                flush(merged=end_row > start_row)
+    flush(merged=False)
+
+    wb.save(output)
+
+
+def create_excel_with_formatting(df: pd.DataFrame) -> io.BytesIO:
+    output = io.BytesIO()
+    write_excel(df.itertuples(index=False, name=None), output, list(df.columns))
+    output.seek(0)
+    return output
@@ -0,0 +1,170 @@
+"""
+Xuất kết quả ra Excel (có merge / định dạng), CSV hoặc Parquet.
+
+Cả ba định dạng ghi theo luồng từ các dòng (tuple theo COLUMNS_ORDER): CSV ghi
+từng dòng, Parquet ghi theo row group, Excel dùng write_excel. Có thể bỏ dòng
+TOTAL với CSV / Parquet (bảng phẳng cho đối soát); Excel luôn giữ vì vùng merge
+dựa vào dòng TOTAL.
+
+ExportCache giữ sẵn bytes của các file đã xuất theo fingerprint của DataFrame,
+và dựng file trong thread nền để bước tải xuống không phải chờ.
+"""
+
+import csv
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional, Sequence
+
+import pandas as pd
+
+from asus_cn.excel import write_excel
+from asus_cn.metrics import METRICS
+from asus_cn.records import AMOUNT_COLUMNS, COLUMNS_ORDER, TOTAL_LABEL
+
+EXPORT_FORMATS = {
+    'xlsx': ('Excel', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'csv': ('CSV', 'text/csv'),
+    'parquet': ('Parquet', 'application/vnd.apache.parquet'),
+}
+
+# Số dòng mỗi row group Parquet
+PARQUET_ROW_GROUP = 65536
+
+_TOTAL_INDEX = COLUMNS_ORDER.index('Part No')
+
+
+def format_for_path(path) -> str:
+    """Định dạng theo đuôi file, mặc định Excel."""
+    suffix = str(path).rsplit('.', 1)[-1].lower()
+    return suffix if suffix in EXPORT_FORMATS else 'xlsx'
+
+
+def _without_totals(rows: Iterable[Sequence]) -> Iterable[Sequence]:
+    return (row for row in rows if row[_TOTAL_INDEX] != TOTAL_LABEL)
+
+
+def write_csv(rows: Iterable[Sequence], output, columns: Sequence[str] = COLUMNS_ORDER,
+              header: bool = True):
+    """Ghi CSV UTF-8 từng dòng; số tiền trống (NaN) thành ô rỗng. header=False khi ghi nối."""
+    text = io.TextIOWrapper(output, encoding='utf-8', newline='', write_through=True)
+    try:
+        writer = csv.writer(text)
+        if header:
+            writer.writerow(columns)
+        for row in rows:
+            writer.writerow(['' if value != value else value for value in row])
+    finally:
+        text.detach()
+
+
+def write_parquet(rows: Iterable[Sequence], output, columns: Sequence[str] = COLUMNS_ORDER):
+    """Ghi Parquet theo từng row group PARQUET_ROW_GROUP dòng."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        (name, pa.float64() if name in AMOUNT_COLUMNS else pa.string()) for name in columns
+    ])
+
+    def write(writer, chunk):
+        writer.write_table(pa.Table.from_arrays(
+            [pa.array(column, type=field.type, from_pandas=True) for column, field in zip(zip(*chunk), schema)],
+            schema=schema
+        ))
+
+    # Không có dòng nào: file vẫn hợp lệ, chỉ có schema
+    with pq.ParquetWriter(output, schema) as writer:
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= PARQUET_ROW_GROUP:
+                write(writer, chunk)
+                chunk = []
+        if chunk:
+            write(writer, chunk)
+
+
+def write_rows(rows: Iterable[Sequence], output, fmt: str = 'xlsx', drop_totals: bool = False,
+               columns: Sequence[str] = COLUMNS_ORDER, header: bool = True):
+    """
+    Ghi các dòng ra output (đường dẫn hoặc file object nhị phân) theo định dạng fmt.
+    header=False bỏ dòng tiêu đề CSV (ghi nối vào file đã có).
+    """
+    if fmt == 'xlsx':
+        write_excel(rows, output, columns)
+        return
+    if drop_totals:
+        rows = _without_totals(rows)
+    if fmt == 'csv':
+        if isinstance(output, (str, bytes)) or hasattr(output, '__fspath__'):
+            with open(output, 'wb') as f:
+                write_csv(rows, f, columns, header)
+        else:
+            write_csv(rows, output, columns, header)
+    elif fmt == 'parquet':
+        write_parquet(rows, output, columns)
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+
+def export_dataframe(df: pd.DataFrame, fmt: str = 'xlsx', drop_totals: bool = False) -> bytes:
+    output = io.BytesIO()
+    write_rows(df.itertuples(index=False, name=None), output, fmt, drop_totals, list(df.columns))
+    return output.getvalue()
+
+
+def dataframe_fingerprint(df: pd.DataFrame) -> str:
+    """SHA-256 của tên cột và giá trị từng dòng (không tính index)."""
+    digest = hashlib.sha256('\x1f'.join(map(str, df.columns)).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class ExportCache:
+    """Bytes file đã xuất theo (fingerprint DataFrame, định dạng) (LRU), dựng trong thread nền."""
+
+    def __init__(self, max_entries: int = 8):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._futures = OrderedDict()  # (fingerprint, định dạng, bỏ TOTAL) -> Future[bytes]
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='export')
+
+    def _build(self, df: pd.DataFrame, fmt: str, drop_totals: bool) -> bytes:
+        files = df['Tên file PDF'].nunique() if 'Tên file PDF' in df else 0
+        with METRICS.stage('excel' if fmt == 'xlsx' else fmt, files=files, rows=len(df)):
+            data = export_dataframe(df, fmt, drop_totals)
+        METRICS.write()
+        return data
+
+    def _future(self, df: pd.DataFrame, key: Optional[str], fmt: str, drop_totals: bool) -> tuple:
+        cache_key = (key or dataframe_fingerprint(df), fmt, drop_totals and fmt != 'xlsx')
+        with self._lock:
+            future = self._futures.get(cache_key)
+            if future is not None:
+                self._futures.move_to_end(cache_key)
+                return cache_key, future
+            future = self._futures[cache_key] = self._executor.submit(self._build, df, *cache_key[1:])
+            while len(self._futures) > self.max_entries:
+                self._futures.popitem(last=False)
+        return cache_key, future
+
+    def submit(self, df: pd.DataFrame, key: Optional[str] = None, fmt: str = 'xlsx',
+               drop_totals: bool = False) -> str:
+        """Bắt đầu dựng file nếu chưa có; trả về fingerprint của df."""
+        return self._future(df, key, fmt, drop_totals)[0][0]
+
+    def result(self, df: pd.DataFrame, key: Optional[str] = None, fmt: str = 'xlsx',
+               drop_totals: bool = False) -> bytes:
+        """Bytes file của df theo định dạng fmt, chờ nếu đang dựng."""
+        cache_key, future = self._future(df, key, fmt, drop_totals)
+        try:
+            return future.result()
+        except Exception:
+            # Cho phép thử lại ở lần gọi sau
+            with self._lock:
+                if self._futures.get(cache_key) is future:
+                    del self._futures[cache_key]
+            raise
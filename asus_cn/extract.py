@@ -0,0 +1,147 @@
+"""
+Đọc text từ file PDF Credit Note (không phụ thuộc Streamlit, dùng được trong worker process)
+
+Có hai chế độ:
+- 'full': extract_text toàn bộ từng trang (mặc định)
+- 'regions': dựa trên toạ độ ký tự, chỉ dựng text cho các vùng cần thiết (dòng
+  CN NO / Credit Note Remark, bảng item tới dòng Total), bỏ qua khối địa chỉ
+  ASUS GLOBAL và phần còn lại của trang. Nếu trang đầu không đúng bố cục Credit
+  Note (ví dụ file REBATE) thì quay về đọc toàn bộ text.
+
+Ở chế độ 'regions', ký tự được lấy thẳng từ layout pdfminer của trang
+(page.layout) thay vì page.chars: bước dựng dict đầy đủ thuộc tính cho từng ký
+tự của pdfplumber chiếm phần lớn thời gian đọc một trang.
+
+pdfplumber / pdfminer chỉ được import khi thật sự đọc PDF, để các module chỉ cần
+hằng số ở đây (app lúc đăng nhập, JobRunner) khởi động nhanh.
+"""
+
+import os
+from typing import Optional
+
+EXTRACT_MODES = ('full', 'regions')
+DEFAULT_EXTRACT_MODE = os.environ.get('ASUS_CN_EXTRACT_MODE', 'full')
+
+# Chữ đầu dòng (đã bỏ dấu cách) dùng làm mốc bố cục
+HEADER_ANCHORS = ('CNNO', 'CreditNoteRemark')
+TABLE_HEADER_ANCHOR = 'NoDescription'
+TOTAL_ANCHOR = 'Total:'
+BOILERPLATE_ANCHORS = ('ASUSGLOBAL', '10Changi', 'Reg.No')
+
+# Cùng giá trị mặc định với extract_text của pdfplumber
+X_TOLERANCE = 3
+Y_TOLERANCE = 3
+
+
+def _layout_chars(page) -> list:
+    """Các LTChar của trang dưới dạng (top, bottom, x0, x1, text)."""
+    from pdfminer.layout import LTChar, LTContainer
+
+    height = page.layout.height
+    chars = []
+    stack = list(page.layout)
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, LTChar):
+            chars.append((height - obj.y1, height - obj.y0, obj.x0, obj.x1, obj.get_text()))
+        elif isinstance(obj, LTContainer):
+            stack.extend(obj)
+    return chars
+
+
+def _line_text(chars: list) -> str:
+    """Ghép ký tự một dòng thành text, chèn dấu cách giữa các từ như extract_text."""
+    parts = []
+    prev_x1 = None
+    pending_space = False
+    for _, _, x0, x1, text in sorted(chars, key=lambda c: c[2]):
+        if text.isspace():
+            pending_space = True
+            continue
+        if prev_x1 is not None and (pending_space or x0 > prev_x1 + X_TOLERANCE):
+            parts.append(' ')
+        parts.append(text)
+        prev_x1 = x1
+        pending_space = False
+    return ''.join(parts)
+
+
+def page_lines(page) -> list:
+    """Gom ký tự thành các dòng theo toạ độ: [(top, bottom, text)] từ trên xuống."""
+    lines = []
+    for char in sorted(_layout_chars(page)):
+        if lines and char[0] - lines[-1][0] <= Y_TOLERANCE:
+            lines[-1][1] = max(lines[-1][1], char[1])
+            lines[-1][2].append(char)
+        else:
+            lines.append([char[0], char[1], [char]])
+    return [(top, bottom, _line_text(chars)) for top, bottom, chars in lines]
+
+
+def line_signature(text: str) -> str:
+    return text.replace(' ', '')
+
+
+def _kept_lines(lines: list) -> list:
+    """Các dòng cần giữ trên một trang: header, bảng item tới dòng Total, trừ boilerplate."""
+    signatures = [line_signature(text) for _, _, text in lines]
+    table_start = next((i + 1 for i, s in enumerate(signatures) if s.startswith(TABLE_HEADER_ANCHOR)), 0)
+    table_end = next(
+        (i for i, s in enumerate(signatures) if i >= table_start and s.startswith(TOTAL_ANCHOR)),
+        len(lines) - 1
+    )
+
+    kept = []
+    for i, (signature, line) in enumerate(zip(signatures, lines)):
+        if signature.startswith(BOILERPLATE_ANCHORS):
+            continue
+        if signature.startswith(HEADER_ANCHORS) or table_start <= i <= table_end:
+            kept.append(line)
+    return kept
+
+
+def _matches_layout(lines: list) -> bool:
+    signatures = [line_signature(text) for _, _, text in lines]
+    return (any(s.startswith(TABLE_HEADER_ANCHOR) for s in signatures)
+            and any(s.startswith(HEADER_ANCHORS[0]) for s in signatures))
+
+
+def _region_page_text(lines: list) -> str:
+    return "\n".join(text for _, _, text in _kept_lines(lines) if text)
+
+
+def pages_text(pdf, mode: str = DEFAULT_EXTRACT_MODE, first_lines: list = None,
+               pages: Optional[range] = None) -> str:
+    """
+    Text các trang của một PDF đã mở (first_lines: các dòng trang 1 nếu đã có).
+    pages: chỉ số (từ 0) các trang cần đọc, mặc định toàn bộ; số trang trong dấu
+    '=== PAGE n ===' luôn tính theo cả file.
+    """
+    text_content = []
+    if mode == 'regions' and pdf.pages and first_lines is None:
+        first_lines = page_lines(pdf.pages[0])
+    use_regions = mode == 'regions' and first_lines is not None and _matches_layout(first_lines)
+
+    for index in pages if pages is not None else range(len(pdf.pages)):
+        page_num = index + 1
+        page = pdf.pages[index]
+        if use_regions:
+            page_text = _region_page_text(first_lines if page_num == 1 else page_lines(page))
+        else:
+            page_text = page.extract_text()
+        if page_text:
+            text_content.append(f"=== PAGE {page_num} ===")
+            text_content.append(page_text)
+            text_content.append("")
+    return "\n".join(text_content)
+
+
+def pdf_to_text(pdf_file, mode: str = DEFAULT_EXTRACT_MODE) -> str:
+    """Đọc file PDF và trả về text content."""
+    import pdfplumber
+
+    try:
+        with pdfplumber.open(pdf_file) as pdf:
+            return pages_text(pdf, mode)
+    except Exception:
+        return ""
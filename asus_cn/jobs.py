@@ -0,0 +1,426 @@
+"""
+Chạy xử lý batch trong thread nền, tách khỏi lượt chạy script Streamlit.
+
+Mỗi công việc (job) có một thư mục riêng dưới ASUS_CN_JOBS_DIR:
+
+- inputs/      các file upload (PDF / ZIP) đã ghi xuống đĩa, xoá khi job xong
+- spool/       PDF giải nén từ ZIP, mỗi file bị xoá ngay khi đọc xong
+- job.json     người tạo, trạng thái, tiến độ
+- results.jsonl  một dòng cho mỗi file đã xong (ExtractedFile + thứ tự upload)
+- profile.jsonl, profile/  số liệu đo hiệu năng từng file, chỉ khi job bật
+  profiling (xem asus_cn.profiling)
+
+File upload được ghi thẳng xuống đĩa (không giữ bytes trong session) và worker
+đọc PDF qua mmap; mỗi người dùng có hạn mức dung lượng file upload đang chờ
+xử lý (ASUS_CN_UPLOAD_QUOTA_MB).
+
+Trang web chỉ đọc trạng thái job để hiển thị, nên rerun / mất kết nối không
+làm gián đoạn việc xử lý; người dùng có thể quay lại lấy kết quả sau. Khi khởi
+động lại server, các job chưa xong được chạy tiếp, bỏ qua các file đã có trong
+results.jsonl.
+
+Mỗi người dùng chạy một job tại một thời điểm (job sau chờ trong hàng đợi),
+tối đa ASUS_CN_MAX_RUNNING_JOBS job cùng lúc; các job đang chạy chia lượt đọc
+PDF trên FairScheduler dùng chung. Job quá ASUS_CN_MAX_JOB_FILES file bị từ chối.
+"""
+
+import json
+import logging
+import os
+import secrets
+import shutil
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Iterable, Iterator, NamedTuple, Optional, Tuple, Union
+
+from asus_cn.archive import ArchiveError, ZipArchive, is_zip
+from asus_cn.cache import ExtractionCache, path_digest
+from asus_cn.extract import DEFAULT_EXTRACT_MODE
+from asus_cn.metrics import METRICS
+from asus_cn.parallel import DEFAULT_WORKERS
+from asus_cn.pipeline import ExtractedFile, iter_extracted
+from asus_cn.profiling import ProfileReport, load_profile, save_profile
+from asus_cn.scheduler import FairScheduler
+
+DEFAULT_JOBS_DIR = Path(
+    os.environ.get('ASUS_CN_JOBS_DIR', Path.home() / '.asus_cn' / 'jobs')
+)
+# Job đã xong được giữ lại bao lâu (ngày)
+JOB_RETENTION_DAYS = float(os.environ.get('ASUS_CN_JOB_RETENTION_DAYS', 7))
+# Số job chạy cùng lúc (mỗi người dùng tối đa một)
+MAX_RUNNING_JOBS = int(os.environ.get('ASUS_CN_MAX_RUNNING_JOBS', 8))
+# Số file PDF tối đa của một job (kể cả trong ZIP)
+MAX_JOB_FILES = int(os.environ.get('ASUS_CN_MAX_JOB_FILES', 5000))
+# Tổng dung lượng file upload chưa xử lý xong của một người dùng
+UPLOAD_QUOTA_BYTES = int(os.environ.get('ASUS_CN_UPLOAD_QUOTA_MB', 2048)) * 1024 * 1024
+# Chu kỳ dọn các job quá hạn (giây)
+CLEANUP_INTERVAL = 3600
+COPY_CHUNK = 1024 * 1024
+# Ghi tiến độ xuống job.json tối đa một lần mỗi khoảng này (giây)
+PROGRESS_INTERVAL = 1.0
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+ACTIVE_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+
+class JobInfo(NamedTuple):
+    id: str
+    user: str
+    status: str
+    created: str
+    total: int  # số file PDF (kể cả trong ZIP)
+    done: int
+    error: Optional[str] = None
+    position: int = 0  # vị trí trong hàng đợi (1 = kế tiếp), 0 nếu không chờ
+
+
+class JobRejected(ValueError):
+    """Job vượt giới hạn, không được nhận."""
+
+
+def _write_json(path: Path, data: dict):
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+    os.replace(tmp_path, path)
+
+
+def _count_files(path: Path, name: str) -> int:
+    if not is_zip(name):
+        return 1
+    try:
+        with ZipArchive(path, name) as archive:
+            return len(archive)
+    except ArchiveError:
+        return 1
+
+
+class JobRunner:
+    """Hàng đợi job dùng chung cho cả process; mỗi job đang chạy có một thread nền."""
+
+    def __init__(self, root=DEFAULT_JOBS_DIR, cache: Optional[ExtractionCache] = None,
+                 workers: int = DEFAULT_WORKERS, mode: str = DEFAULT_EXTRACT_MODE,
+                 scheduler: Optional[FairScheduler] = None, max_running: int = MAX_RUNNING_JOBS,
+                 max_files: int = MAX_JOB_FILES, quota: int = UPLOAD_QUOTA_BYTES):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.cache = cache
+        self.mode = mode
+        self.scheduler = scheduler or FairScheduler(workers)
+        self.max_running = max_running
+        self.max_files = max_files
+        self.quota = quota
+        self._lock = threading.Condition()
+        self._progress = {}  # job id -> số file đã xong (job đang chạy)
+        self._pending = []  # [(job id, người dùng)] theo thứ tự gửi
+        self._running = {}  # job id -> người dùng
+
+        self._cleanup()
+        for job in sorted(self._iter_jobs(), key=lambda job: job['created']):
+            if job['status'] in ACTIVE_STATUSES:
+                logging.info(f"Resuming job {job['id']} ({job['done']}/{job['total']} files)")
+                self._pending.append((job['id'], job['user']))
+        threading.Thread(target=self._loop, name='asus-cn-jobs', daemon=True).start()
+
+    def _dir(self, job_id: str) -> Path:
+        return self.root / job_id
+
+    def _load(self, job_id: str) -> Optional[dict]:
+        try:
+            return json.loads((self._dir(job_id) / 'job.json').read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+
+    def _iter_jobs(self) -> Iterator[dict]:
+        for job_dir in self.root.iterdir():
+            job = self._load(job_dir.name) if job_dir.is_dir() else None
+            if job is not None:
+                yield job
+
+    def _cleanup(self):
+        """Xoá các job đã xong quá JOB_RETENTION_DAYS (kể cả của session đã hết hạn)."""
+        cutoff = time.time() - JOB_RETENTION_DAYS * 86400
+        for job in list(self._iter_jobs()):
+            if job['status'] not in ACTIVE_STATUSES and job['updated'] < cutoff:
+                shutil.rmtree(self._dir(job['id']), ignore_errors=True)
+
+    def delete(self, job_id: str) -> bool:
+        """Xoá một job đã xong (ví dụ khi người dùng đăng xuất); job đang chạy được giữ lại."""
+        job = self._load(job_id)
+        if job is None or job['status'] in ACTIVE_STATUSES:
+            return False
+        shutil.rmtree(self._dir(job_id), ignore_errors=True)
+        return True
+
+    def upload_bytes(self, user: str) -> int:
+        """Dung lượng file upload của các job chưa xong của một người dùng."""
+        return sum(
+            path.stat().st_size
+            for job in self._iter_jobs() if job['user'] == user and job['status'] in ACTIVE_STATUSES
+            for folder in ('inputs', 'spool') for path in (self._dir(job['id']) / folder).rglob('*')
+            if path.is_file()
+        )
+
+    def submit(self, user: str, files: Iterable[Tuple[str, Union[bytes, IO[bytes]]]],
+               known: Optional[dict] = None, profile: bool = False) -> str:
+        """
+        Ghi các file upload (bytes hoặc file object, chép theo khối) xuống đĩa và xếp
+        job vào hàng đợi; trả về mã job.
+        known: tên file -> SHA-256 của các file đã có trong batch (không đọc lại).
+        profile: đo thời gian / bộ nhớ từng file, xem bằng profile(job_id).
+        """
+        job_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{secrets.token_hex(3)}"
+        job_dir = self._dir(job_id)
+        (job_dir / 'inputs').mkdir(parents=True)
+
+        inputs = []
+        total = 0
+        used = self.upload_bytes(user)
+        for i, (name, data) in enumerate(files):
+            path = job_dir / 'inputs' / f"{i:05d}{'.zip' if is_zip(name) else '.pdf'}"
+            with open(path, 'wb') as out:
+                if isinstance(data, (bytes, bytearray)):
+                    out.write(data)
+                else:
+                    data.seek(0)
+                    shutil.copyfileobj(data, out, COPY_CHUNK)
+            used += path.stat().st_size
+            if used > self.quota:
+                shutil.rmtree(job_dir, ignore_errors=True)
+                raise JobRejected(f"vượt dung lượng upload cho phép ({self.quota / 1e6:.0f} MB mỗi người dùng)")
+            inputs.append({'name': name, 'file': path.name})
+            total += _count_files(path, name)
+        if total > self.max_files:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise JobRejected(f"quá nhiều file trong một lần xử lý ({total} > {self.max_files})")
+
+        now = time.time()
+        _write_json(job_dir / 'job.json', {
+            'id': job_id, 'user': user, 'status': JOB_QUEUED, 'created': now, 'updated': now,
+            'total': total, 'done': 0, 'error': None, 'inputs': inputs, 'known': known or {},
+            'profile': profile,
+        })
+        with self._lock:
+            self._pending.append((job_id, user))
+            self._lock.notify_all()
+        return job_id
+
+    def status(self, job_id: str) -> Optional[JobInfo]:
+        job = self._load(job_id)
+        if job is None:
+            return None
+        with self._lock:
+            done = self._progress.get(job_id, job['done'])
+            position = next((i for i, (pending_id, _) in enumerate(self._pending, 1) if pending_id == job_id), 0)
+        return JobInfo(job['id'], job['user'], job['status'],
+                       datetime.fromtimestamp(job['created']).strftime('%Y-%m-%d %H:%M:%S'),
+                       job['total'], done, job['error'], position)
+
+    @property
+    def running_users(self) -> int:
+        """Số người dùng đang có job chạy (cùng chia worker)."""
+        with self._lock:
+            return len(set(self._running.values()))
+
+    def jobs(self, user: str, limit: int = 10) -> list:
+        """Các job gần nhất của một người dùng, mới nhất trước."""
+        jobs = sorted((job for job in self._iter_jobs() if job['user'] == user),
+                      key=lambda job: job['created'], reverse=True)
+        return [self.status(job['id']) for job in jobs[:limit]]
+
+    def _finished(self, job_id: str) -> list:
+        """
+        Số dòng kết quả đầy đủ và tên các file đã xong; cắt bỏ dòng cuối bị ghi dở
+        (process chết giữa chừng). Chỉ thread chạy job gọi hàm này.
+        """
+        path = self._dir(job_id) / 'results.jsonl'
+        names = []
+        if not path.exists():
+            return names
+        complete = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                names.append(json.loads(line)['name'])
+                complete += len(line)
+        if complete != path.stat().st_size:
+            with open(path, 'r+b') as f:
+                f.truncate(complete)
+        return names
+
+    def results(self, job_id: str) -> Iterator[ExtractedFile]:
+        """
+        ExtractedFile của job theo thứ tự upload (không gồm file đã có trong batch).
+        Đọc lần lượt từng dòng, nên text của các file không nằm trong bộ nhớ cùng lúc.
+        """
+        path = self._dir(job_id) / 'results.jsonl'
+        if not path.exists():
+            return
+        offsets = []  # (thứ tự upload, vị trí dòng trong file)
+        with open(path, 'rb') as f:
+            while True:
+                offset = f.tell()
+                line = f.readline()
+                if not line.endswith(b'\n'):
+                    break
+                line = json.loads(line)
+                if not line.get('skipped'):
+                    offsets.append((line['index'], offset))
+            for _, offset in sorted(offsets):
+                f.seek(offset)
+                line = json.loads(f.readline())
+                yield ExtractedFile(line['name'], line['entry'], line['error'], line['digest'], line['size'],
+                                    line['seconds'], line['cached'])
+
+    def profile(self, job_id: str) -> Optional[ProfileReport]:
+        """Số liệu đo hiệu năng của job; None nếu job không bật profiling hoặc chưa có file nào xong."""
+        return load_profile(self._dir(job_id))
+
+    def _sources(self, job: dict, rejected: dict) -> Iterator[Tuple[str, str, bool]]:
+        """
+        (tên, đường dẫn, có phải file spool) của các file trong job theo thứ tự upload;
+        ZIP được giải nén lần lượt ra spool/.
+        """
+        job_dir = self._dir(job['id'])
+        for item in job['inputs']:
+            path = job_dir / 'inputs' / item['file']
+            if not is_zip(item['name']):
+                yield item['name'], str(path), False
+                continue
+            try:
+                archive = ZipArchive(path, item['name'])
+            except ArchiveError as e:
+                rejected[item['name']] = str(e)
+                continue
+            with archive:
+                for name, spool_path in archive.spool(job_dir / 'spool' / path.stem):
+                    yield name, spool_path, True
+            rejected.update(archive.rejected)
+
+    def _run(self, job_id: str):
+        job = self._load(job_id)
+        if job is None or job['status'] not in ACTIVE_STATUSES:
+            return
+        finished_names = self._finished(job_id)
+        finished = set(finished_names)
+        job['status'] = JOB_RUNNING
+        job['done'] = len(finished_names)
+        job['updated'] = time.time()
+        _write_json(self._dir(job_id) / 'job.json', job)
+        with self._lock:
+            self._progress[job_id] = len(finished_names)
+
+        order = {}  # tên -> thứ tự upload
+        rejected = {}  # tên -> lý do (ZIP lỗi / member vượt giới hạn)
+        spooled = {}  # tên -> file giải nén từ ZIP, xoá khi đã có kết quả
+        known = job['known']
+        shutil.rmtree(self._dir(job_id) / 'spool', ignore_errors=True)
+
+        # pending() chạy trên thread của scheduler, kết quả đọc PDF về thread này
+        write_lock = threading.Lock()
+        with open(self._dir(job_id) / 'results.jsonl', 'a', encoding='utf-8') as out:
+            last_saved = time.monotonic()
+
+            def record(line: dict):
+                nonlocal last_saved
+                with write_lock:
+                    out.write(json.dumps(line, ensure_ascii=False) + '\n')
+                    out.flush()
+                    spool_path = spooled.pop(line['name'], None)
+                    if spool_path is not None:
+                        os.remove(spool_path)
+                    with self._lock:
+                        self._progress[job_id] += 1
+                        job['done'] = self._progress[job_id]
+                    if time.monotonic() - last_saved > PROGRESS_INTERVAL:
+                        job['updated'] = time.time()
+                        _write_json(self._dir(job_id) / 'job.json', job)
+                        last_saved = time.monotonic()
+
+            def pending():
+                for name, path, is_spooled in self._sources(job, rejected):
+                    order[name] = len(order)
+                    if name in finished:
+                        if is_spooled:
+                            os.remove(path)
+                        continue
+                    if is_spooled:
+                        spooled[name] = path
+                    if name in known and known[name] == path_digest(path):
+                        record({'index': order[name], 'name': name, 'skipped': True})
+                        continue
+                    yield name, path
+
+            for extracted in iter_extracted(pending(), cache=self.cache, mode=self.mode,
+                                            scheduler=self.scheduler, user=job['user'],
+                                            profile=job.get('profile', False)):
+                line = {'index': order[extracted.name], **extracted._asdict()}
+                profile = line.pop('profile')
+                if profile is not None:
+                    save_profile(self._dir(job_id), line['index'], extracted.name, extracted.size,
+                                 extracted.entry, profile)
+                record(line)
+            for name, error in rejected.items():
+                if name not in finished:
+                    order.setdefault(name, len(order))
+                    line = {'index': order[name], **ExtractedFile(name, None, error)._asdict()}
+                    del line['profile']
+                    record(line)
+
+        job['status'] = JOB_DONE
+        job['updated'] = time.time()
+        _write_json(self._dir(job_id) / 'job.json', job)
+        self._drop_inputs(job_id)
+
+    def _drop_inputs(self, job_id: str):
+        """File upload không còn cần khi job đã xong: kết quả nằm trong results.jsonl."""
+        for folder in ('inputs', 'spool'):
+            shutil.rmtree(self._dir(job_id) / folder, ignore_errors=True)
+
+    def _next_job(self) -> Optional[str]:
+        """Job chờ lâu nhất của người dùng chưa có job chạy, nếu còn chỗ."""
+        if len(self._running) >= self.max_running:
+            return None
+        for job_id, user in self._pending:
+            if user not in self._running.values():
+                return job_id
+        return None
+
+    def _loop(self):
+        last_cleanup = time.monotonic()
+        while True:
+            with self._lock:
+                job_id = self._next_job()
+                while job_id is None:
+                    self._lock.wait(timeout=CLEANUP_INTERVAL)
+                    if time.monotonic() - last_cleanup > CLEANUP_INTERVAL:
+                        self._cleanup()
+                        last_cleanup = time.monotonic()
+                    job_id = self._next_job()
+                user = next(user for pending_id, user in self._pending if pending_id == job_id)
+                self._pending.remove((job_id, user))
+                self._running[job_id] = user
+            threading.Thread(target=self._run_job, args=(job_id,), name=f'asus-cn-job-{job_id}',
+                             daemon=True).start()
+
+    def _run_job(self, job_id: str):
+        try:
+            self._run(job_id)
+        except Exception as e:
+            logging.exception(f"Job {job_id} failed")
+            job = self._load(job_id)
+            if job is not None:
+                job.update(status=JOB_FAILED, error=f"{type(e).__name__}: {e}", updated=time.time())
+                _write_json(self._dir(job_id) / 'job.json', job)
+            self._drop_inputs(job_id)
+        finally:
+            with self._lock:
+                self._progress.pop(job_id, None)
+                self._running.pop(job_id, None)
+                self._lock.notify_all()
+            METRICS.write()
@@ -0,0 +1,199 @@
+"""
+Sổ cái SQLite lưu các tài liệu đã parse (REBATE và Credit Note) giữa các batch.
+
+REBATE của batch trước vẫn liên kết được với Credit Note của batch sau: mỗi
+batch chỉ ghi thêm các file mới (theo SHA-256), còn landing cost / CN Landing
+được tra theo số invoice bằng truy vấn có index. Tài liệu bị bỏ khỏi batch đã
+ghi nó được xoá khỏi sổ (remove_documents).
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Collection, Iterable, Set
+
+from asus_cn.classify import DOC_REBATE
+from asus_cn.parsing import parse_header, parse_rebate_text
+
+DEFAULT_LEDGER_PATH = Path(
+    os.environ.get('ASUS_CN_LEDGER_PATH', Path.home() / '.asus_cn' / 'ledger.sqlite3')
+)
+
+# SQLite giới hạn số tham số trong một câu lệnh
+QUERY_CHUNK = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    digest TEXT PRIMARY KEY,
+    file_name TEXT NOT NULL,
+    doc_type TEXT NOT NULL,
+    cn_no TEXT,
+    product_line TEXT,
+    total TEXT,
+    added_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_documents_cn_no ON documents (cn_no);
+
+CREATE TABLE IF NOT EXISTS rebates (
+    id INTEGER PRIMARY KEY,
+    digest TEXT NOT NULL REFERENCES documents (digest),
+    invoice TEXT NOT NULL,
+    cn_no TEXT,
+    landing_cost TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_rebates_invoice ON rebates (invoice);
+
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    digest TEXT NOT NULL REFERENCES documents (digest),
+    item_no TEXT,
+    part_no TEXT,
+    product TEXT,
+    serial TEXT,
+    fob TEXT,
+    invoice TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_items_invoice ON items (invoice);
+"""
+
+
+class Ledger:
+    """Kho SQLite dùng chung giữa các session; mỗi thao tác mở kết nối riêng."""
+
+    def __init__(self, path=DEFAULT_LEDGER_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._write_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _known_digests(conn, digests: list) -> set:
+        known = set()
+        for start in range(0, len(digests), QUERY_CHUNK):
+            chunk = digests[start:start + QUERY_CHUNK]
+            rows = conn.execute(
+                f"SELECT digest FROM documents WHERE digest IN ({','.join('?' * len(chunk))})", chunk
+            )
+            known.update(row['digest'] for row in rows)
+        return known
+
+    def add_documents(self, documents: Iterable[tuple]) -> Set[str]:
+        """
+        Ghi các tài liệu (digest, tên file, loại, text, items) chưa có trong sổ.
+        Trả về digest của các tài liệu mới được ghi.
+        """
+        documents = list(documents)
+        added = set()
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._write_lock, self._connect() as conn:
+            known = self._known_digests(conn, [doc[0] for doc in documents])
+            for digest, file_name, doc_type, text, items in documents:
+                if digest in known:
+                    continue
+                known.add(digest)
+                if doc_type == DOC_REBATE:
+                    cn_no, rebates = parse_rebate_text(text)
+                    product_line = total = ""
+                else:
+                    header = parse_header(text)
+                    cn_no, rebates = header['cn_no'], []
+                    product_line, total = header['product_line'], header['total']
+
+                conn.execute(
+                    "INSERT INTO documents "
+                    "(digest, file_name, doc_type, cn_no, product_line, total, added_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (digest, file_name, doc_type, cn_no, product_line, total, now)
+                )
+                added.add(digest)
+                conn.executemany(
+                    "INSERT INTO rebates (digest, invoice, cn_no, landing_cost) VALUES (?, ?, ?, ?)",
+                    [(digest, invoice, cn_no, amount) for invoice, amount in rebates]
+                )
+                conn.executemany(
+                    "INSERT INTO items (digest, item_no, part_no, product, serial, fob, invoice) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(digest, item['No'], item['Part No'], item['Product'], item['Serial'],
+                      item['FOB'], item['Invoice']) for item in items or []]
+                )
+        if added:
+            logging.info(f"Ledger: added {len(added)} documents")
+        return added
+
+    def remove_documents(self, digests: Iterable[str]) -> int:
+        """Xoá các tài liệu (cùng dòng REBATE / item của chúng); trả về số tài liệu đã xoá."""
+        digests = sorted(set(digests))
+        removed = 0
+        with self._write_lock, self._connect() as conn:
+            for start in range(0, len(digests), QUERY_CHUNK):
+                chunk = digests[start:start + QUERY_CHUNK]
+                placeholders = ','.join('?' * len(chunk))
+                conn.execute(f"DELETE FROM rebates WHERE digest IN ({placeholders})", chunk)
+                conn.execute(f"DELETE FROM items WHERE digest IN ({placeholders})", chunk)
+                removed += conn.execute(f"DELETE FROM documents WHERE digest IN ({placeholders})", chunk).rowcount
+        if removed:
+            logging.info(f"Ledger: removed {removed} documents")
+        return removed
+
+    def rebate_mapping(self, invoices: Iterable[str], exclude: Collection[str] = ()) -> dict:
+        """
+        Tra REBATE theo invoice, cùng dạng kết quả với parse_rebate_files (bản ghi
+        mới nhất thắng). Bỏ qua các dòng của tài liệu có digest trong exclude.
+        """
+        invoices = sorted({inv for inv in invoices if inv})
+        mapping = {}
+        with self._connect() as conn:
+            for start in range(0, len(invoices), QUERY_CHUNK):
+                chunk = invoices[start:start + QUERY_CHUNK]
+                rows = conn.execute(
+                    f"SELECT digest, invoice, cn_no, landing_cost FROM rebates "
+                    f"WHERE invoice IN ({','.join('?' * len(chunk))}) ORDER BY id",
+                    chunk
+                )
+                for row in rows:
+                    if row['digest'] in exclude:
+                        continue
+                    mapping[row['invoice']] = {
+                        'CN_Landing': row['cn_no'],
+                        'Landing_cost': row['landing_cost']
+                    }
+        return mapping
+
+    def find_by_invoice(self, invoice: str) -> dict:
+        """Các dòng REBATE và item Credit Note có số invoice này."""
+        with self._connect() as conn:
+            rebates = conn.execute(
+                "SELECT r.invoice, r.cn_no, r.landing_cost, d.file_name, d.added_at "
+                "FROM rebates r JOIN documents d ON d.digest = r.digest "
+                "WHERE r.invoice = ? ORDER BY r.id", (invoice,)
+            ).fetchall()
+            items = conn.execute(
+                "SELECT i.*, d.file_name, d.cn_no FROM items i JOIN documents d ON d.digest = i.digest "
+                "WHERE i.invoice = ? ORDER BY i.id", (invoice,)
+            ).fetchall()
+        return {'rebates': [dict(r) for r in rebates], 'items': [dict(r) for r in items]}
+
+    def find_by_cn_no(self, cn_no: str) -> list:
+        """Các tài liệu có CN NO này."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT digest, file_name, doc_type, cn_no, product_line, total, added_at "
+                "FROM documents WHERE cn_no = ? ORDER BY added_at", (cn_no,)
+            ).fetchall()
+        return [dict(r) for r in rows]
@@ -0,0 +1,139 @@
+"""
+Đo thời gian từng bước và từng file cho vận hành.
+
+- Mỗi file / mỗi bước ghi một dòng log JSON (logger 'asus_cn.metrics').
+- Số liệu cộng dồn của process được ghi ra file Prometheus text format
+  (ASUS_CN_METRICS_FILE, cho node_exporter textfile collector) dưới dạng
+  histogram, để tính p50 / p95 theo từng file giữa các lần deploy.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+DEFAULT_METRICS_FILE = os.environ.get('ASUS_CN_METRICS_FILE') or None
+
+# Giây; đủ rộng cho cả file 1 trang lẫn file vài trăm trang
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+logger = logging.getLogger('asus_cn.metrics')
+
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+class Metrics:
+    """Bộ đếm và histogram của process, an toàn khi nhiều session cùng ghi."""
+
+    def __init__(self, path: Optional[str] = DEFAULT_METRICS_FILE):
+        self.path = Path(path) if path else None
+        self._lock = threading.Lock()
+        self._counters = {}  # (tên, labels) -> giá trị
+        self._histograms = {}  # (tên, labels) -> [số đếm theo bucket, tổng, số lần]
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(LATENCY_BUCKETS), 0.0, 0]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def observe_file(self, name: str, doc_type: str, size: int, pages: int, items: int,
+                     seconds: float, cached: bool = False, error: Optional[str] = None):
+        """Số liệu của một file sau bước đọc PDF."""
+        status = 'failed' if error else 'cached' if cached else 'ok'
+        self.inc('asus_cn_files_total', doc_type=doc_type, status=status)
+        self.inc('asus_cn_file_bytes_total', size)
+        self.inc('asus_cn_file_pages_total', pages)
+        self.inc('asus_cn_items_total', items)
+        if status == 'ok':
+            self.observe('asus_cn_file_seconds', seconds, stage='extract')
+        logger.info(json.dumps({
+            'event': 'file', 'ts': round(time.time(), 3), 'file': name, 'doc_type': doc_type,
+            'status': status, 'bytes': size, 'pages': pages, 'items': items,
+            'seconds': round(seconds, 4), 'error': error,
+        }, ensure_ascii=False))
+
+    @contextmanager
+    def stage(self, name: str, files: int = 0, **fields):
+        """
+        Đo một bước của batch (rebate_parse, records, excel...). Các trường thêm
+        vào dict trả về trong khối with cũng được ghi vào dòng log.
+        """
+        started = time.perf_counter()
+        extra = dict(fields)
+        error = None
+        try:
+            yield extra
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            seconds = time.perf_counter() - started
+            self.observe('asus_cn_stage_seconds', seconds, stage=name)
+            self.inc('asus_cn_stage_files_total', files, stage=name)
+            if error:
+                self.inc('asus_cn_stage_errors_total', stage=name)
+            logger.info(json.dumps({
+                'event': 'stage', 'ts': round(time.time(), 3), 'stage': name, 'files': files,
+                'seconds': round(seconds, 4), 'error': error, **extra,
+            }, ensure_ascii=False, default=str))
+
+    def render(self) -> str:
+        """Toàn bộ số liệu theo Prometheus text format."""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, (list(counts), total, count))
+                                for key, (counts, total, count) in self._histograms.items())
+
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{_labels(labels)} {value}")
+        for (name, labels), (counts, total, count) in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            for bound, bucket_count in zip(LATENCY_BUCKETS, counts):
+                lines.append(f"{name}_bucket{_labels(labels + (('le', f'{bound:g}'),))} {bucket_count}")
+            lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_labels(labels)} {total:.6f}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self):
+        """Ghi file Prometheus (thay thế nguyên tử để collector không đọc file dở)."""
+        if self.path is None:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+            tmp_path.write_text(self.render(), encoding='utf-8')
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logging.warning(f"Cannot write metrics file {self.path}: {e}")
+
+
+# Dùng chung cho cả process (mọi session Streamlit, CLI)
+METRICS = Metrics()
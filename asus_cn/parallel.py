@@ -0,0 +1,255 @@
+"""
+Trích xuất text song song nhiều file PDF bằng ProcessPoolExecutor.
+
+Kết quả được trả về theo thứ tự hoàn thành. Job được lấy dần từ iterable đầu
+vào (tối đa 2 job / worker đang chạy), nên có thể truyền đường dẫn của hàng
+nghìn file mà không phải nạp hết vào bộ nhớ. Lỗi của từng file được cô lập:
+nếu một worker chết (ví dụ PDF làm crash pdfminer), các file đang chạy dở được
+chạy lại riêng từng file để chỉ file gây lỗi bị loại, phần còn lại của batch
+tiếp tục trên pool mới.
+
+File có nhiều trang (từ 2 * ASUS_CN_SPLIT_PAGES trang) được chia thành các
+khoảng trang liên tiếp, đọc song song như các job riêng rồi ghép lại theo thứ tự
+trang; items được parse trên text đã ghép nên item vắt qua hai phần vẫn đúng.
+
+Với profile=True, worker đo từng bước đọc / parse (xem asus_cn.profiling) và
+trả số liệu trong ExtractionResult.profile.
+"""
+
+import io
+import logging
+import mmap
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterable, Iterator, NamedTuple, Optional, Tuple, Union
+
+from asus_cn.classify import DOC_CREDIT_NOTE, DOC_REBATE, DOC_UNKNOWN, read_document
+from asus_cn.extract import DEFAULT_EXTRACT_MODE
+from asus_cn.parsing import extract_items
+from asus_cn.profiling import measure, merge_profiles
+
+DEFAULT_WORKERS = int(os.environ.get('ASUS_CN_WORKERS', 0)) or (os.cpu_count() or 1)
+
+# Số trang tối thiểu của mỗi phần khi chia file lớn; 0 để không chia
+SPLIT_PAGES = int(os.environ.get('ASUS_CN_SPLIT_PAGES', 25))
+
+Source = Union[bytes, str, os.PathLike]
+
+
+class ExtractionResult(NamedTuple):
+    key: str
+    text: str
+    items: list
+    doc_type: str = DOC_UNKNOWN
+    error: Optional[str] = None
+    pages: int = 0
+    seconds: float = 0.0  # thời gian đọc + parse trong worker
+    profile: Optional[dict] = None  # số liệu đo hiệu năng, chỉ khi bật profile
+
+
+class _Part(NamedTuple):
+    """Một khoảng trang [start, stop) của file lớn, dùng làm key của job đọc phần đó."""
+    key: str
+    index: int
+    count: int
+    start: int
+    stop: Optional[int]  # None: tới trang cuối
+
+    def __str__(self) -> str:
+        return f"{self.key} [pages {self.start + 1}-{self.stop or 'end'}]"
+
+
+def _read_source(source: Source, mode: str, pages: Optional[range]) -> tuple:
+    if isinstance(source, (bytes, bytearray)):
+        return read_document(io.BytesIO(source), mode, pages)
+    if not os.path.getsize(source):
+        return read_document(io.BytesIO(b''), mode, pages)
+    # File trên đĩa được map vào bộ nhớ: các trang nằm trong page cache, không chép vào heap
+    with open(source, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        return read_document(mapped, mode, pages)
+
+
+def _extract_worker(key, source: Source, mode: str = DEFAULT_EXTRACT_MODE,
+                    profile: bool = False) -> ExtractionResult:
+    started = time.perf_counter()
+    measured = {} if profile else None
+    pages = None
+    if isinstance(key, _Part):
+        pages = range(key.start, key.stop if key.stop is not None else sys.maxsize)
+    doc_type, text, page_count = measure(measured, 'read', _read_source, source, mode, pages)
+    # Items của file chia phần được parse sau khi ghép text
+    items = []
+    if doc_type == DOC_CREDIT_NOTE and text and pages is None:
+        items = measure(measured, 'items', extract_items, text)
+    return ExtractionResult(key, text, items, doc_type, None, page_count, time.perf_counter() - started,
+                            measured)
+
+
+def _page_count(source: Source) -> int:
+    """Số trang khai báo trong cây trang (chỉ đọc xref, không parse nội dung); 0 nếu không đọc được."""
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdfparser import PDFParser
+    from pdfminer.pdftypes import resolve1
+
+    try:
+        with io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else open(source, 'rb') as f:
+            document = PDFDocument(PDFParser(f))
+            return int(resolve1(resolve1(document.catalog['Pages'])['Count']))
+    except Exception:
+        return 0
+
+
+def _split_pages(jobs: Iterable[Tuple[str, Source]], workers: int) -> Iterator[Tuple[object, Source]]:
+    """Thay mỗi file lớn bằng các phần (tối đa workers phần, mỗi phần ít nhất SPLIT_PAGES trang)."""
+    for key, source in jobs:
+        pages = _page_count(source) if SPLIT_PAGES > 0 and workers > 1 else 0
+        count = min(workers, pages // SPLIT_PAGES) if pages else 0
+        if count <= 1:
+            yield key, source
+            continue
+        # Phần cuối đọc tới hết file, phòng khi số trang khai báo sai
+        bounds = [pages * i // count for i in range(count)] + [None]
+        for i in range(count):
+            yield _Part(key, i, count, bounds[i], bounds[i + 1]), source
+
+
+class _PartResults:
+    """Gom kết quả các phần của file lớn, trả về kết quả cả file khi đủ phần."""
+
+    def __init__(self):
+        self._parts = {}  # key file -> [ExtractionResult hoặc None] theo thứ tự phần
+
+    def add(self, result: ExtractionResult) -> Optional[ExtractionResult]:
+        """Kết quả để trả cho nơi gọi, hoặc None nếu file còn phần đang đọc."""
+        part = result.key
+        if not isinstance(part, _Part):
+            return result
+        parts = self._parts.setdefault(part.key, [None] * part.count)
+        parts[part.index] = result
+        if any(r is None for r in parts):
+            return None
+        del self._parts[part.key]
+        return _join_parts(part.key, parts)
+
+
+def _join_parts(key: str, parts: list) -> ExtractionResult:
+    seconds = sum(part.seconds for part in parts)
+    error = next((part.error for part in parts if part.error), None)
+    if error:
+        return ExtractionResult(key, "", [], DOC_UNKNOWN, error, seconds=seconds)
+    # Mỗi phần kết thúc bằng dòng trống, ghép lại giống hệt text đọc cả file
+    text = "\n".join(part.text for part in parts if part.text)
+    # Giống read_document: Credit Note có dòng REBATE ở bất kỳ trang nào là REBATE
+    doc_type = DOC_REBATE if any(part.doc_type == DOC_REBATE for part in parts) else parts[0].doc_type
+    profile = None
+    if parts[0].profile is not None:
+        profile = merge_profiles(part.profile for part in parts)
+    items = []
+    if doc_type == DOC_CREDIT_NOTE and text:
+        items = measure(profile, 'items', extract_items, text)
+    return ExtractionResult(key, text, items, doc_type, None, sum(part.pages for part in parts), seconds,
+                            profile)
+
+
+def _mp_context():
+    # Server Streamlit chạy nhiều thread, fork trực tiếp dễ bị deadlock
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(method)
+
+
+def _error_result(key: str, error: str) -> ExtractionResult:
+    return ExtractionResult(key, "", [], DOC_UNKNOWN, error)
+
+
+def _extract_inline(jobs, mode: str, profile: bool) -> Iterator[ExtractionResult]:
+    for key, source in jobs:
+        try:
+            yield _extract_worker(key, source, mode, profile)
+        except Exception as e:
+            yield _error_result(key, f"{type(e).__name__}: {e}")
+
+
+def _run_pool(jobs: Iterator, workers: int, mode: str, profile: bool, crashed: dict):
+    """
+    Chạy jobs trên một pool mới cho tới khi hết job hoặc pool bị hỏng.
+    File bị mất do worker chết được ghi vào crashed. Trả về True nếu đã hết job.
+    """
+    max_in_flight = workers * 2
+    in_flight = {}
+    broken = False
+    exhausted = False
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_mp_context()) as pool:
+        while True:
+            while not broken and not exhausted and len(in_flight) < max_in_flight:
+                try:
+                    key, source = next(jobs)
+                except StopIteration:
+                    exhausted = True
+                    break
+                try:
+                    in_flight[pool.submit(_extract_worker, key, source, mode, profile)] = (key, source)
+                except BrokenProcessPool:
+                    crashed[key] = source
+                    broken = True
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                key, source = in_flight.pop(future)
+                try:
+                    yield future.result()
+                except BrokenProcessPool:
+                    crashed[key] = source
+                    broken = True
+                except Exception as e:
+                    yield _error_result(key, f"{type(e).__name__}: {e}")
+    return exhausted
+
+
+def extract_parallel(jobs: Iterable[Tuple[str, Source]],
+                     workers: int = DEFAULT_WORKERS,
+                     mode: str = DEFAULT_EXTRACT_MODE,
+                     profile: bool = False) -> Iterator[ExtractionResult]:
+    """
+    Phân loại và trích xuất text + items cho các cặp (key, bytes hoặc đường dẫn),
+    yield ExtractionResult khi từng file xong.
+    """
+    if hasattr(jobs, '__len__'):
+        # Danh sách có sẵn: chia trước để biết số job thực tế
+        jobs = list(_split_pages(jobs, workers))
+        if not jobs:
+            return
+        workers = min(workers, len(jobs))
+    else:
+        jobs = _split_pages(jobs, workers)
+    jobs = iter(jobs)
+    if workers <= 1:
+        yield from _extract_inline(jobs, mode, profile)
+        return
+
+    parts = _PartResults()
+    for result in _extract_pool(jobs, workers, mode, profile):
+        result = parts.add(result)
+        if result is not None:
+            yield result
+
+
+def _extract_pool(jobs: Iterator, workers: int, mode: str, profile: bool) -> Iterator[ExtractionResult]:
+    while True:
+        crashed = {}
+        exhausted = yield from _run_pool(jobs, workers, mode, profile, crashed)
+        if crashed:
+            logging.warning(f"Extraction worker crashed, retrying {len(crashed)} files one by one")
+        for key, source in crashed.items():
+            isolated = {}
+            yield from _run_pool(iter([(key, source)]), 1, mode, profile, isolated)
+            if isolated:
+                logging.error(f"Extraction worker crashed on {key}")
+                yield _error_result(key, "Worker process crashed")
+        if exhausted:
+            return
@@ -0,0 +1,158 @@
+"""
+Phân tích text Credit Note / REBATE thành các record
+"""
+
+import re
+
+
+def extract_cn_no(text: str) -> str:
+    match = re.search(r'CN NO\s*:\s*(\d+)', text)
+    return match.group(1) if match else ""
+
+
+def extract_product_line(text: str) -> str:
+    match = re.search(r'Credit Note Remark:\s*(.+?)(?:\r?\n|$)', text)
+    return match.group(1).strip() if match else ""
+
+
+def extract_total(text: str) -> str:
+    match = re.search(r'Total:\s*([\d,]+\.?\d*)', text)
+    return match.group(1) if match else ""
+
+
+# Mẫu dùng cho extract_items (biên dịch một lần)
+ITEM_RE = re.compile(r'^(\d+\.\d+)\s+([A-Z0-9\-]+)\s+(\d+)\s+(.+)$')
+NUMBER_RE = re.compile(r'[\d,]+\.?\d*')
+SN_RE = re.compile(r'SN:([A-Z0-9]+)')
+MEMO_RE = re.compile(r'MEMO:([A-Z0-9]+)')
+INVOICE_RE = re.compile(r'INVOICE[:\s]+([\d]+)')
+
+PRODUCT_SKIP_PREFIXES = ('Model:', '===', 'No ', 'Page', 'SO:', 'Note:')
+SERIAL_SKIP_PREFIXES = ('===', 'Page:', 'CN#', 'No Description',
+                        'ASUS GLOBAL', '10 Changi', 'Reg. No',
+                        'Credit Note', 'To :', 'Address', 'Attn',
+                        'Fax', 'Date', 'CN Reason', 'Credit Note Remark')
+
+# Số dòng sau dòng item được dùng để tìm từng trường
+PRODUCT_WINDOW = 2
+SERIAL_WINDOW = 14
+INVOICE_WINDOW = 9
+
+
+def _find_serial(line: str) -> str:
+    sn_match = SN_RE.search(line)
+    if sn_match:
+        return sn_match.group(1)
+    memo_match = MEMO_RE.search(line)
+    return memo_match.group(1) if memo_match else ""
+
+
+def extract_items(text: str) -> list:
+    """
+    Trích xuất các item từ text.
+
+    Duyệt mỗi dòng đúng một lần: dòng item mở các ô tìm Product / Serial /
+    Invoice cho item đó, các dòng tiếp theo lần lượt điền vào. Tìm Serial và
+    Invoice dừng ở dòng item kế tiếp, tìm Product thì không (giữ nguyên hành vi cũ).
+    """
+    items = []
+    product_pending = []  # [(item, dòng cuối cùng được xét)]
+    serial_item = None
+    serial_until = 0
+    invoice_item = None
+    invoice_until = 0
+
+    for i, raw_line in enumerate(text.split('\n')):
+        line = raw_line.strip()
+        item_match = ITEM_RE.match(line)
+
+        if product_pending:
+            skip = line.startswith(PRODUCT_SKIP_PREFIXES)
+            is_product = not skip and (
+                line.startswith('AS ')
+                or ('/' in line and not line.startswith(('EAN', 'MODEL')))
+            )
+            if is_product:
+                for item, _ in product_pending:
+                    item['Product'] = line
+                product_pending = []
+            else:
+                product_pending = [(item, until) for item, until in product_pending if until > i]
+
+        if serial_item is not None:
+            if i > serial_until or item_match:
+                serial_item = None
+            elif 'SN:' in line and not line.startswith(SERIAL_SKIP_PREFIXES):
+                serial_item['Serial'] = _find_serial(line)
+                serial_item = None
+
+        if invoice_item is not None:
+            if i > invoice_until or item_match:
+                invoice_item = None
+            else:
+                inv_match = INVOICE_RE.search(line)
+                if inv_match:
+                    invoice_item['Invoice'] = inv_match.group(1)
+                    invoice_item = None
+
+        if item_match:
+            numbers = NUMBER_RE.findall(item_match.group(4).strip())
+            item = {
+                'No': item_match.group(1),
+                'Part No': item_match.group(2),
+                'Product': "",
+                'Serial': "",
+                'FOB': numbers[-1] if numbers else "",
+                'Invoice': ""
+            }
+            items.append(item)
+            product_pending.append((item, i + PRODUCT_WINDOW))
+            serial_item, serial_until = item, i + SERIAL_WINDOW
+            invoice_item, invoice_until = item, i + INVOICE_WINDOW
+
+    return items
+
+
+def parse_rebate_text(content: str) -> tuple:
+    """Trả về (CN NO, [(invoice, amount)]) của một file REBATE."""
+    cn_no = extract_cn_no(content)
+    rebate_pattern = re.findall(
+        r'REBATE FOR INVOICE:\s*(\d+)\s+([\d,.]+)',
+        content
+    )
+    return cn_no, rebate_pattern
+
+
+def parse_rebate_files(pdf_texts: dict) -> dict:
+    rebate_mapping = {}
+    for filename, content in pdf_texts.items():
+        if 'REBATE FOR INVOICE:' not in content:
+            continue
+        cn_no, rebate_pattern = parse_rebate_text(content)
+        for invoice, amount in rebate_pattern:
+            rebate_mapping[invoice] = {
+                'CN_Landing': cn_no,
+                'Landing_cost': amount
+            }
+    return rebate_mapping
+
+
+def parse_header(text: str) -> dict:
+    """Các trường cấp file của Credit Note: CN NO, Product line, Total."""
+    return {
+        'cn_no': extract_cn_no(text),
+        'product_line': extract_product_line(text),
+        'total': extract_total(text),
+    }
+
+
+def process_pdf_text(filename: str, text: str, rebate_mapping: dict, items: list = None):
+    """FileRecords của một file (REBATE: không có dòng nào)."""
+    from asus_cn.records import FileRecords, build_records
+
+    if 'REBATE FOR INVOICE:' in text:
+        return FileRecords(filename)
+
+    if items is None:
+        items = extract_items(text)
+    return build_records(filename, parse_header(text), items, rebate_mapping)
@@ -0,0 +1,166 @@
+"""
+Pipeline trích xuất dùng chung cho app Streamlit và chế độ chạy batch (CLI)
+"""
+
+import os
+import queue
+import threading
+from typing import Iterable, Iterator, NamedTuple, Optional, Tuple
+
+from asus_cn.cache import ExtractionCache, file_digest, path_digest
+from asus_cn.classify import DOC_UNKNOWN, classify_text
+from asus_cn.extract import DEFAULT_EXTRACT_MODE
+from asus_cn.metrics import METRICS, Metrics
+from asus_cn.parallel import DEFAULT_WORKERS, Source, extract_parallel
+
+_DONE = object()
+
+
+class ExtractedFile(NamedTuple):
+    name: str
+    entry: Optional[dict]  # {'text', 'items', 'doc_type'} hoặc None nếu không đọc được
+    error: Optional[str] = None
+    digest: str = ""  # SHA-256 nội dung file
+    size: int = 0  # byte
+    seconds: float = 0.0  # thời gian đọc PDF (0 nếu lấy từ cache)
+    cached: bool = False
+    profile: Optional[dict] = None  # số liệu đo hiệu năng (asus_cn.profiling), chỉ khi bật profile
+
+
+def iter_extracted(sources: Iterable[Tuple[str, Source]],
+                   cache: Optional[ExtractionCache] = None,
+                   workers: int = DEFAULT_WORKERS,
+                   mode: str = DEFAULT_EXTRACT_MODE,
+                   metrics: Optional[Metrics] = METRICS,
+                   scheduler=None, user: str = '', profile: bool = False) -> Iterator[ExtractedFile]:
+    """
+    Trích xuất các cặp (tên file, bytes hoặc đường dẫn) theo thứ tự hoàn thành.
+    File trùng nội dung chỉ được đọc một lần; file đã có trong cache (kể cả kết quả
+    phân loại) không qua pdfplumber. Số liệu từng file được ghi vào metrics.
+    Nếu có scheduler (FairScheduler), file được đọc trên pool dùng chung theo lượt
+    của user thay vì pool riêng với workers process.
+    Với profile=True, mọi file đều được đọc lại (không lấy từ cache) để đo hiệu năng.
+
+    File lấy từ cache và kết quả đọc PDF đi chung một hàng đợi có giới hạn, được
+    trả về ngay khi có: job lấy phần lớn từ cache vẫn báo tiến độ từng file và
+    không giữ text của các file đã trả trong bộ nhớ.
+    """
+    names_by_key = {}
+    # Kết quả đã xong của các key mà cache không trả lại được cho file trùng nội dung
+    # (lỗi, không dùng cache, profile)
+    finished = {}
+    # pending_jobs chạy trên thread khác (thread đọc kết quả bên dưới, hoặc của
+    # scheduler) trong lúc thread đọc kết quả cập nhật names_by_key / finished
+    lock = threading.Lock()
+    done = queue.Queue(maxsize=max(workers, 1) * 2)
+    closed = threading.Event()
+
+    def put(item) -> bool:
+        """Đưa vào hàng đợi trả về; False nếu nơi gọi đã dừng đọc."""
+        while not closed.is_set():
+            try:
+                done.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def pending_jobs():
+        for name, source in sources:
+            if isinstance(source, (bytes, bytearray)):
+                digest, size = file_digest(source), len(source)
+            else:
+                digest, size = path_digest(source), os.path.getsize(source)
+            # Mỗi chế độ đọc có entry cache riêng
+            key = digest if mode == 'full' else f"{digest}-{mode}"
+
+            with lock:
+                duplicate = finished.get(key)
+                if duplicate is None and key in names_by_key:
+                    names_by_key[key][1].append((name, size))
+                    continue
+            if duplicate is not None:
+                entry, error = duplicate
+                if not put(ExtractedFile(name, entry, error, digest, size, cached=True)):
+                    return
+                continue
+
+            # Chỉ thread này thêm key vào names_by_key, nên key chưa thể xong trong lúc tra cache
+            entry = cache.get(key) if cache is not None and not profile else None
+            if entry is not None:
+                if 'doc_type' not in entry:
+                    entry['doc_type'] = classify_text(entry['text'])
+                if not put(ExtractedFile(name, entry, None, digest, size, cached=True)):
+                    return
+                continue
+
+            with lock:
+                names_by_key[key] = (digest, [(name, size)])
+            yield key, source
+
+    def run():
+        if scheduler is not None:
+            results = scheduler.extract(pending_jobs(), user, mode, profile)
+        else:
+            results = extract_parallel(pending_jobs(), workers=workers, mode=mode, profile=profile)
+        try:
+            for result in results:
+                entry = None
+                error = result.error
+                if not error:
+                    entry = {'text': result.text, 'items': result.items, 'doc_type': result.doc_type,
+                             'pages': result.pages}
+                    if cache is not None:
+                        cache.put(result.key, entry)
+                with lock:
+                    if error or cache is None or profile:
+                        finished[result.key] = (entry, error)
+                    digest, names = names_by_key.pop(result.key)
+                for i, (name, size) in enumerate(names):
+                    # File trùng nội dung không tốn thêm thời gian đọc
+                    if not put(ExtractedFile(name, entry, error, digest, size,
+                                             result.seconds if i == 0 else 0.0, cached=i > 0,
+                                             profile=result.profile if i == 0 else None)):
+                        return
+            put(_DONE)
+        except Exception as e:
+            put(e)
+        finally:
+            results.close()
+
+    def observed(extracted: ExtractedFile) -> ExtractedFile:
+        if metrics is not None:
+            entry = extracted.entry or {}
+            metrics.observe_file(
+                extracted.name, entry.get('doc_type', DOC_UNKNOWN), extracted.size,
+                entry.get('pages', 0), len(entry.get('items') or ()),
+                extracted.seconds, extracted.cached, extracted.error
+            )
+        return extracted
+
+    threading.Thread(target=run, name='asus-cn-extract', daemon=True).start()
+    try:
+        while True:
+            item = done.get()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield observed(item)
+    finally:
+        closed.set()
+
+
+def iter_pdf_paths(inputs: Iterable) -> Iterator[Tuple[str, str]]:
+    """Liệt kê các file PDF (tên tương đối, đường dẫn) trong các file / thư mục đầu vào."""
+    for item in inputs:
+        item = os.fspath(item)
+        if os.path.isdir(item):
+            for root, dirs, files in os.walk(item):
+                dirs.sort()
+                for filename in sorted(files):
+                    if filename.lower().endswith('.pdf'):
+                        path = os.path.join(root, filename)
+                        yield os.path.relpath(path, item).replace(os.sep, '/'), path
+        elif os.path.isfile(item):
+            yield os.path.basename(item), item
@@ -0,0 +1,131 @@
+"""
+Đo hiệu năng từng file khi bật chế độ profiling (tuỳ chọn ở sidebar của app).
+
+Bước đọc PDF (read_document) và parse items (extract_items) của mỗi file được
+bọc bởi cProfile và tracemalloc ngay trong worker: ghi lại thời gian, bộ nhớ
+cấp phát đỉnh và bảng thống kê cProfile (dạng marshal, giống file .prof của
+pstats.dump_stats). Job lưu số liệu từng file vào thư mục profile/; bảng của
+cả job được gộp lại để xem hàm nào tốn thời gian nhất, hoặc tải về phân tích
+tiếp (snakeviz, pstats) mà không cần file PDF gốc.
+
+tracemalloc làm chậm việc đọc đáng kể, nên chỉ dùng để so sánh giữa các file /
+hàm với nhau, không phải thời gian chạy thật.
+"""
+
+import cProfile
+import json
+import marshal
+import os
+import pstats
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Iterable, NamedTuple, Optional
+
+STAGES = ('read', 'items')
+
+
+def measure(profile: Optional[dict], stage: str, func, *args):
+    """
+    func(*args); nếu profile không phải None thì chạy dưới cProfile + tracemalloc và
+    cộng thời gian, bộ nhớ đỉnh, thống kê của lần gọi vào profile[stage].
+    """
+    if profile is None:
+        return func(*args)
+
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    profiler.enable()
+    try:
+        return func(*args)
+    finally:
+        profiler.disable()
+        seconds = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] - base
+        if not tracing:
+            tracemalloc.stop()
+        profiler.create_stats()
+        measured = profile.setdefault(stage, {'seconds': 0.0, 'peak_bytes': 0})
+        measured['seconds'] += seconds
+        measured['peak_bytes'] = max(measured['peak_bytes'], peak)
+        profile.setdefault('stats', []).append(marshal.dumps(profiler.stats))
+
+
+def merge_profiles(profiles: Iterable[dict]) -> dict:
+    """Gộp số liệu các phần của một file chia trang: cộng thời gian, lấy bộ nhớ đỉnh lớn nhất."""
+    merged = {}
+    for profile in profiles:
+        for stage in STAGES:
+            if stage in profile:
+                measured = merged.setdefault(stage, {'seconds': 0.0, 'peak_bytes': 0})
+                measured['seconds'] += profile[stage]['seconds']
+                measured['peak_bytes'] = max(measured['peak_bytes'], profile[stage]['peak_bytes'])
+        merged.setdefault('stats', []).extend(profile.get('stats', ()))
+    return merged
+
+
+def save_profile(directory, index: int, name: str, size: int, entry: Optional[dict], profile: dict):
+    """Ghi số liệu một file vào directory: profile.jsonl (tóm tắt) và các file .prof."""
+    directory = Path(directory)
+    stats_dir = directory / 'profile'
+    stats_dir.mkdir(parents=True, exist_ok=True)
+    for i, data in enumerate(profile.get('stats', ())):
+        (stats_dir / f"{index:05d}-{i}.prof").write_bytes(data)
+
+    entry = entry or {}
+    line = {'index': index, 'name': name, 'size': size, 'pages': entry.get('pages', 0),
+            'doc_type': entry.get('doc_type', ''), 'items': len(entry.get('items') or ())}
+    for stage in STAGES:
+        measured = profile.get(stage, {'seconds': 0.0, 'peak_bytes': 0})
+        line[f'{stage}_seconds'] = measured['seconds']
+        line[f'{stage}_peak_bytes'] = measured['peak_bytes']
+    with open(directory / 'profile.jsonl', 'a', encoding='utf-8') as f:
+        f.write(json.dumps(line, ensure_ascii=False) + '\n')
+
+
+class ProfileReport(NamedTuple):
+    files: list  # số liệu từng file, chậm nhất trước
+    functions: list  # các hàm theo thời gian cộng dồn (cumulative) của cả job, lớn nhất trước
+    stats: bytes  # thống kê cProfile đã gộp, định dạng .prof
+
+    def to_json(self) -> str:
+        return json.dumps({'files': self.files, 'functions': self.functions}, ensure_ascii=False, indent=1)
+
+
+def _functions(stats: pstats.Stats) -> list:
+    rows = [
+        {'function': pstats.func_std_string(func), 'calls': calls, 'tottime': round(tottime, 6),
+         'cumtime': round(cumtime, 6)}
+        for func, (_, calls, tottime, cumtime, _) in stats.stats.items()
+    ]
+    rows.sort(key=lambda row: row['cumtime'], reverse=True)
+    return rows
+
+
+def load_profile(directory) -> Optional[ProfileReport]:
+    """Báo cáo từ số liệu save_profile đã ghi trong directory; None nếu job không bật profiling."""
+    directory = Path(directory)
+    try:
+        with open(directory / 'profile.jsonl', encoding='utf-8') as f:
+            lines = [json.loads(line) for line in f if line.endswith('\n')]
+    except OSError:
+        return None
+
+    # File được đọc lại khi job chạy tiếp sau khi process khởi động lại: giữ lần đo cuối
+    files = {line['index']: line for line in lines}
+    paths = sorted(str(path) for path in (directory / 'profile').glob('*.prof')
+                   if int(path.name.split('-')[0]) in files)
+    functions = []
+    data = b''
+    if paths:
+        with open(os.devnull, 'w') as devnull:
+            stats = pstats.Stats(*paths, stream=devnull)
+        functions = _functions(stats)
+        data = marshal.dumps(stats.stats)
+    files = sorted(files.values(), key=lambda line: line['read_seconds'] + line['items_seconds'], reverse=True)
+    return ProfileReport(files, functions, data)
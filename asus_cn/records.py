@@ -0,0 +1,191 @@
+"""
+Record kết quả dạng cột.
+
+Mỗi Credit Note là một FileRecords: các trường cấp file (tên, Product line,
+CN NO, CN Landing, Total, Landing cost) giữ một lần, các trường của item giữ
+theo cột. Số tiền được parse một lần thành float. DataFrame được dựng một lượt
+từ các cột, các trường lặp lại (tên file, Product line, CN NO...) dùng dtype
+category.
+
+link_records dựng records cho cả batch một lượt: items của mọi file được ghép
+thành cột, liên kết REBATE là một phép join theo invoice với bảng REBATE, rồi
+Landing cost / CN Landing được tổng hợp theo từng file.
+"""
+
+import logging
+from array import array
+from itertools import chain
+from typing import Iterable, Iterator, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+COLUMNS_ORDER = [
+    'Tên file PDF', 'Product', 'Product line',
+    'Serial', 'Part No', 'FOB', 'CN FOB',
+    'CN Landing', 'Landing cost'
+]
+AMOUNT_COLUMNS = ('FOB', 'Landing cost')
+TOTAL_LABEL = 'TOTAL'
+
+
+def parse_amount(text: str) -> float:
+    """'1,234.50' -> 1234.5; chuỗi rỗng hoặc không đọc được -> NaN."""
+    try:
+        return float(text.replace(',', ''))
+    except (AttributeError, ValueError):
+        return float('nan')
+
+
+def _amounts(texts: list) -> array:
+    try:
+        # Chuỗi rỗng -> NaN như parse_amount
+        return array('d', [float(text.replace(',', '') or 'nan') for text in texts])
+    except ValueError:
+        return array('d', [parse_amount(text) for text in texts])
+
+
+class FileRecords:
+    """Các dòng của một Credit Note: một dòng cho mỗi item và dòng TOTAL."""
+
+    __slots__ = ('file_name', 'product_line', 'cn_no', 'cn_landing', 'total', 'landing_cost',
+                 'products', 'serials', 'part_nos', 'fobs')
+
+    def __init__(self, file_name: str, product_line: str = '', cn_no: str = '', cn_landing: str = '',
+                 total: float = float('nan'), landing_cost: float = float('nan')):
+        self.file_name = file_name
+        self.product_line = product_line
+        self.cn_no = cn_no
+        self.cn_landing = cn_landing
+        self.total = total
+        self.landing_cost = landing_cost
+        self.products = []
+        self.serials = []
+        self.part_nos = []
+        self.fobs = array('d')
+
+    def __len__(self) -> int:
+        """Số dòng, kể cả dòng TOTAL (0 nếu không có item)."""
+        return len(self.part_nos) + 1 if self.part_nos else 0
+
+    def __iter__(self) -> Iterator[tuple]:
+        """Các dòng theo COLUMNS_ORDER, dòng TOTAL cuối cùng."""
+        if not self.part_nos:
+            return
+        for product, serial, part_no, fob in zip(self.products, self.serials, self.part_nos, self.fobs):
+            yield (self.file_name, product, self.product_line, serial, part_no, fob,
+                   self.cn_no, self.cn_landing, float('nan'))
+        yield (self.file_name, '', '', '', TOTAL_LABEL, self.total,
+               self.cn_no, self.cn_landing, self.landing_cost)
+
+
+def link_records(files: Sequence[Tuple[str, dict, list]], rebate_mapping: dict) -> list:
+    """
+    FileRecords (kèm dòng TOTAL) của nhiều Credit Note trong một lượt.
+
+    files: [(tên file, header, items đã parse)]. rebate_mapping: invoice ->
+    {'CN_Landing', 'Landing_cost'} hoặc None (không có REBATE).
+    Landing cost của file là tổng landing cost các invoice liên kết được, CN
+    Landing lấy theo invoice cuối cùng có CN Landing.
+    """
+    counts = np.fromiter((len(items) for _, _, items in files), dtype=np.int64, count=len(files))
+    offsets = [0, *np.cumsum(counts).tolist()]
+    file_index = np.repeat(np.arange(len(files)), counts)
+    items = list(chain.from_iterable(items for _, _, items in files))
+
+    # Join với bảng REBATE theo invoice: dòng REBATE của từng item, -1 nếu không có
+    invoices = [invoice for invoice, rebate in rebate_mapping.items() if invoice and rebate is not None]
+    rebates = [rebate_mapping[invoice] for invoice in invoices]
+    rebate_rows = pd.Index(invoices, dtype=object).get_indexer(
+        pd.Index([item.get('Invoice', '') for item in items], dtype=object)
+    )
+    linked = rebate_rows >= 0
+    linked_rows, linked_files = rebate_rows[linked], file_index[linked]
+
+    # Tổng landing cost theo file (cộng lần lượt theo thứ tự item như sum())
+    landing_costs = [rebate['Landing_cost'] for rebate in rebates]
+    amounts = np.frombuffer(_amounts(landing_costs), dtype=float)[linked_rows]
+    linked_counts = np.bincount(linked_files, minlength=len(files))
+    invalid = np.bincount(linked_files, weights=np.isnan(amounts), minlength=len(files)) > 0
+    sums = np.bincount(linked_files, weights=amounts, minlength=len(files))
+    for i in np.flatnonzero(invalid):
+        costs = [landing_costs[row] for row in linked_rows[linked_files == i]]
+        logging.warning(f"{files[i][0]}: cannot parse landing cost {', '.join(costs)}")
+    landing = [
+        round(total, 2) if count and not bad else float('nan')
+        for total, count, bad in zip(sums.tolist(), linked_counts.tolist(), invalid.tolist())
+    ]
+
+    # CN Landing: REBATE cuối cùng (theo thứ tự item) có CN Landing của mỗi file
+    named = np.array([bool(rebate['CN_Landing']) for rebate in rebates], dtype=bool)[linked_rows]
+    last_named = pd.Series(linked_rows[named]).groupby(linked_files[named]).last()
+    cn_landing = [''] * len(files)
+    for i, row in zip(last_named.index.tolist(), last_named.tolist()):
+        cn_landing[i] = rebates[row]['CN_Landing']
+
+    fobs = _amounts([item['FOB'] for item in items])
+    products = [item['Product'] for item in items]
+    serials = [item['Serial'] for item in items]
+    part_nos = [item['Part No'] for item in items]
+
+    file_records = []
+    for i, (filename, header, _) in enumerate(files):
+        records = FileRecords(filename, header['product_line'], header['cn_no'], cn_landing[i],
+                              parse_amount(header['total']), landing[i])
+        start, stop = offsets[i], offsets[i + 1]
+        records.products = products[start:stop]
+        records.serials = serials[start:stop]
+        records.part_nos = part_nos[start:stop]
+        records.fobs = fobs[start:stop]
+        file_records.append(records)
+    return file_records
+
+
+def build_records(filename: str, header: dict, items: list, rebate_mapping: dict) -> FileRecords:
+    """Các dòng kết quả (kèm dòng TOTAL) của một Credit Note từ header và items đã parse."""
+    invoices = {item.get('Invoice', '') for item in items}
+    mapping = {invoice: rebate_mapping[invoice] for invoice in invoices if invoice in rebate_mapping}
+    return link_records([(filename, header, items)], mapping)[0]
+
+
+def iter_rows(file_records: Iterable[FileRecords]) -> Iterator[tuple]:
+    """Các dòng của lần lượt từng file, không dựng DataFrame."""
+    return chain.from_iterable(file_records)
+
+
+def _file_categorical(values: list, counts: np.ndarray, total_rows: np.ndarray = None,
+                      total_value: str = '') -> pd.Categorical:
+    """Cột category từ một giá trị mỗi file (dòng TOTAL nhận total_value nếu có total_rows)."""
+    if total_rows is not None:
+        values = values + [total_value]
+    codes, categories = pd.factorize(np.array(values, dtype=object))
+    row_codes = np.repeat(codes[:len(counts)], counts)
+    if total_rows is not None:
+        row_codes[total_rows] = codes[-1]
+    return pd.Categorical.from_codes(row_codes, categories=categories)
+
+
+def records_to_dataframe(file_records: Iterable[FileRecords]) -> pd.DataFrame:
+    """Tạo DataFrame kết quả (thứ tự cột chuẩn) một lượt từ các FileRecords."""
+    files = [records for records in file_records if records]
+    if not files:
+        return pd.DataFrame({name: pd.Series(dtype=float if name in AMOUNT_COLUMNS else object)
+                             for name in COLUMNS_ORDER})
+
+    counts = np.fromiter((len(records) for records in files), dtype=np.int64, count=len(files))
+    total_rows = np.cumsum(counts) - 1
+    landing_cost = np.full(int(counts.sum()), np.nan)
+    landing_cost[total_rows] = [records.landing_cost for records in files]
+
+    columns = {
+        'Tên file PDF': _file_categorical([records.file_name for records in files], counts),
+        'Product': pd.Categorical(list(chain.from_iterable(records.products + [''] for records in files))),
+        'Product line': _file_categorical([records.product_line for records in files], counts, total_rows),
+        'Serial': list(chain.from_iterable(records.serials + [''] for records in files)),
+        'Part No': pd.Categorical(list(chain.from_iterable(records.part_nos + [TOTAL_LABEL] for records in files))),
+        'FOB': np.concatenate([chunk for records in files for chunk in (records.fobs, (records.total,))]),
+        'CN FOB': _file_categorical([records.cn_no for records in files], counts),
+        'CN Landing': _file_categorical([records.cn_landing for records in files], counts),
+        'Landing cost': landing_cost,
+    }
+    return pd.DataFrame(columns, columns=COLUMNS_ORDER)
@@ -0,0 +1,214 @@
+"""
+Bộ lập lịch đọc PDF dùng chung cho mọi session trong process.
+
+Toàn bộ việc đọc PDF của các session chạy trên một ProcessPoolExecutor duy nhất
+với số worker cố định (ASUS_CN_WORKERS), nên thông lượng không đổi dù có bao
+nhiêu session đang mở. Mỗi lần chỉ đưa vào pool đúng số file bằng số worker,
+file tiếp theo được chọn lần lượt theo từng người dùng (round-robin), nên một
+batch lớn không chặn người dùng khác.
+
+Việc chuẩn bị từng file (hash, tra cache, giải nén ZIP, đếm trang) chạy trên
+thread riêng của mỗi lần gọi extract, đẩy trước tối đa số worker file vào hàng
+đợi; thread điều phối chỉ lấy file đã sẵn sàng, nên một người dùng có batch
+phần lớn đã cache hoặc ZIP lớn không làm các worker phải chờ.
+
+Giống extract_parallel, file nhiều trang được chia thành các phần đọc song song
+(mỗi phần là một lượt của người dùng đó). Nếu một worker chết thì các file đang
+chạy dở trên pool đó được chạy lại riêng từng file trên một pool một worker; chỉ
+file gây lỗi bị loại.
+"""
+
+import logging
+import queue
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterable, Iterator, Tuple
+
+from asus_cn.extract import DEFAULT_EXTRACT_MODE
+from asus_cn.parallel import (DEFAULT_WORKERS, ExtractionResult, Source, _error_result, _extract_worker,
+                              _mp_context, _PartResults, _split_pages)
+
+_DONE = object()
+_EXHAUSTED = object()
+
+
+class _Client:
+    """Một lần gọi extract: nguồn file của nó, các file đã chuẩn bị và hàng đợi kết quả trả về."""
+
+    __slots__ = ('user', 'jobs', 'mode', 'profile', 'prepared', 'results', 'in_flight', 'exhausted',
+                 'closed')
+
+    def __init__(self, user: str, jobs: Iterator, mode: str, profile: bool = False):
+        self.user = user
+        self.jobs = jobs
+        self.mode = mode
+        self.profile = profile
+        self.prepared = deque()  # (key, source) sẵn sàng đưa vào pool, rồi _EXHAUSTED / lỗi
+        self.results = queue.Queue()
+        self.in_flight = 0
+        self.exhausted = False
+        self.closed = False
+
+
+class FairScheduler:
+    """Pool đọc PDF dùng chung, chia lượt công bằng theo người dùng."""
+
+    def __init__(self, workers: int = DEFAULT_WORKERS):
+        self.workers = max(workers, 1)
+        self._cond = threading.Condition()
+        self._users = OrderedDict()  # người dùng -> deque[_Client], thứ tự = lượt tiếp theo
+        self._in_flight = 0
+        self._pool = None
+        self._isolation_pool = None
+        threading.Thread(target=self._dispatch_loop, name='asus-cn-scheduler', daemon=True).start()
+
+    def extract(self, jobs: Iterable[Tuple[str, Source]], user: str = '',
+                mode: str = DEFAULT_EXTRACT_MODE, profile: bool = False) -> Iterator[ExtractionResult]:
+        """Như extract_parallel, nhưng chạy trên pool dùng chung theo lượt của user."""
+        client = _Client(user, _split_pages(jobs, self.workers), mode, profile)
+        parts = _PartResults()
+        with self._cond:
+            self._users.setdefault(user, deque()).append(client)
+        threading.Thread(target=self._prefetch, args=(client,), name=f'asus-cn-prefetch-{user}',
+                         daemon=True).start()
+        try:
+            while True:
+                item = client.results.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                item = parts.add(item)
+                if item is not None:
+                    yield item
+        finally:
+            with self._cond:
+                client.closed = True
+                self._detach(client)
+                self._cond.notify_all()
+
+    def _prefetch(self, client: _Client):
+        """Chuẩn bị trước các file của client (hash, cache, ZIP, đếm trang), tối đa số worker file."""
+        try:
+            for job in client.jobs:
+                with self._cond:
+                    self._cond.wait_for(lambda: len(client.prepared) < self.workers or client.closed)
+                    if client.closed:
+                        return
+                    client.prepared.append(job)
+                    self._cond.notify_all()
+            item = _EXHAUSTED
+        except Exception as e:
+            item = e
+        with self._cond:
+            client.prepared.append(item)
+            self._cond.notify_all()
+
+    def _detach(self, client: _Client):
+        clients = self._users.get(client.user)
+        if clients is not None and client in clients:
+            clients.remove(client)
+            if not clients:
+                del self._users[client.user]
+
+    def _next_job(self) -> tuple:
+        """
+        (client, file đã chuẩn bị) tiếp theo theo round-robin giữa người dùng, rồi
+        giữa các client của người đó; bỏ qua client chưa có file sẵn sàng.
+        """
+        with self._cond:
+            while True:
+                if self._in_flight < self.workers:
+                    for user, clients in self._users.items():
+                        for client in clients:
+                            if client.prepared:
+                                self._users.move_to_end(user)
+                                clients.remove(client)
+                                clients.append(client)
+                                return client, client.prepared.popleft()
+                self._cond.wait()
+
+    def _dispatch_loop(self):
+        while True:
+            client, item = self._next_job()
+            with self._cond:
+                # Chỗ trống trong hàng đợi chuẩn bị của client
+                self._cond.notify_all()
+                if item is _EXHAUSTED:
+                    self._detach(client)
+                    client.exhausted = True
+                    if not client.in_flight:
+                        client.results.put(_DONE)
+                    continue
+                if isinstance(item, Exception):
+                    self._detach(client)
+                    client.results.put(item)
+                    continue
+                self._in_flight += 1
+                client.in_flight += 1
+            key, source = item
+            self._submit(client, key, source, isolated=False)
+
+    def _get_pool(self, isolated: bool) -> ProcessPoolExecutor:
+        with self._cond:
+            if isolated:
+                if self._isolation_pool is None:
+                    self._isolation_pool = ProcessPoolExecutor(max_workers=1, mp_context=_mp_context())
+                return self._isolation_pool
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=_mp_context())
+            return self._pool
+
+    def _drop_pool(self, pool: ProcessPoolExecutor):
+        with self._cond:
+            if self._pool is pool:
+                self._pool = None
+            elif self._isolation_pool is pool:
+                self._isolation_pool = None
+        pool.shutdown(wait=False)
+
+    def _submit(self, client: _Client, key: str, source: Source, isolated: bool):
+        pool = self._get_pool(isolated)
+        try:
+            future = pool.submit(_extract_worker, key, source, client.mode, client.profile)
+        except (BrokenProcessPool, RuntimeError):
+            self._drop_pool(pool)
+            self._crashed(client, key, source, isolated)
+            return
+        future.add_done_callback(lambda f: self._finished(f, pool, client, key, source, isolated))
+
+    def _crashed(self, client: _Client, key: str, source: Source, isolated: bool):
+        if isolated:
+            logging.error(f"Extraction worker crashed on {key}")
+            self._complete(client, _error_result(key, "Worker process crashed"), isolated)
+            return
+        # Trả chỗ trong pool chung, chạy lại riêng file này
+        logging.warning(f"Extraction worker crashed, retrying {key} alone")
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+        self._submit(client, key, source, isolated=True)
+
+    def _finished(self, future, pool: ProcessPoolExecutor, client: _Client, key: str, source: Source,
+                  isolated: bool):
+        try:
+            result = future.result()
+        except BrokenProcessPool:
+            self._drop_pool(pool)
+            self._crashed(client, key, source, isolated)
+            return
+        except Exception as e:
+            result = _error_result(key, f"{type(e).__name__}: {e}")
+        self._complete(client, result, isolated)
+
+    def _complete(self, client: _Client, result: ExtractionResult, isolated: bool):
+        client.results.put(result)
+        with self._cond:
+            if not isolated:
+                self._in_flight -= 1
+            client.in_flight -= 1
+            if client.exhausted and not client.in_flight:
+                client.results.put(_DONE)
+            self._cond.notify_all()
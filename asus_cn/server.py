@@ -0,0 +1,310 @@
+"""
+HTTP API cục bộ để hệ thống khác (ERP) gửi PDF và lấy records, không qua giao diện.
+
+    python -m asus_cn serve --host 127.0.0.1 --port 8765
+
+Các endpoint (JSON, trừ file kết quả):
+
+- POST   /jobs                 multipart/form-data: một hoặc nhiều field 'files'
+                               (PDF hoặc ZIP), field 'user' tuỳ chọn (hoặc header
+                               X-User); trả về 202 + trạng thái job
+- GET    /jobs/<id>            trạng thái / tiến độ (poll tới khi status là done)
+- GET    /jobs/<id>/records    ?format=json|csv|xlsx|parquet&drop_totals=1
+- DELETE /jobs/<id>            xoá job đã xong
+- GET    /health
+
+Job chạy trên JobRunner như app (lưu trên đĩa, chạy tiếp sau khi khởi động lại,
+mọi client chia lượt công bằng trên một pool worker dùng chung), và records được
+dựng bằng Batch + sổ cái giống bước 3 của app, nên kết quả giống hệt giao diện.
+GET chỉ đọc sổ cái (liên kết với REBATE đã có), không ghi tài liệu của job vào.
+Server dùng HTTP/1.1 keep-alive: client giữ một kết nối cho cả lúc upload, poll
+và tải kết quả. File upload được đọc theo khối ra file tạm, không nạp cả request
+vào bộ nhớ.
+"""
+
+import io
+import json
+import logging
+import math
+import os
+import re
+import tempfile
+from email.message import Message
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from asus_cn.batch import Batch
+from asus_cn.export import EXPORT_FORMATS, _without_totals, write_rows
+from asus_cn.jobs import ACTIVE_STATUSES, JobRejected, JobRunner
+from asus_cn.records import COLUMNS_ORDER, iter_rows
+
+DEFAULT_API_JOBS_DIR = Path(
+    os.environ.get('ASUS_CN_API_JOBS_DIR', Path.home() / '.asus_cn' / 'api_jobs')
+)
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+# Đóng kết nối keep-alive không có request mới sau bấy nhiêu giây
+IDLE_TIMEOUT = 60
+READ_CHUNK = 1024 * 1024
+MAX_PART_HEADER = 16 * 1024
+
+_JOB_PATH = re.compile(r'^/jobs/([\w-]+)(/records)?$')
+
+
+class RequestError(ValueError):
+    """Request không hợp lệ; trả về cho client với mã status tương ứng."""
+
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _header_params(name: str, value: str) -> Message:
+    message = Message()
+    message[name] = value
+    return message
+
+
+def read_multipart(rfile, length: int, boundary: bytes, directory) -> Tuple[dict, List[tuple]]:
+    """
+    Đọc body multipart/form-data dài length byte theo khối.
+    Trả về (field text -> giá trị, [(tên field, tên file, file tạm)]); file tạm nằm
+    trong directory, con trỏ ở đầu file.
+    """
+    delimiter = b'\r\n--' + boundary
+    buffer = bytearray(b'\r\n')  # để boundary đầu tiên khớp delimiter
+    remaining = length
+    fields, files = {}, []
+
+    def fill() -> bool:
+        nonlocal remaining
+        if not remaining:
+            return False
+        chunk = rfile.read(min(READ_CHUNK, remaining))
+        if not chunk:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "body ngắn hơn Content-Length")
+        remaining -= len(chunk)
+        buffer.extend(chunk)
+        return True
+
+    def find(token: bytes, limit: Optional[int] = None) -> int:
+        while True:
+            index = buffer.find(token)
+            if index >= 0:
+                return index
+            if limit is not None and len(buffer) > limit:
+                raise RequestError(HTTPStatus.BAD_REQUEST, "header của một phần multipart quá dài")
+            if not fill():
+                raise RequestError(HTTPStatus.BAD_REQUEST, "multipart thiếu boundary kết thúc")
+
+    del buffer[:find(delimiter) + len(delimiter)]
+    while True:
+        while len(buffer) < 2:
+            if not fill():
+                raise RequestError(HTTPStatus.BAD_REQUEST, "multipart thiếu boundary kết thúc")
+        if buffer[:2] == b'--':
+            break
+        end = find(b'\r\n\r\n', MAX_PART_HEADER)
+        headers = {}
+        for line in bytes(buffer[:end]).decode('utf-8', 'replace').split('\r\n'):
+            if ':' in line:
+                key, value = line.split(':', 1)
+                headers[key.strip().lower()] = value.strip()
+        del buffer[:end + 4]
+
+        disposition = _header_params('content-disposition', headers.get('content-disposition', ''))
+        name = disposition.get_param('name', header='content-disposition') or ''
+        filename = disposition.get_filename()
+        out = tempfile.TemporaryFile(dir=directory) if filename is not None else io.BytesIO()
+        # Ghi phần đã chắc chắn thuộc body, giữ lại đuôi có thể là đầu của delimiter
+        while True:
+            index = buffer.find(delimiter)
+            if index >= 0:
+                out.write(buffer[:index])
+                del buffer[:index + len(delimiter)]
+                break
+            keep = len(delimiter) - 1
+            if len(buffer) > keep:
+                out.write(buffer[:len(buffer) - keep])
+                del buffer[:len(buffer) - keep]
+            if not fill():
+                raise RequestError(HTTPStatus.BAD_REQUEST, "multipart thiếu boundary kết thúc")
+        out.seek(0)
+        if filename is None:
+            fields[name] = out.getvalue().decode('utf-8', 'replace')
+        else:
+            files.append((name, os.path.basename(filename.replace('\\', '/')), out))
+    return fields, files
+
+
+def _json_value(value):
+    return None if isinstance(value, float) and math.isnan(value) else value
+
+
+class ApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], runner: JobRunner, ledger=None):
+        super().__init__(address, ApiHandler)
+        self.runner = runner
+        self.ledger = ledger
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'asus-cn'
+    timeout = IDLE_TIMEOUT
+    server: ApiServer
+
+    def log_message(self, format, *args):
+        logging.info(f"API {self.address_string()} - {format % args}")
+
+    def _send(self, status: HTTPStatus, body: bytes, content_type: str, headers: Optional[dict] = None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: HTTPStatus, data, headers: Optional[dict] = None):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self._send(status, body, 'application/json; charset=utf-8', headers)
+
+    def _send_error(self, status: HTTPStatus, message: str):
+        self._send_json(status, {'error': message})
+
+    def _job_json(self, job_id: str) -> Optional[dict]:
+        job = self.server.runner.status(job_id)
+        return job._asdict() if job is not None else None
+
+    def _dispatch(self, method: str):
+        url = urlsplit(self.path)
+        self._body_read = False
+        try:
+            if url.path == '/health' and method == 'GET':
+                runner = self.server.runner
+                self._send_json(HTTPStatus.OK, {'status': 'ok', 'workers': runner.scheduler.workers,
+                                                'running_users': runner.running_users})
+                return
+            if url.path == '/jobs' and method == 'POST':
+                self._submit()
+                return
+            match = _JOB_PATH.match(url.path)
+            if match is None:
+                raise RequestError(HTTPStatus.NOT_FOUND, f"không có endpoint {method} {url.path}")
+            job_id, records = match.groups()
+            if records and method == 'GET':
+                self._records(job_id, parse_qs(url.query))
+            elif not records and method == 'GET':
+                job = self._job_json(job_id)
+                if job is None:
+                    raise RequestError(HTTPStatus.NOT_FOUND, f"không có job {job_id}")
+                self._send_json(HTTPStatus.OK, job)
+            elif not records and method == 'DELETE':
+                if self._job_json(job_id) is None:
+                    raise RequestError(HTTPStatus.NOT_FOUND, f"không có job {job_id}")
+                if not self.server.runner.delete(job_id):
+                    raise RequestError(HTTPStatus.CONFLICT, "job đang chạy, chưa xoá được")
+                self._send(HTTPStatus.NO_CONTENT, b'', 'application/json')
+            else:
+                raise RequestError(HTTPStatus.METHOD_NOT_ALLOWED, f"{method} không dùng được với {url.path}")
+        except RequestError as e:
+            self._close_if_unread()
+            self._send_error(e.status, str(e))
+        except Exception as e:
+            logging.exception(f"API request failed: {method} {self.path}")
+            self.close_connection = True
+            self._send_error(HTTPStatus.INTERNAL_SERVER_ERROR, f"{type(e).__name__}: {e}")
+
+    def _close_if_unread(self):
+        """Body chưa đọc hết thì phần còn lại sẽ lẫn vào request sau: không dùng lại kết nối."""
+        if not self._body_read and self.headers.get('Content-Length', '0') != '0':
+            self.close_connection = True
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    def _submit(self):
+        content_type = _header_params('content-type', self.headers.get('Content-Type', ''))
+        boundary = content_type.get_param('boundary', header='content-type')
+        if content_type.get_content_type() != 'multipart/form-data' or not boundary:
+            raise RequestError(HTTPStatus.UNSUPPORTED_MEDIA_TYPE, "cần multipart/form-data")
+        length = self.headers.get('Content-Length')
+        if length is None or not length.isdigit():
+            self.close_connection = True
+            raise RequestError(HTTPStatus.LENGTH_REQUIRED, "cần Content-Length")
+        length = int(length)
+        runner = self.server.runner
+        if length > runner.quota:
+            raise RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                               f"vượt dung lượng upload cho phép ({runner.quota / 1e6:.0f} MB)")
+
+        with tempfile.TemporaryDirectory(dir=runner.root) as tmp:
+            fields, files = read_multipart(self.rfile, length, boundary.encode('latin-1'), tmp)
+            self._body_read = True
+            try:
+                uploads = [(filename, f) for name, filename, f in files if name == 'files' and filename]
+                if not uploads:
+                    raise RequestError(HTTPStatus.BAD_REQUEST, "không có file nào trong field 'files'")
+                user = fields.get('user') or self.headers.get('X-User') or 'api'
+                try:
+                    job_id = runner.submit(user, uploads)
+                except JobRejected as e:
+                    raise RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, str(e)) from e
+            finally:
+                for _, _, f in files:
+                    f.close()
+        logging.info(f"API job {job_id}: {len(uploads)} uploads from {user}")
+        self._send_json(HTTPStatus.ACCEPTED, self._job_json(job_id), {'Location': f'/jobs/{job_id}'})
+
+    def _records(self, job_id: str, query: dict):
+        fmt = query.get('format', ['json'])[0]
+        if fmt != 'json' and fmt not in EXPORT_FORMATS:
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"format phải là json, {', '.join(EXPORT_FORMATS)}")
+        drop_totals = query.get('drop_totals', ['0'])[0].lower() in ('1', 'true', 'yes')
+        runner = self.server.runner
+        job = runner.status(job_id)
+        if job is None:
+            raise RequestError(HTTPStatus.NOT_FOUND, f"không có job {job_id}")
+        if job.status in ACTIVE_STATUSES:
+            self._send_json(HTTPStatus.CONFLICT, {'error': "job chưa xong", **job._asdict()})
+            return
+
+        # Như bước 3 của app: kết quả theo thứ tự upload, liên kết REBATE với cả sổ cái
+        # (chỉ đọc: GET không được ghi vào sổ cái dùng chung)
+        batch = Batch()
+        batch.add(runner.results(job_id), self.server.ledger, record=False)
+        records = batch.records()
+        if fmt == 'json':
+            rows = _without_totals(iter_rows(records)) if drop_totals else iter_rows(records)
+            self._send_json(HTTPStatus.OK, {
+                'id': job_id, 'status': job.status, 'error': job.error,
+                'columns': COLUMNS_ORDER,
+                'records': [dict(zip(COLUMNS_ORDER, map(_json_value, row))) for row in rows],
+                'failed': batch.failed, 'unknown': batch.unknown,
+            })
+            return
+        output = io.BytesIO()
+        write_rows(iter_rows(records), output, fmt, drop_totals)
+        self._send(HTTPStatus.OK, output.getvalue(), EXPORT_FORMATS[fmt][1], {
+            'Content-Disposition': f'attachment; filename="{job_id}.{fmt}"',
+        })
+
+
+def make_server(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, runner: Optional[JobRunner] = None,
+                ledger=None) -> ApiServer:
+    """Server chưa chạy (gọi serve_forever); port=0 để hệ điều hành chọn cổng trống."""
+    return ApiServer((host, port), runner or JobRunner(DEFAULT_API_JOBS_DIR), ledger)
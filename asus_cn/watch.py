@@ -0,0 +1,306 @@
+"""
+Theo dõi một thư mục và xử lý dần các PDF mới được thả vào (chạy như daemon).
+
+Thư mục được quét lại mỗi `interval` giây (polling bằng os.walk, không cần
+thư viện ngoài, chạy được cả trên ổ mạng). Một file chỉ được đọc khi kích thước
+và thời điểm sửa không đổi giữa hai lần quét liên tiếp, để không đọc file đang
+chép dở. Mỗi lượt quét, các file mới được trích xuất một lần (qua cache như
+extract), liên kết với REBATE trong sổ cái (kể cả REBATE của các lượt trước)
+rồi ghi nối các dòng vào đầu ra:
+
+- .csv      ghi nối vào cuối file, dòng tiêu đề chỉ ghi lần đầu
+- .parquet  một thư mục, mỗi lượt thêm một file part-NNNNN.parquet (đọc cả thư
+            mục bằng pandas / pyarrow như một bảng)
+
+Các file đã xử lý được ghi vào <output>.watch.jsonl (một dòng mỗi lượt, kèm vị
+trí cuối CSV hoặc tên file part) sau khi dữ liệu đã xuống đĩa. Khi khởi động
+lại, file đã có trong đó (cùng kích thước, thời điểm sửa) được bỏ qua và phần
+đầu ra ghi dở của lượt chưa hoàn tất bị cắt bỏ, nên không có dòng trùng. File
+bị sửa nội dung được xử lý lại và ghi thêm dòng mới.
+
+Dòng đã ghi giữ Landing cost theo REBATE đã biết lúc đó. Nếu có --excel, file
+Excel được dựng lại theo yêu cầu (SIGUSR1, hoặc cuối lần chạy --once) từ mọi
+file đã xử lý còn trong thư mục (lấy từ cache) và liên kết lại với toàn bộ
+REBATE, kể cả REBATE đến sau Credit Note.
+"""
+
+import json
+import logging
+import os
+import signal
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from asus_cn.batch import Batch
+from asus_cn.cache import ExtractionCache
+from asus_cn.classify import DOC_UNKNOWN
+from asus_cn.export import write_rows
+from asus_cn.extract import DEFAULT_EXTRACT_MODE
+from asus_cn.metrics import METRICS
+from asus_cn.parallel import DEFAULT_WORKERS
+from asus_cn.pipeline import iter_extracted, iter_pdf_paths
+from asus_cn.records import iter_rows
+
+# Số giây giữa hai lần quét thư mục
+DEFAULT_INTERVAL = 10.0
+WATCH_FORMATS = ('csv', 'parquet')
+
+
+class FolderWatcher:
+    """Xử lý dần các PDF mới trong folder, ghi nối kết quả vào output (CSV / thư mục Parquet)."""
+
+    def __init__(self, folder, output, fmt: str = 'csv', excel=None,
+                 cache: Optional[ExtractionCache] = None, ledger=None,
+                 workers: int = DEFAULT_WORKERS, mode: str = DEFAULT_EXTRACT_MODE,
+                 interval: float = DEFAULT_INTERVAL, drop_totals: bool = False):
+        if fmt not in WATCH_FORMATS:
+            raise ValueError(f"Watch output must be CSV or Parquet, got: {fmt}")
+        self.folder = Path(folder)
+        self.output = Path(output)
+        self.fmt = fmt
+        self.excel = Path(excel) if excel else None
+        self.cache = cache
+        self.ledger = ledger
+        self.workers = workers
+        self.mode = mode
+        self.interval = interval
+        self.drop_totals = drop_totals
+        self.state_path = Path(f"{self.output}.watch.jsonl")
+        self.processed = {}  # tên file -> (digest, size, mtime_ns) lần xử lý gần nhất
+        self._offset = 0  # CSV: vị trí cuối lượt ghi hoàn tất gần nhất
+        self._parts = 0  # Parquet: số file part đã ghi xong
+        self._seen = {}  # tên file -> (size, mtime_ns) ở lần quét trước, chưa xử lý
+        self._wake = threading.Event()
+        self._stop = False
+        self._excel_requested = False
+        self._load_state()
+
+    # --- Trạng thái ---
+
+    def _load_state(self):
+        """Đọc các file đã xử lý; cắt dòng trạng thái và phần đầu ra ghi dở."""
+        parts = set()
+        if self.state_path.exists():
+            complete = 0
+            with open(self.state_path, 'rb+') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break
+                    state = json.loads(line)
+                    for name, digest, size, mtime_ns in state['files']:
+                        self.processed[name] = (digest, size, mtime_ns)
+                    if 'offset' in state:
+                        self._offset = state['offset']
+                    if state.get('part'):
+                        parts.add(state['part'])
+                    complete += len(line)
+                f.truncate(complete)
+        elif self._has_output():
+            raise ValueError(f"{self.output} already exists and was not written by watch")
+        self._parts = len(parts)
+
+        if self.fmt == 'csv':
+            size = self.output.stat().st_size if self.output.exists() else 0
+            if size > self._offset:
+                logging.warning(f"Dropping {size - self._offset} bytes of an unfinished write to {self.output}")
+                with open(self.output, 'rb+') as f:
+                    f.truncate(self._offset)
+            elif size < self._offset:
+                logging.warning(f"{self.output} is shorter than recorded, new rows are appended after it")
+                self._offset = size
+        elif self.output.is_dir():
+            for path in self.output.iterdir():
+                if path.suffix == '.parquet' and path.name not in parts:
+                    logging.warning(f"Removing unfinished part {path}")
+                    path.unlink()
+
+    def _rollback(self):
+        """Bỏ phần CSV ghi dở của lượt lỗi để lượt sau ghi nối đúng chỗ."""
+        if self.fmt == 'csv' and self.output.exists() and self.output.stat().st_size > self._offset:
+            with open(self.output, 'rb+') as f:
+                f.truncate(self._offset)
+
+    def _has_output(self) -> bool:
+        if self.fmt == 'csv':
+            return self.output.exists() and self.output.stat().st_size > 0
+        return self.output.is_dir() and any(self.output.glob('*.parquet'))
+
+    def _save_state(self, files: List[tuple], rows: int, part: Optional[str] = None):
+        state = {'time': time.time(), 'files': files, 'rows': rows}
+        if self.fmt == 'csv':
+            state['offset'] = self._offset
+        elif part:
+            state['part'] = part
+        with open(self.state_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(state, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    # --- Quét, xử lý ---
+
+    def scan(self, wait_stable: bool = True) -> List[Tuple[str, str]]:
+        """
+        Các file (tên tương đối, đường dẫn) cần xử lý: chưa xử lý hoặc đã đổi từ
+        lần xử lý trước, và (nếu wait_stable) không đổi so với lần quét trước.
+        """
+        ready = []
+        seen = {}
+        for name, path in iter_pdf_paths([self.folder]):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            key = (stat.st_size, stat.st_mtime_ns)
+            known = self.processed.get(name)
+            if known and known[1:] == key:
+                continue
+            if not wait_stable or self._seen.get(name) == key:
+                ready.append((name, path))
+            else:
+                seen[name] = key
+        self._seen = seen
+        return ready
+
+    def process(self, sources: List[Tuple[str, str]]) -> int:
+        """Trích xuất, liên kết và ghi nối các file; trả về số dòng đã ghi."""
+        started = time.perf_counter()
+        stats = {}
+        for name, path in sources:
+            stat = os.stat(path)
+            stats[name] = (stat.st_size, stat.st_mtime_ns)
+
+        extracted_files = []
+        for extracted in iter_extracted(sources, cache=self.cache, workers=self.workers, mode=self.mode):
+            entry = extracted.entry
+            if extracted.digest == self.processed.get(extracted.name, ('',))[0]:
+                # Chỉ đổi thời điểm sửa, nội dung như cũ
+                continue
+            if entry is None:
+                logging.warning(f"Cannot read {extracted.name}: {extracted.error}")
+            elif entry['doc_type'] == DOC_UNKNOWN:
+                logging.warning(f"Unknown document type: {extracted.name}")
+            extracted_files.append(extracted)
+        extracted_files.sort(key=lambda e: e.name)
+        digests = {extracted.name: extracted.digest for extracted in extracted_files}
+
+        batch = Batch()
+        batch.add(extracted_files, self.ledger)
+        records = batch.records()
+        row_count = sum(map(len, records))
+
+        part = None
+        if records:
+            with METRICS.stage(self.fmt, files=len(records), rows=row_count):
+                part = self._append(records)
+        METRICS.write()
+
+        files = []
+        for name, (size, mtime_ns) in stats.items():
+            digest = digests.get(name, self.processed.get(name, ('',))[0])
+            self.processed[name] = (digest, size, mtime_ns)
+            files.append([name, digest, size, mtime_ns])
+        self._save_state(files, row_count, part)
+
+        logging.info(
+            f"Processed {len(extracted_files)} new files ({batch.rebate_count} REBATE, "
+            f"{len(batch.unknown)} unknown, {len(batch.failed)} failed), appended {row_count} records "
+            f"-> {self.output} ({time.perf_counter() - started:.1f}s)"
+        )
+        return row_count
+
+    def _append(self, records: list) -> Optional[str]:
+        """Ghi nối các dòng và đưa xuống đĩa; trả về tên file part (Parquet)."""
+        if self.fmt == 'csv':
+            self.output.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.output, 'ab') as f:
+                write_rows(iter_rows(records), f, 'csv', self.drop_totals, header=f.tell() == 0)
+                f.flush()
+                os.fsync(f.fileno())
+                self._offset = f.tell()
+            return None
+
+        self.output.mkdir(parents=True, exist_ok=True)
+        part = f"part-{self._parts + 1:05d}.parquet"
+        tmp = self.output / f".{part}"
+        write_rows(iter_rows(records), tmp, 'parquet', self.drop_totals)
+        with open(tmp, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp, self.output / part)
+        self._parts += 1
+        return part
+
+    def write_excel(self) -> int:
+        """Dựng lại file Excel từ mọi file đã xử lý còn trong thư mục; trả về số dòng."""
+        started = time.perf_counter()
+        sources = [(name, path) for name, path in iter_pdf_paths([self.folder]) if name in self.processed]
+        missing = len(self.processed) - len(sources)
+        if missing:
+            logging.warning(f"{missing} processed files are no longer in {self.folder}, left out of {self.excel}")
+        extracted_files = sorted(
+            iter_extracted(sources, cache=self.cache, workers=self.workers, mode=self.mode),
+            key=lambda e: e.name
+        )
+        batch = Batch()
+        batch.add(extracted_files, self.ledger)
+        records = batch.records()
+        row_count = sum(map(len, records))
+        if not records:
+            logging.warning(f"No records yet, {self.excel} not written")
+            return 0
+
+        self.excel.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.excel.with_name(f".{self.excel.name}")
+        with METRICS.stage('excel', files=len(records), rows=row_count):
+            write_rows(iter_rows(records), tmp, 'xlsx')
+        os.replace(tmp, self.excel)
+        METRICS.write()
+        logging.info(f"Wrote {row_count} records -> {self.excel} ({time.perf_counter() - started:.1f}s)")
+        return row_count
+
+    # --- Vòng lặp ---
+
+    def request_excel(self):
+        """Yêu cầu dựng lại Excel ở lượt tiếp theo (an toàn khi gọi từ signal handler)."""
+        self._excel_requested = True
+        self._wake.set()
+
+    def stop(self):
+        self._stop = True
+        self._wake.set()
+
+    def _install_signals(self):
+        if threading.current_thread() is not threading.main_thread():
+            return
+        signal.signal(signal.SIGTERM, lambda signum, frame: self.stop())
+        if hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, lambda signum, frame: self.request_excel())
+
+    def run(self, once: bool = False):
+        """
+        Quét và xử lý tới khi stop() (SIGTERM / Ctrl+C). once=True xử lý mọi
+        file hiện có (không chờ ổn định), dựng Excel nếu có rồi dừng.
+        """
+        self._install_signals()
+        logging.info(f"Watching {self.folder} every {self.interval:g}s -> {self.output}")
+        while not self._stop:
+            try:
+                sources = self.scan(wait_stable=not once)
+                if sources:
+                    self.process(sources)
+            except OSError as e:
+                # File bị xoá / đổi tên giữa lúc quét và lúc đọc, hoặc ghi đầu ra lỗi: thử lại lượt sau
+                logging.warning(f"Processing {self.folder} failed, retrying: {e}")
+                self._seen = {}
+                self._rollback()
+            if self._excel_requested or once and self.excel:
+                self._excel_requested = False
+                if self.excel:
+                    self.write_excel()
+                else:
+                    logging.warning("Excel requested but no --excel path given")
+            if once:
+                break
+            self._wake.wait(self.interval)
+            self._wake.clear()
@@ -0,0 +1,185 @@
+"""
+Micro-benchmark extract_items: so sánh bản duyệt một lượt với bản cũ.
+
+    python -m benchmarks.bench_extract_items [--docs 2000] [--seed 1] [file.txt ...]
+
+Corpus gồm các Credit Note sinh ngẫu nhiên (có cả các trường hợp biên: item liền
+nhau, thiếu Product, MEMO thay cho SN, dòng boilerplate chen giữa, item vắt qua
+trang) cùng các file text truyền vào (ví dụ text đã trích từ PDF thật). Kết quả
+của hai bản phải giống hệt nhau trên toàn bộ corpus.
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+
+from asus_cn.parsing import extract_items
+
+
+def legacy_extract_items(text: str) -> list:
+    """Bản extract_items trước khi chuyển sang duyệt một lượt (dùng làm mốc so sánh)."""
+    items = []
+    lines = text.split('\n')
+    
+    i = 0
+    while i < len(lines):
+        line = lines[i].strip()
+        
+        item_match = re.match(
+            r'^(\d+\.\d+)\s+([A-Z0-9\-]+)\s+(\d+)\s+(.+)$',
+            line
+        )
+        
+        if item_match:
+            no = item_match.group(1)
+            part_no = item_match.group(2)
+            rest = item_match.group(4).strip()
+            
+            numbers = re.findall(r'[\d,]+\.?\d*', rest)
+            fob = numbers[-1] if numbers else ""
+            
+            product = ""
+            for j in range(i + 1, min(i + 3, len(lines))):
+                next_line = lines[j].strip()
+                if next_line.startswith(('Model:', '===', 'No ', 'Page', 'SO:', 'Note:')):
+                    continue
+                if next_line.startswith('AS '):
+                    product = next_line
+                    break
+                elif '/' in next_line and not next_line.startswith(('EAN', 'MODEL')):
+                    product = next_line
+                    break
+            
+            serial = ""
+            for j in range(i + 1, min(i + 15, len(lines))):
+                note_line = lines[j].strip()
+                if note_line.startswith(('===', 'Page:', 'CN#', 'No Description', 
+                                         'ASUS GLOBAL', '10 Changi', 'Reg. No',
+                                         'Credit Note', 'To :', 'Address', 'Attn',
+                                         'Fax', 'Date', 'CN Reason', 'Credit Note Remark')):
+                    continue
+                if re.match(r'^\d+\.\d+\s+[A-Z0-9\-]+\s+\d+\s+', note_line):
+                    break
+                if 'SN:' in note_line:
+                    sn_match = re.search(r'SN:([A-Z0-9]+)', note_line)
+                    if sn_match:
+                        serial = sn_match.group(1)
+                    else:
+                        memo_match = re.search(r'MEMO:([A-Z0-9]+)', note_line)
+                        if memo_match:
+                            serial = memo_match.group(1)
+                    break
+            
+            invoice = ""
+            for j in range(i + 1, min(i + 10, len(lines))):
+                inv_line = lines[j].strip()
+                if re.match(r'^\d+\.\d+\s+[A-Z0-9\-]+\s+\d+\s+', inv_line):
+                    break
+                inv_match = re.search(r'INVOICE[:\s]+([\d]+)', inv_line)
+                if inv_match:
+                    invoice = inv_match.group(1)
+                    break
+            
+            items.append({
+                'No': no,
+                'Part No': part_no,
+                'Product': product,
+                'Serial': serial,
+                'FOB': fob,
+                'Invoice': invoice
+            })
+        
+        i += 1
+    
+    return items
+
+
+FILLER_LINES = [
+    "Model: UX3402ZA", "SO: 1234567", "No Description Qty Unit Price Amount",
+    "=== PAGE 2 ===", "Page: 2/3", "ASUS GLOBAL PTE. LTD.", "10 Changi Business Park Central 1",
+    "Reg. No 200301234K", "Credit Note", "CN#8100012345", "Date : 2024/01/15",
+    "Credit Note Remark: NB Consumer SN:SHOULDSKIP", "EAN 4711081234567", "MODEL/UX3402",
+    "Note: price protection", "", "   ", "Total: 1,234.50", "To : ACME", "Fax: 123",
+]
+
+
+def _random_item_block(rng: random.Random, no: str) -> list:
+    part_no = rng.choice(["90NB0XX1-M00120", "90MP00T1-BMUA00", "XG27AQ", "90-LU0020"])
+    price = f"{rng.randint(1, 99999) / 100:,.2f}"
+    description = rng.choice(["USD", "USD", "NB/ROG USD"])
+    lines = [f"{no} {part_no} {rng.randint(1, 9)} {description} {price} {price}"]
+    extra_lines = rng.randint(0, 6) if rng.random() < 0.8 else rng.randint(7, 18)
+    for _ in range(extra_lines):
+        roll = rng.random()
+        if roll < 0.2:
+            lines.append(rng.choice(["AS ZenBook 14 UX3402", "ROG Strix G15/R7-6800H", "TUF/FX506"]))
+        elif roll < 0.4:
+            serial = ''.join(rng.choice("ABCDEFGHJKLMNPQRSTUVWXYZ0123456789") for _ in range(15))
+            lines.append(rng.choice([
+                f"Note: SN:{serial} INVOICE:{rng.randint(10**9, 10**10)}",
+                f"SN:{serial}", f"SN: {serial} MEMO:{serial}", f"MEMO:{serial}",
+            ]))
+        elif roll < 0.55:
+            lines.append(f"INVOICE {rng.randint(10**9, 10**10)}")
+        else:
+            lines.append(rng.choice(FILLER_LINES))
+    return lines
+
+
+def generate_corpus(docs: int, seed: int) -> list:
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(docs):
+        lines = ["=== PAGE 1 ===", "CN NO : 8100012345", "Credit Note Remark: NB Consumer"]
+        for n in range(rng.randint(1, 40)):
+            lines.extend(_random_item_block(rng, f"{rng.randint(1, 9)}.{n + 1}"))
+        lines.append("Total: 1,234.50")
+        corpus.append("\n".join(lines))
+    return corpus
+
+
+def _lines_per_sec(func, corpus: list, total_lines: int, repeat: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for text in corpus:
+            func(text)
+        best = min(best, time.perf_counter() - started)
+    return total_lines / best
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('files', nargs='*', help='File text bổ sung vào corpus')
+    parser.add_argument('--docs', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    corpus = generate_corpus(args.docs, args.seed)
+    for path in args.files:
+        with open(path, encoding='utf-8') as f:
+            corpus.append(f.read())
+
+    mismatches = 0
+    for idx, text in enumerate(corpus):
+        if extract_items(text) != legacy_extract_items(text):
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"MISMATCH in document {idx}", file=sys.stderr)
+    if mismatches:
+        print(f"{mismatches}/{len(corpus)} documents differ", file=sys.stderr)
+        return 1
+
+    total_lines = sum(text.count('\n') + 1 for text in corpus)
+    before = _lines_per_sec(legacy_extract_items, corpus, total_lines)
+    after = _lines_per_sec(extract_items, corpus, total_lines)
+    print(f"corpus: {len(corpus)} documents, {total_lines} lines, identical output")
+    print(f"before: {before:,.0f} lines/sec")
+    print(f"after:  {after:,.0f} lines/sec ({after / before:.1f}x)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""
+Benchmark end-to-end trên Credit Note / REBATE giả lập, đo riêng từng bước.
+
+    python -m benchmarks.bench_pipeline [--sizes 10 100 1000] [--items 5] [--mode full]
+                                        [-o kết_quả.json] [--compare lần_trước.json]
+
+Các bước: pdf_to_text, extract_items, parse_rebate_files, process_pdf_text,
+create_excel_with_formatting, write_csv, write_parquet (hai bước cuối ghi thẳng
+từ record, không qua DataFrame). Mỗi bước báo files/sec, rows/sec (rows: số dòng
+text / item / invoice REBATE / record / dòng Excel tương ứng) và bộ nhớ đỉnh
+(tracemalloc, đo ở một lượt chạy riêng để không làm sai thời gian).
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+from asus_cn.excel import create_excel_with_formatting
+from asus_cn.export import write_rows
+from asus_cn.extract import DEFAULT_EXTRACT_MODE, EXTRACT_MODES, pdf_to_text
+from asus_cn.parsing import extract_items, parse_rebate_files, process_pdf_text
+from asus_cn.records import iter_rows, records_to_dataframe
+from benchmarks.synthetic import INVOICE_PATTERNS, SERIAL_PATTERNS, iter_documents, parse_items
+
+DEFAULT_SIZES = (10, 100, 1000)
+RESULTS_DIR = Path(__file__).parent / 'results'
+
+
+def _measure(func, memory: bool) -> tuple:
+    """(kết quả, giây, byte bộ nhớ đỉnh hoặc None)."""
+    started = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - started
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            func()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result, seconds, peak
+
+
+def run_size(files: int, args) -> dict:
+    documents = list(iter_documents(files, args.items, args.pages, args.serial,
+                                    args.invoice, args.rebate_every, args.seed))
+    stages = {}
+
+    def add_stage(stage, file_count, rows, seconds, peak):
+        stages[stage] = {
+            'files': file_count,
+            'rows': rows,
+            'seconds': round(seconds, 6),
+            'files_per_sec': round(file_count / seconds, 2) if seconds else None,
+            'rows_per_sec': round(rows / seconds, 2) if seconds else None,
+            'peak_memory_bytes': peak,
+        }
+
+    texts, seconds, peak = _measure(
+        lambda: {name: pdf_to_text(io.BytesIO(data), args.mode) for name, data in documents}, args.memory
+    )
+    add_stage('pdf_to_text', len(documents), sum(text.count('\n') + 1 for text in texts.values()), seconds, peak)
+
+    rebate_texts = {name: text for name, text in texts.items() if 'REBATE FOR INVOICE:' in text}
+    cn_texts = {name: text for name, text in texts.items() if name not in rebate_texts}
+
+    items, seconds, peak = _measure(
+        lambda: {name: extract_items(text) for name, text in cn_texts.items()}, args.memory
+    )
+    add_stage('extract_items', len(cn_texts), sum(map(len, items.values())), seconds, peak)
+
+    mapping, seconds, peak = _measure(lambda: parse_rebate_files(rebate_texts), args.memory)
+    add_stage('parse_rebate_files', len(rebate_texts), len(mapping), seconds, peak)
+
+    records, seconds, peak = _measure(
+        lambda: [process_pdf_text(name, text, mapping, items[name]) for name, text in cn_texts.items()],
+        args.memory
+    )
+    add_stage('process_pdf_text', len(cn_texts), sum(map(len, records)), seconds, peak)
+
+    df = records_to_dataframe(records)
+    excel, seconds, peak = _measure(lambda: create_excel_with_formatting(df), args.memory)
+    add_stage('create_excel_with_formatting', len(cn_texts), len(df), seconds, peak)
+
+    for fmt in ('csv', 'parquet'):
+        def export(fmt=fmt):
+            output = io.BytesIO()
+            write_rows(iter_rows(records), output, fmt)
+            return output
+        _, seconds, peak = _measure(export, args.memory)
+        add_stage(f'write_{fmt}', len(cn_texts), len(df), seconds, peak)
+
+    return {
+        'files': files,
+        'documents': len(documents),
+        'pdf_bytes': sum(len(data) for _, data in documents),
+        'excel_bytes': excel.getbuffer().nbytes,
+        'stages': stages,
+    }
+
+
+def _print_size(result: dict, previous: dict = None):
+    print(f"\n{result['files']} Credit Note ({result['documents']} PDF, {result['pdf_bytes'] / 1e6:.1f} MB)")
+    print(f"  {'stage':<30}{'seconds':>10}{'files/s':>12}{'rows/s':>14}{'peak MB':>10}")
+    for stage, values in result['stages'].items():
+        peak = values['peak_memory_bytes']
+        line = (f"  {stage:<30}{values['seconds']:>10.3f}{values['files_per_sec'] or 0:>12,.1f}"
+                f"{values['rows_per_sec'] or 0:>14,.0f}{'' if peak is None else f'{peak / 1e6:.1f}':>10}")
+        old = (previous or {}).get('stages', {}).get(stage)
+        if old and values['seconds'] and old['seconds']:
+            line += f"  {old['seconds'] / values['seconds']:.2f}x"
+        print(line)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Số Credit Note mỗi lượt')
+    parser.add_argument('--items', type=parse_items, default=5, help="Số item mỗi file, ví dụ 5 hoặc 1-40")
+    parser.add_argument('--pages', type=int, default=1)
+    parser.add_argument('--serial', choices=SERIAL_PATTERNS, default='sn')
+    parser.add_argument('--invoice', choices=INVOICE_PATTERNS, default='inline')
+    parser.add_argument('--rebate-every', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--mode', choices=EXTRACT_MODES, default=DEFAULT_EXTRACT_MODE)
+    parser.add_argument('--no-memory', dest='memory', action='store_false', help='Bỏ lượt đo bộ nhớ')
+    parser.add_argument('-o', '--output', help='File JSON kết quả (mặc định benchmarks/results/)')
+    parser.add_argument('--compare', help='File JSON của lần chạy trước để so sánh tốc độ')
+    args = parser.parse_args(argv)
+
+    previous = {}
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            previous = {run['files']: run for run in json.load(f)['runs']}
+
+    runs = []
+    for files in args.sizes:
+        result = run_size(files, args)
+        _print_size(result, previous.get(files))
+        runs.append(result)
+
+    output = Path(args.output) if args.output else (
+        RESULTS_DIR / f"pipeline_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'config': {
+            'items': args.items, 'pages': args.pages, 'serial': args.serial, 'invoice': args.invoice,
+            'rebate_every': args.rebate_every, 'seed': args.seed, 'mode': args.mode,
+        },
+        'runs': runs,
+    }
+    output.write_text(json.dumps(report, indent=2), encoding='utf-8')
+    print(f"\n-> {output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
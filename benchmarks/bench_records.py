@@ -0,0 +1,210 @@
+"""
+Micro-benchmark liên kết REBATE + tạo records: so sánh link_records (cả batch một
+lượt) với bản cũ dựng mapping và build_records cho từng file.
+
+    python -m benchmarks.bench_records [--files 2000] [--items 1-10] [--seed 1]
+
+Batch gồm các Credit Note với items sinh ngẫu nhiên (invoice trùng giữa các file,
+item không có invoice, REBATE thiếu CN Landing, landing cost không đọc được) và
+bảng REBATE phủ một phần invoice, một phần khác chỉ có trong "sổ cái" (có cả
+invoice tra sổ cái không thấy). Kết quả của hai bản phải giống hệt nhau.
+
+Cũng kiểm tra Batch: thêm Credit Note + REBATE rồi bỏ REBATE (có và không có sổ
+cái) thì landing cost phải mất hết và REBATE không còn trong sổ cái.
+"""
+
+import argparse
+import hashlib
+import logging
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+
+from asus_cn.batch import Batch
+from asus_cn.classify import DOC_CREDIT_NOTE, DOC_REBATE
+from asus_cn.ledger import Ledger
+from asus_cn.parsing import extract_items
+from asus_cn.pipeline import ExtractedFile
+from asus_cn.records import FileRecords, link_records, parse_amount, _amounts
+from benchmarks.synthetic import credit_note_pages, parse_items, rebate_pages
+
+
+def legacy_build_records(filename: str, header: dict, items: list, rebate_mapping: dict) -> FileRecords:
+    """Bản build_records trước khi chuyển sang link_records (dùng làm mốc so sánh)."""
+    file_landing_costs = []
+    file_cn_landing = ''
+    for item in items:
+        invoice = item.get('Invoice', '')
+        if invoice and invoice in rebate_mapping:
+            cn_landing = rebate_mapping[invoice]['CN_Landing']
+            file_landing_costs.append(rebate_mapping[invoice]['Landing_cost'])
+            if cn_landing:
+                file_cn_landing = cn_landing
+
+    landing_cost = float('nan')
+    if file_landing_costs:
+        amounts = [parse_amount(amount) for amount in file_landing_costs]
+        if any(amount != amount for amount in amounts):
+            logging.warning(f"{filename}: cannot parse landing cost {', '.join(file_landing_costs)}")
+        else:
+            landing_cost = round(sum(amounts), 2)
+
+    records = FileRecords(filename, header['product_line'], header['cn_no'], file_cn_landing,
+                          parse_amount(header['total']), landing_cost)
+    records.products = [item['Product'] for item in items]
+    records.serials = [item['Serial'] for item in items]
+    records.part_nos = [item['Part No'] for item in items]
+    records.fobs = _amounts([item['FOB'] for item in items])
+    return records
+
+
+def legacy_link(files: list, rebate_mapping: dict, ledger_mapping: dict) -> list:
+    """Vòng lặp từng file của Batch._relink trước đây."""
+    file_records = []
+    for name, header, items in files:
+        mapping = {}
+        for item in items:
+            invoice = item.get('Invoice', '')
+            rebate = rebate_mapping.get(invoice) or ledger_mapping.get(invoice)
+            if rebate is not None:
+                mapping[invoice] = rebate
+        file_records.append(legacy_build_records(name, header, items, mapping))
+    return file_records
+
+
+def generate_batch(files: int, items, seed: int) -> tuple:
+    rng = random.Random(seed)
+    invoices = [str(3600000000 + i) for i in range(files * 4)]
+    batch = []
+    for f in range(files):
+        count = items if isinstance(items, int) else rng.randint(*items)
+        file_items = []
+        for n in range(count):
+            fob = rng.randint(1, 99999) / 100
+            file_items.append({
+                'No': f"1.{n + 1}", 'Part No': rng.choice(["90NB0XX1-M00120", "90MP00T1-BMUA00", "XG27AQ"]),
+                'Product': rng.choice(["AS ZenBook 14 UX3402", "ROG Strix G15/R7-6800H", ""]),
+                'Serial': f"N1NRKD{rng.randint(0, 10 ** 9):09d}" if rng.random() < 0.9 else "",
+                'FOB': f"{fob:,.2f}" if rng.random() < 0.99 else "",
+                'Invoice': rng.choice(invoices) if rng.random() < 0.9 else "",
+            })
+        header = {'cn_no': str(8100000000 + f), 'product_line': rng.choice(["NB Consumer", "NB Gaming"]),
+                  'total': f"{rng.randint(1, 10 ** 6) / 100:,.2f}"}
+        batch.append((f"cn_{f:05d}.pdf", header, file_items))
+
+    rebate_mapping = {}
+    ledger_mapping = {}
+    for invoice in invoices:
+        roll = rng.random()
+        rebate = {
+            'CN_Landing': str(8200000000 + rng.randint(0, 50)) if rng.random() < 0.9 else '',
+            'Landing_cost': f"{rng.randint(1, 99999) / 100:,.2f}" if rng.random() < 0.999 else "n/a",
+        }
+        if roll < 0.4:
+            rebate_mapping[invoice] = rebate
+        elif roll < 0.7:
+            ledger_mapping[invoice] = rebate
+        elif roll < 0.8:
+            ledger_mapping[invoice] = None
+    return batch, rebate_mapping, ledger_mapping
+
+
+def _rows(file_records: list) -> list:
+    """Các dòng để so sánh (NaN thành None)."""
+    return [
+        tuple(None if isinstance(value, float) and math.isnan(value) else value for value in row)
+        for records in file_records for row in records
+    ]
+
+
+def _document(name: str, doc_type: str, pages: list) -> ExtractedFile:
+    text = "\n".join(line for page in pages for line in page)
+    items = extract_items(text) if doc_type == DOC_CREDIT_NOTE else []
+    entry = {'text': text, 'items': items, 'doc_type': doc_type}
+    return ExtractedFile(name, entry, digest=hashlib.sha256(text.encode('utf-8')).hexdigest())
+
+
+def check_remove_rebate(files: int, seed: int) -> list:
+    """Thêm Credit Note + REBATE vào Batch rồi bỏ REBATE; trả về các lỗi tìm thấy."""
+    rng = random.Random(seed)
+    credit_notes = []
+    invoices = []
+    for index in range(files):
+        file_invoices = [str(3700000000 + index * 10 + k) for k in range(rng.randint(1, 5))]
+        pages, _ = credit_note_pages(rng, 8100000000 + index, file_invoices)
+        credit_notes.append(_document(f"cn_{index:05d}.pdf", DOC_CREDIT_NOTE, pages))
+        invoices.extend(file_invoices)
+    rebate = _document("rebate.pdf", DOC_REBATE, rebate_pages(rng, 8200000000, invoices))
+
+    def linked(batch: Batch) -> int:
+        return sum(1 for records in batch.records() if not math.isnan(records.landing_cost))
+
+    errors = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for ledger in (None, Ledger(os.path.join(tmp, 'ledger.sqlite3'))):
+            label = 'with ledger' if ledger is not None else 'without ledger'
+            batch = Batch()
+            batch.add([*credit_notes, rebate], ledger)
+            if linked(batch) != files:
+                errors.append(f"{label}: {linked(batch)}/{files} Credit Notes linked after add")
+            batch.remove([rebate.name], ledger)
+            if linked(batch):
+                errors.append(f"{label}: {linked(batch)} Credit Notes still linked after removing REBATE")
+            if ledger is not None:
+                if ledger.find_by_invoice(invoices[0])['rebates']:
+                    errors.append(f"{label}: removed REBATE still in ledger")
+                # Batch sau vẫn thấy REBATE nếu thêm lại
+                batch.add([rebate], ledger)
+                if linked(batch) != files:
+                    errors.append(f"{label}: {linked(batch)}/{files} Credit Notes linked after adding REBATE back")
+    return errors
+
+
+def _best(func, repeat: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--files', type=int, default=2000)
+    parser.add_argument('--items', type=parse_items, default=(1, 10), help="Số item mỗi file, ví dụ 5 hoặc 1-10")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    batch, rebate_mapping, ledger_mapping = generate_batch(args.files, args.items, args.seed)
+    logging.disable(logging.WARNING)
+
+    def before():
+        return legacy_link(batch, rebate_mapping, ledger_mapping)
+
+    def after():
+        return link_records(batch, {**ledger_mapping, **rebate_mapping})
+
+    if _rows(before()) != _rows(after()):
+        print("records differ", file=sys.stderr)
+        return 1
+    errors = check_remove_rebate(min(args.files, 200), args.seed)
+    if errors:
+        print("\n".join(errors), file=sys.stderr)
+        return 1
+
+    rows = sum(map(len, after()))
+    before_seconds = _best(before)
+    after_seconds = _best(after)
+    print(f"batch: {len(batch)} Credit Note, {rows} rows, identical output; removing a REBATE unlinks it")
+    print(f"before: {rows / before_seconds:,.0f} rows/sec ({before_seconds * 1000:.1f} ms)")
+    print(f"after:  {rows / after_seconds:,.0f} rows/sec ({after_seconds * 1000:.1f} ms, "
+          f"{before_seconds / after_seconds:.1f}x)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
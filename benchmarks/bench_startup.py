@@ -0,0 +1,114 @@
+"""
+Benchmark khởi động app: thời gian import và lượt render đầu tiên của từng bước.
+
+    python -m benchmarks.bench_startup [--repeat 3] [--max-seconds 2.0]
+
+Mỗi phép đo chạy trong một process Python mới (không có module nào được cache):
+- import: import các module app dùng ở đầu script (streamlit + asus_cn)
+- eager import: như trên cộng các thư viện nặng (pandas, pdfplumber, openpyxl...),
+  tức cách app import trước đây, để so sánh
+- step 1 / step 2: lượt chạy đầu tiên của app.py qua AppTest ở bước đăng nhập /
+  upload
+
+Bước 1 và 2 không được import thư viện nặng nào (HEAVY_MODULES); nếu có, hoặc
+lượt render bước 1 chậm hơn --max-seconds, lệnh trả về mã lỗi 1.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+HEAVY_MODULES = ('pandas', 'numpy', 'pyarrow', 'openpyxl', 'pdfplumber', 'pdfminer')
+
+_REPORT = f"""
+import json, sys, time
+print(json.dumps({{'seconds': time.perf_counter() - started,
+                   'heavy': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+APP_IMPORTS = """
+import streamlit
+import asus_cn.archive, asus_cn.batch, asus_cn.cache, asus_cn.jobs, asus_cn.ledger, asus_cn.metrics
+"""
+
+SCENARIOS = {
+    'import': "import time\nstarted = time.perf_counter()\n" + APP_IMPORTS,
+    'eager import': (
+        "import time\nstarted = time.perf_counter()\n" + APP_IMPORTS
+        + "import asus_cn.export, asus_cn.records, pdfplumber, pdfminer.layout\n"
+    ),
+    'step 1': """
+from streamlit.testing.v1 import AppTest
+import time
+at = AppTest.from_file({app!r}, default_timeout=120)
+started = time.perf_counter()
+at.run()
+assert not at.exception, [e.value for e in at.exception]
+""",
+    'step 2': """
+from streamlit.testing.v1 import AppTest
+import time
+at = AppTest.from_file({app!r}, default_timeout=120)
+at.session_state['user_name'] = 'bench'
+at.session_state['current_step'] = 2
+started = time.perf_counter()
+at.run()
+assert not at.exception, [e.value for e in at.exception]
+""",
+}
+# Các bước phải khởi động không cần thư viện nặng
+LIGHT_SCENARIOS = ('import', 'step 1', 'step 2')
+
+
+def _run(code: str, env: dict) -> dict:
+    output = subprocess.run(
+        [sys.executable, '-c', code.format(app=str(ROOT / 'app.py')) + _REPORT],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=3, help='Số lần đo mỗi bước (lấy lần nhanh nhất)')
+    parser.add_argument('--max-seconds', type=float, help='Giới hạn thời gian render bước 1')
+    args = parser.parse_args(argv)
+
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        # Job / sổ cái / cache / audit log của lượt đo nằm trong thư mục tạm
+        env = {
+            **os.environ,
+            'PYTHONPATH': os.pathsep.join(filter(None, [str(ROOT), os.environ.get('PYTHONPATH')])),
+            'ASUS_CN_JOBS_DIR': os.path.join(tmp, 'jobs'),
+            'ASUS_CN_LEDGER_PATH': os.path.join(tmp, 'ledger.sqlite3'),
+            'ASUS_CN_CACHE_DIR': os.path.join(tmp, 'cache'),
+            'ASUS_CN_AUDIT_DIR': os.path.join(tmp, 'audit'),
+        }
+        results = {}
+        for name, code in SCENARIOS.items():
+            runs = [_run(code, env) for _ in range(args.repeat)]
+            results[name] = {'seconds': min(run['seconds'] for run in runs), 'heavy': runs[0]['heavy']}
+
+    print(f"{'':<14}{'seconds':>10}  heavy modules loaded")
+    for name, result in results.items():
+        print(f"{name:<14}{result['seconds']:>10.3f}  {', '.join(result['heavy']) or '-'}")
+        if name in LIGHT_SCENARIOS and result['heavy']:
+            print(f"  {name} must not import {', '.join(result['heavy'])}", file=sys.stderr)
+            failed = True
+    saved = results['eager import']['seconds'] - results['import']['seconds']
+    print(f"\nlazy imports save {saved:.3f}s before the first render")
+
+    if args.max_seconds is not None and results['step 1']['seconds'] > args.max_seconds:
+        print(f"step 1 took {results['step 1']['seconds']:.3f}s > {args.max_seconds}s", file=sys.stderr)
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,209 @@
+"""
+Sinh file PDF Credit Note / REBATE giả lập theo đúng bố cục mà extract_items đọc.
+
+    python -m benchmarks.synthetic <thư mục> [--files 100] [--items 5] [--pages 1]
+                                   [--serial sn|memo|mixed] [--invoice inline|separate|none]
+
+Không cần thư viện tạo PDF: mỗi trang là một content stream Helvetica đơn giản,
+pdfplumber đọc ra đúng từng dòng như file thật (cả chế độ 'full' và 'regions').
+Cứ rebate_every Credit Note thì có một file REBATE phủ các invoice của chúng.
+"""
+
+import argparse
+import math
+import random
+import sys
+from pathlib import Path
+from typing import Iterator, Tuple
+
+SERIAL_PATTERNS = ('sn', 'memo', 'mixed')
+INVOICE_PATTERNS = ('inline', 'separate', 'none')
+
+# Font 9pt, khoảng dòng 11pt trên trang A4
+LINES_PER_PAGE = 70
+
+HEADER_LINES = [
+    "ASUS GLOBAL PTE. LTD.",
+    "10 Changi Business Park Central 1 #01-01 Singapore 486030",
+    "Reg. No 200301234K",
+    "Credit Note",
+]
+CUSTOMER_LINES = [
+    "To : ACME TRADING CO., LTD",
+    "Address : 1 Nguyen Hue, District 1, Ho Chi Minh City",
+    "Attn : Finance Department",
+    "Fax : 028 3823 0000",
+]
+TABLE_HEADER = "No Description Qty Unit Price Amount"
+PRODUCTS = [
+    ("90NB0XX1-M00120", "AS ZenBook 14 UX3402ZA/i5-1240P/16G/512G", "UX3402ZA"),
+    ("90NR0GP1-M00550", "AS ROG Strix G16 G614JV/i7-13650HX/RTX4060", "G614JV"),
+    ("90NX0521-M00810", "AS ExpertBook B1 B1502CBA/i3-1215U/8G", "B1502CBA"),
+    ("90NB0Z31-M00A70", "AS Vivobook Go 15 E1504FA/R5-7520U", "E1504FA"),
+    ("90MV0HH1-M00060", "AS Chromebox 5 CHROMEBOX5-S7009UN", "CHROMEBOX5"),
+]
+
+
+def pdf_bytes(pages: list) -> bytes:
+    """PDF tối giản, mỗi phần tử của pages là danh sách dòng của một trang."""
+    objects = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = add(b"")
+    kids = []
+    for lines in pages:
+        ops = ["BT /F1 9 Tf 11 TL 40 800 Td"]
+        for line in lines:
+            line = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+            ops.append(f"({line}) Tj T*")
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        content_id = add(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        kids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (pages_id, content_id, font_id)
+        ))
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % kid for kid in kids), len(kids)
+    )
+    catalog_id = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog_id, xref)
+    return bytes(out)
+
+
+def _item_block(rng: random.Random, no: str, invoice: str, serial: str, invoice_pattern: str) -> list:
+    part_no, description, model = rng.choice(PRODUCTS)
+    qty = rng.randint(1, 3)
+    price = rng.randint(500, 150000) / 100
+    if serial == 'mixed':
+        serial = rng.choice(('sn', 'memo'))
+    serial_text = (f"SN:{rng.choice('KLMNR')}{rng.randint(1, 9)}NRKD{rng.randint(0, 10**6):06d}"
+                   if serial == 'sn' else f"SN: MEMO:CM{rng.randint(0, 10**8):08d}")
+
+    lines = [
+        f"{no} {part_no} {qty} USD {price:,.2f} {price * qty:,.2f}",
+        description,
+        f"Model: {model}",
+        f"SO: {rng.randint(10**7, 10**8 - 1)}",
+    ]
+    if invoice_pattern == 'inline':
+        lines.append(f"Note: {serial_text} INVOICE:{invoice}")
+    elif invoice_pattern == 'separate':
+        lines.extend([f"Note: {serial_text}", f"INVOICE: {invoice}"])
+    else:
+        lines.append(f"Note: {serial_text}")
+    return lines
+
+
+def credit_note_pages(rng: random.Random, cn_no: int, invoices: list, pages: int = 1,
+                      serial: str = 'sn', invoice_pattern: str = 'inline') -> Tuple[list, float]:
+    """Các trang của một Credit Note (một item / invoice), cùng tổng tiền."""
+    group = rng.randint(1, 9)
+    blocks = [
+        _item_block(rng, f"{group}.{n + 1}", invoice, serial, invoice_pattern)
+        for n, invoice in enumerate(invoices)
+    ]
+    total = sum(float(block[0].split()[-1].replace(',', '')) for block in blocks)
+
+    head = [f"CN NO : {cn_no}", *CUSTOMER_LINES, "Date : 2024/01/15", "CN Reason : Price protection",
+            f"Credit Note Remark: {rng.choice(('NB Consumer', 'NB Commercial', 'Gaming NB'))}"]
+    fixed = len(HEADER_LINES) + len(head) + 3  # Page, bảng, Total
+    room = LINES_PER_PAGE - fixed
+    per_page = max(1, room // max(len(block) for block in blocks)) if blocks else 1
+    pages = max(pages, math.ceil(len(blocks) / per_page), 1)
+    per_page = math.ceil(len(blocks) / pages) if blocks else 0
+
+    result = []
+    for page in range(pages):
+        lines = [*HEADER_LINES, f"Page: {page + 1}/{pages}", *head, TABLE_HEADER]
+        for block in blocks[page * per_page:(page + 1) * per_page]:
+            lines.extend(block)
+        if page == pages - 1:
+            lines.append(f"Total: {total:,.2f}")
+        result.append(lines)
+    return result, total
+
+
+def rebate_pages(rng: random.Random, cn_no: int, invoices: list) -> list:
+    """Các trang của một file REBATE phủ các invoice cho trước."""
+    rebate_lines = [f"REBATE FOR INVOICE: {invoice} {rng.randint(100, 50000) / 100:,.2f}" for invoice in invoices]
+    room = LINES_PER_PAGE - len(HEADER_LINES) - 3
+    pages = []
+    for start in range(0, max(len(rebate_lines), 1), room):
+        pages.append([*HEADER_LINES, f"CN NO : {cn_no}", *rebate_lines[start:start + room]])
+    pages[-1].append("Total: 1.00")
+    return pages
+
+
+def iter_documents(files: int, items=5, pages: int = 1, serial: str = 'sn',
+                   invoice_pattern: str = 'inline', rebate_every: int = 10,
+                   seed: int = 0) -> Iterator[Tuple[str, bytes]]:
+    """
+    Sinh (tên file, nội dung PDF) cho files Credit Note và các file REBATE đi kèm.
+    items: số item mỗi Credit Note, hoặc (min, max).
+    """
+    rng = random.Random(seed)
+    low, high = items if isinstance(items, tuple) else (items, items)
+    pending_invoices = []
+    next_invoice = 3600000000
+    for index in range(files):
+        invoices = [str(next_invoice + k) for k in range(rng.randint(low, high))]
+        next_invoice += len(invoices)
+        cn_pages, _ = credit_note_pages(rng, 8100000000 + index, invoices, pages, serial, invoice_pattern)
+        yield f"cn_{index:05d}.pdf", pdf_bytes(cn_pages)
+
+        pending_invoices.extend(invoices)
+        if rebate_every and ((index + 1) % rebate_every == 0 or index == files - 1):
+            yield f"rebate_{index // rebate_every:05d}.pdf", pdf_bytes(
+                rebate_pages(rng, 8200000000 + index // rebate_every, pending_invoices)
+            )
+            pending_invoices = []
+
+
+def parse_items(value: str):
+    """'5' -> 5, '1-40' -> (1, 40)."""
+    if '-' in value:
+        low, high = value.split('-', 1)
+        return int(low), int(high)
+    return int(value)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('directory', help='Thư mục ghi file PDF')
+    parser.add_argument('--files', type=int, default=100, help='Số Credit Note')
+    parser.add_argument('--items', type=parse_items, default=5, help="Số item mỗi file, ví dụ 5 hoặc 1-40")
+    parser.add_argument('--pages', type=int, default=1, help='Số trang tối thiểu mỗi Credit Note')
+    parser.add_argument('--serial', choices=SERIAL_PATTERNS, default='sn')
+    parser.add_argument('--invoice', choices=INVOICE_PATTERNS, default='inline')
+    parser.add_argument('--rebate-every', type=int, default=10, help='Một file REBATE cho mỗi N Credit Note (0: không có)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    directory = Path(args.directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    count = 0
+    for name, data in iter_documents(args.files, args.items, args.pages, args.serial,
+                                     args.invoice, args.rebate_every, args.seed):
+        (directory / name).write_bytes(data)
+        count += 1
+    print(f"{count} files -> {directory}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())